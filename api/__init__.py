@@ -0,0 +1,2 @@
+from .server import ApiError, BookingAPI, ApiServer, create_server, close_server
+from .client import ApiClient, RemoteServiceRepository, RemoteUserRepository, RemoteSessionManager, RemoteBookingRepository
@@ -0,0 +1,259 @@
+# Models
+from models.repair_service import RepairService, ServiceFactory, ServiceCache
+from models.booking import BookingLine
+from models.user import get_membership_tiers, set_membership_tiers
+
+# Another
+from api.server import ApiError
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import Request, urlopen
+import json, threading, time
+
+
+class ApiClient:
+	"""HTTP/JSON-клиент сервера бронирований (api.server). Хранит токен текущей сессии."""
+
+	def __init__(self, base_url: str, timeout: float = 10.0):
+		"""
+		:param base_url: Адрес сервера, например http://127.0.0.1:8765.
+		:param timeout: Таймаут запроса в секундах.
+		"""
+		self.base_url = base_url.rstrip("/")
+		self.timeout = timeout
+		self.token = None
+		self._lock = threading.Lock()
+
+	def request(self, method: str, path: str, body: dict = None, query: dict = None, token: str = None) -> dict:
+		"""
+		Выполняет запрос и возвращает разобранный JSON-ответ.
+
+		:raises ApiError: Ответ сервера с кодом ошибки (или 503, если сервер недоступен).
+		"""
+		url = self.base_url + path
+		if query:
+			url += "?" + urlencode(query)
+		data = json.dumps(body).encode("utf-8") if body is not None else None
+		headers = {"Content-Type": "application/json"} if data is not None else {}
+		token = token or self.token
+		if token:
+			headers["Authorization"] = f"Bearer {token}"
+
+		try:
+			with urlopen(Request(url, data = data, headers = headers, method = method), timeout = self.timeout) as response:
+				return json.loads(response.read())
+		except HTTPError as e:
+			try:
+				message = json.loads(e.read()).get("error", e.reason)
+			except ValueError:
+				message = e.reason
+			raise ApiError(e.code, message)
+		except URLError as e:
+			raise ApiError(503, f"Server is unavailable: {e.reason}")
+
+	def set_token(self, token: str) -> None:
+		with self._lock:
+			self.token = token
+
+
+def service_from_dict(data: dict) -> RepairService:
+	return ServiceFactory.create_service(data["id"], data["type_code"], data["description"], data["cost"])
+
+
+def user_data_from_dict(data: dict) -> tuple:
+	"""Данные пользователя в формате get_user (хэш пароля клиенту не передается)."""
+	return data["login"], None, data["total_spent"], data["membership_level"]
+
+
+class RemoteServiceRepository:
+	"""Каталог услуг сервера с интерфейсом чтения SQLiteServiceRepository (для окна приложения)."""
+
+	def __init__(self, client: ApiClient, cache_size: int = 10000):
+		self.client = client
+		self.cache = ServiceCache(cache_size)
+		self.revision = 0
+
+	def _cached(self, services: list) -> list:
+		for service in services:
+			self.cache.put(service)
+		return services
+
+	def get_services_page(self, after: int = 0, limit: int = 100) -> tuple:
+		response = self.client.request("GET", "/services", query = {"after": after, "limit": limit})
+		return self._cached([service_from_dict(data) for data in response["services"]]), response["last_key"]
+
+	def get_services(self) -> list:
+		services, after = [], 0
+		while True:
+			page, after = self.get_services_page(after, 1000)
+			services.extend(page)
+			if len(page) < 1000:
+				return services
+
+	def search_services(self, query: str, limit: int = 50) -> list:
+		response = self.client.request("GET", "/services/search", query = {"q": query, "limit": limit})
+		return self._cached([service_from_dict(data) for data in response["services"]])
+
+	def find_service(self, uid: str):
+		service = self.cache.get(uid)
+		if service is not None:
+			return service
+		try:
+			data = self.client.request("GET", "/services/" + quote(uid, safe = ""))
+		except ApiError as e:
+			if e.status == 404:
+				return None
+			raise
+		return self._cached([service_from_dict(data)])[0]
+
+	def get_service(self, uid: str) -> tuple:
+		service = self.find_service(uid)
+		if service is None:
+			return None
+		return service.get_uid(), type(service).__name__, service.get_description(), service.get_cost()
+
+	def has_services(self) -> bool:
+		return bool(self.get_services_page(0, 1)[0])
+
+	def validate_cache(self) -> None:
+		# Каталог на сервере меняется только через сервер; кэш клиента сбрасывается при переподключении
+		pass
+
+
+class RemoteUserRepository:
+	"""Авторизация через сервер: пароль проверяется и хэшируется на стороне сервера."""
+
+	remote = True
+
+	def __init__(self, client: ApiClient, tiers_check_interval: float = 1.0):
+		"""
+		:param client: Клиент сервера бронирований.
+		:param tiers_check_interval: Как часто (в секундах) перечитывать уровни членства с сервера.
+		"""
+		self.client = client
+		self.tiers_check_interval = tiers_check_interval
+		self._tiers_checked_at = None
+
+	def load_membership_tiers(self) -> tuple:
+		"""
+		Читает уровни членства с сервера и делает их действующими в процессе
+		(скидки и цены корзины, подсказки окна).
+
+		:return: Кортеж уровней (название, порог, скидка) от старшего к младшему.
+		"""
+		self._tiers_checked_at = time.monotonic()
+		set_membership_tiers(self.client.request("GET", "/membership-tiers")["tiers"])
+		return get_membership_tiers()
+
+	def refresh_membership_tiers(self) -> None:
+		"""
+		Перечитывает уровни членства с сервера не чаще раза в tiers_check_interval секунд
+		(интерфейс SQLiteUserRepository.refresh_membership_tiers). Если сервер недоступен,
+		остаются действующими прежние уровни.
+		"""
+		checked_at = self._tiers_checked_at
+		if checked_at is not None and time.monotonic() - checked_at < self.tiers_check_interval:
+			return
+		try:
+			self.load_membership_tiers()
+		except ApiError as e:
+			print(f"Не удалось обновить уровни членства: {e.message}")
+
+	def login(self, login: str, password: str):
+		"""
+		:return: Кортеж (данные пользователя, токен сессии) или None, если логин или пароль неверны.
+		"""
+		try:
+			response = self.client.request("POST", "/auth/login", {"login": login, "password": password})
+		except ApiError as e:
+			if e.status == 401:
+				return None
+			raise
+		self.client.set_token(response["token"])
+		# Уровни членства могли измениться на сервере после предыдущей проверки
+		self._tiers_checked_at = None
+		self.refresh_membership_tiers()
+		return user_data_from_dict(response["user"]), response["token"]
+
+	def register(self, login: str, password: str):
+		"""
+		:return: Кортеж (данные пользователя, токен сессии) или None, если пользователь уже существует.
+		"""
+		try:
+			response = self.client.request("POST", "/auth/register", {"login": login, "password": password})
+		except ApiError as e:
+			if e.status == 409:
+				return None
+			raise
+		self.client.set_token(response["token"])
+		# Уровни членства могли измениться на сервере после предыдущей проверки
+		self._tiers_checked_at = None
+		self.refresh_membership_tiers()
+		return user_data_from_dict(response["user"]), response["token"]
+
+
+class RemoteSessionManager:
+	"""Проверка и отзыв сессий через сервер (интерфейс SessionManager для AuthDialog)."""
+
+	remote = True
+
+	def __init__(self, client: ApiClient):
+		self.client = client
+
+	def validate(self, token: str):
+		"""
+		:return: Данные пользователя или None, если сессия недействительна.
+		"""
+		try:
+			response = self.client.request("GET", "/auth/session", token = token)
+		except ApiError as e:
+			if e.status != 401:
+				# Сервер недоступен: приложение покажет диалог авторизации, кэш не удаляется
+				print(f"Не удалось проверить сессию: {e.message}")
+			return None
+		self.client.set_token(token)
+		return user_data_from_dict(response)
+
+	def revoke(self, token: str) -> bool:
+		try:
+			revoked = self.client.request("POST", "/auth/logout", token = token)["revoked"]
+		except ApiError as e:
+			if e.status != 401:
+				print(f"Не удалось отозвать сессию: {e.message}")
+			return False
+		self.client.set_token(None)
+		return revoked
+
+
+class RemoteBookingRepository:
+	"""
+	Оформление заказов через сервер. Сервер заново рассчитывает цены по актуальным расходам
+	пользователя и записывает заказ групповой транзакцией.
+	"""
+
+	remote = True
+
+	def __init__(self, client: ApiClient):
+		self.client = client
+
+	def book_cart(self, login: str, lines: list) -> tuple:
+		"""
+		Оформляет заказ на сервере. Цены, рассчитанные клиентом, служат только для показа корзины:
+		сервер пересчитывает их по расходам пользователя в транзакции записи.
+
+		:param login: Логин пользователя (должен совпадать с пользователем сессии).
+		:param lines: Строки заказа; на сервер передаются только id услуг.
+		:return: Кортеж (строки заказа по ценам сервера, (новый total_spent, новый уровень членства)).
+		"""
+		response = self.client.request("POST", "/bookings", {"service_ids": [line.service_id for line in lines]})
+		return (
+			[BookingLine(**line) for line in response["lines"]],
+			(response["total_spent"], response["membership_level"])
+		)
+
+	def record_bookings(self, login: str, lines: list, created_at: float = None):
+		"""
+		:param created_at: Не используется: время заказа назначает сервер.
+		:return: Кортеж (новый total_spent, новый уровень членства).
+		"""
+		return self.book_cart(login, lines)[1]
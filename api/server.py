@@ -0,0 +1,314 @@
+# DB
+import sqlite3
+
+# Models
+from models.repair_service import SQLiteServiceRepository, RepairService
+from models.user import SQLiteUserRepository, User
+from models.booking import CartBooking, SQLiteBookingRepository
+from models.session import SessionManager
+from models.group_commit import GroupCommitWriter
+from models.unified import UnifiedDatabase
+
+# Another
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+import json, time
+
+
+class ApiError(Exception):
+	"""Ошибка API с HTTP-статусом ответа."""
+
+	def __init__(self, status: int, message: str):
+		super().__init__(message)
+		self.status = status
+		self.message = message
+
+
+def service_to_dict(service: RepairService) -> dict:
+	return {
+		"id": service.get_uid(),
+		"type": type(service).__name__,
+		"type_code": service.TYPE_CODE,
+		"description": service.get_description(),
+		"cost": service.get_cost(),
+	}
+
+
+def user_to_dict(user_data) -> dict:
+	"""Данные пользователя для ответа клиенту (без хэша пароля)."""
+	login, _, total_spent, membership_level = user_data
+	return {"login": login, "total_spent": total_spent, "membership_level": membership_level}
+
+
+class BookingAPI:
+	"""
+	Логика сервера без HTTP: авторизация, каталог и заказы.
+	Чтение выполняется в потоке запроса (у каждого потока свое соединение), все записи в users.db
+	проходят через GroupCommitWriter и фиксируются группами.
+	"""
+
+	def __init__(
+		self,
+		service_repo: SQLiteServiceRepository,
+		user_repo: SQLiteUserRepository,
+		session_manager: SessionManager,
+		writer: GroupCommitWriter
+	):
+		self.service_repo = service_repo
+		self.user_repo = user_repo
+		self.session_manager = session_manager
+		self.writer = writer
+		# В единой базе данных каталог и заказы пишутся одним соединением: цены сверяются в транзакции заказа
+		self.unified = service_repo.connection_manager is user_repo.connection_manager
+
+	def authenticate(self, token: str):
+		"""
+		:return: Данные пользователя по токену сессии.
+		:raises ApiError: 401, если токен недействителен.
+		"""
+		user_data = self.session_manager.validate(token) if token else None
+		if user_data is None:
+			raise ApiError(401, "Invalid or expired session")
+		return user_data
+
+	def login(self, login: str, password: str) -> dict:
+		stored_hash = self.user_repo.get_user_password_hash(login)
+		# bcrypt выполняется в потоке запроса и освобождает GIL
+		if stored_hash is None or not SQLiteUserRepository.check_password(password, stored_hash):
+			raise ApiError(401, "Invalid login or password")
+
+		row, token = self.session_manager.new_session(login)
+		self.writer.execute(lambda connection: connection.execute(SessionManager.INSERT_SQL, row))
+		return {"token": token, "user": user_to_dict(self.user_repo.get_user(login))}
+
+	def register(self, login: str, password: str) -> dict:
+		if not login or not password:
+			raise ApiError(400, "Login and password are required")
+		password_hash = SQLiteUserRepository.hash_password(password)
+		row, token = self.session_manager.new_session(login)
+
+		def create_user(connection: sqlite3.Connection) -> None:
+			connection.execute(SQLiteUserRepository.INSERT_USER_SQL, (login, password_hash))
+			connection.execute(SessionManager.INSERT_SQL, row)
+
+		try:
+			self.writer.execute(create_user)
+		except sqlite3.IntegrityError:
+			raise ApiError(409, "User already exists")
+		return {"token": token, "user": user_to_dict(self.user_repo.get_user(login))}
+
+	def logout(self, token: str) -> dict:
+		parsed = SessionManager.parse_token(token or "")
+		if parsed is None:
+			raise ApiError(401, "Invalid session")
+		revoked = self.writer.execute(
+			lambda connection: connection.execute('DELETE FROM sessions WHERE id = ?', (parsed[0],)).rowcount
+		)
+		return {"revoked": revoked > 0}
+
+	def services_page(self, after: int, limit: int) -> dict:
+		services, last_key = self.service_repo.get_services_page(after, limit)
+		return {"services": [service_to_dict(service) for service in services], "last_key": last_key}
+
+	def search_services(self, query: str, limit: int) -> dict:
+		return {"services": [service_to_dict(service) for service in self.service_repo.search_services(query, limit)]}
+
+	def service(self, uid: str) -> dict:
+		service = self.service_repo.find_service(uid)
+		if service is None:
+			raise ApiError(404, "Service not found")
+		return service_to_dict(service)
+
+	def book(self, token: str, service_ids: list) -> dict:
+		login = self.authenticate(token)[0]
+		if not service_ids:
+			raise ApiError(400, "Cart is empty")
+		services = []
+		for uid in service_ids:
+			service = self.service_repo.find_service(uid)
+			if service is None:
+				raise ApiError(404, f"Service not found: {uid}")
+			services.append(service)
+
+		# Уровни членства могли изменить tools/membership_tiers.py без перезапуска сервера
+		self.user_repo.refresh_membership_tiers()
+
+		def write_order(connection: sqlite3.Connection):
+			# Цены считаются по состоянию пользователя внутри транзакции записи, поэтому
+			# параллельные заказы одного пользователя видят расходы друг друга
+			row = connection.execute(
+				'SELECT total_spent, membership_level FROM users WHERE login = ?', (login,)
+			).fetchone()
+			if row is None:
+				return None
+			lines = CartBooking(User(login, None, *row), services).price_cart()
+			if self.unified:
+				try:
+					SQLiteBookingRepository.check_prices(connection, lines)
+				except ValueError as e:
+					raise ApiError(409, str(e))
+			state = SQLiteBookingRepository.write_bookings(connection, login, lines, time.time())
+			return lines, state
+
+		result = self.writer.execute(write_order)
+		if result is None:
+			raise ApiError(401, "Unknown user")
+		lines, (total_spent, membership_level) = result
+		return {
+			"lines": [line._asdict() for line in lines],
+			"total": sum(line.final_price for line in lines),
+			"total_spent": total_spent,
+			"membership_level": membership_level,
+		}
+
+	def membership_tiers(self) -> dict:
+		"""Уровни членства из базы данных: клиенты показывают по ним скидки и цены корзины."""
+		return {"tiers": [list(tier) for tier in self.user_repo.load_membership_tiers()]}
+
+	def health(self) -> dict:
+		return {"status": "ok", "batches": self.writer.batches, "operations": self.writer.operations}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+	"""HTTP/JSON-интерфейс к BookingAPI. Токен сессии передается в заголовке Authorization: Bearer <токен>."""
+
+	server_version = "RepairServiceAPI/1.0"
+	MAX_BODY_SIZE = 1024 * 1024
+
+	@property
+	def api(self) -> BookingAPI:
+		return self.server.api
+
+	def do_GET(self):
+		self.dispatch("GET")
+
+	def do_POST(self):
+		self.dispatch("POST")
+
+	def dispatch(self, method: str) -> None:
+		url = urlsplit(self.path)
+		self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+		try:
+			status, payload = 200, self.route(method, url.path.rstrip("/") or "/")
+		except ApiError as e:
+			status, payload = e.status, {"error": e.message}
+		except (ValueError, KeyError, TypeError) as e:
+			status, payload = 400, {"error": f"Bad request: {e}"}
+		except sqlite3.Error as e:
+			self.log_error("Database error: %s", e)
+			status, payload = 503, {"error": "Database is unavailable"}
+
+		body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def route(self, method: str, path: str) -> dict:
+		if method == "GET":
+			if path == "/health":
+				return self.api.health()
+			if path == "/auth/session":
+				return user_to_dict(self.api.authenticate(self.token()))
+			if path == "/membership-tiers":
+				return self.api.membership_tiers()
+			if path == "/services":
+				return self.api.services_page(int(self.query.get("after", 0)), int(self.query.get("limit", 100)))
+			if path == "/services/search":
+				return self.api.search_services(self.query.get("q", ""), int(self.query.get("limit", 50)))
+			if path.startswith("/services/"):
+				return self.api.service(unquote(path[len("/services/"):]))
+		elif method == "POST":
+			if path == "/auth/login":
+				body = self.read_json()
+				return self.api.login(body["login"], body["password"])
+			if path == "/auth/register":
+				body = self.read_json()
+				return self.api.register(body["login"], body["password"])
+			if path == "/auth/logout":
+				return self.api.logout(self.token())
+			if path == "/bookings":
+				return self.api.book(self.token(), list(self.read_json()["service_ids"]))
+		raise ApiError(404, f"Unknown endpoint: {method} {path}")
+
+	def token(self) -> str:
+		header = self.headers.get("Authorization", "")
+		return header[len("Bearer "):].strip() if header.startswith("Bearer ") else ""
+
+	def read_json(self) -> dict:
+		length = int(self.headers.get("Content-Length") or 0)
+		if length > self.MAX_BODY_SIZE:
+			raise ApiError(413, "Request body is too large")
+		body = json.loads(self.rfile.read(length) or b"{}")
+		if not isinstance(body, dict):
+			raise ApiError(400, "JSON object expected")
+		return body
+
+	def log_message(self, format: str, *args) -> None:
+		if self.server.verbose:
+			super().log_message(format, *args)
+
+
+class ApiServer(HTTPServer):
+	"""
+	HTTP-сервер с фиксированным пулом потоков. Потоки переиспользуются, поэтому каждое соединение
+	ConnectionManager открывается один раз на поток, а не на каждый запрос.
+	"""
+
+	def __init__(self, address: tuple, api: BookingAPI, workers: int = 16, verbose: bool = False):
+		super().__init__(address, ApiRequestHandler)
+		self.api = api
+		self.verbose = verbose
+		self.pool = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "api")
+
+	def process_request(self, request, client_address) -> None:
+		self.pool.submit(self.process_request_in_pool, request, client_address)
+
+	def process_request_in_pool(self, request, client_address) -> None:
+		try:
+			self.finish_request(request, client_address)
+		except Exception:
+			self.handle_error(request, client_address)
+		finally:
+			self.shutdown_request(request)
+
+	def server_close(self) -> None:
+		super().server_close()
+		self.pool.shutdown(wait = True)
+
+
+def create_server(
+	services_db: str = "services.db",
+	users_db: str = "users.db",
+	host: str = "127.0.0.1",
+	port: int = 8765,
+	workers: int = 16,
+	max_batch: int = 256,
+	secret_path: str = ".session_key",
+	verbose: bool = False,
+	database: str = None
+) -> ApiServer:
+	"""
+	Открывает базы данных и создает сервер (запуск — serve_forever()).
+
+	:param database: Путь к единой базе данных (UnifiedDatabase) вместо services_db и users_db.
+	"""
+	if database is not None:
+		unified = UnifiedDatabase(database)
+		service_repo, user_repo = unified.service_repo, unified.user_repo
+	else:
+		service_repo = SQLiteServiceRepository(services_db)
+		user_repo = SQLiteUserRepository(users_db)
+	session_manager = SessionManager(user_repo, SessionManager.load_secret(secret_path))
+	writer = GroupCommitWriter(user_repo.connection_manager, max_batch = max_batch)
+	return ApiServer((host, port), BookingAPI(service_repo, user_repo, session_manager, writer), workers, verbose)
+
+
+def close_server(server: ApiServer) -> None:
+	"""Останавливает прием запросов, дописывает очередь записи и закрывает базы данных."""
+	server.server_close()
+	server.api.writer.close()
+	server.api.user_repo.connection_manager.close_all()
+	server.api.service_repo.connection_manager.close_all()
@@ -1,2 +1,17 @@
-from .auth_dialog import AuthDialog
-from .main_window import RepairServiceApp
\ No newline at end of file
+# Окна импортируются при первом обращении (from app import AuthDialog), а не при импорте пакета:
+# иначе import app.auth_dialog загружал бы и главное окно, и его стоимость смешивалась бы в профиле запуска
+_EXPORTS = {
+	"AuthDialog": "auth_dialog",
+	"AuthWorker": "auth_worker",
+	"RepairServiceApp": "main_window",
+	"ServiceListModel": "service_list_model",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+	if name not in _EXPORTS:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	from importlib import import_module
+	return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
@@ -1,28 +1,34 @@
 # QT
 from PyQt5.QtWidgets import (
 	QVBoxLayout, QHBoxLayout,
-	QLabel, QLineEdit, QPushButton, QMessageBox, QDialog
+	QLabel, QLineEdit, QPushButton, QMessageBox, QDialog, QProgressBar
 )
-from PyQt5.QtGui import QFont, QIcon, QPixmap
+from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt
 
 # Models
 from models.user import SQLiteUserRepository, User
+from models.session import SessionManager
+
+# Windows
+from app.auth_worker import AuthWorker
 
 # Utils
-from utils.path_tools import resource_path
 from utils.icon_paths import *
+from utils.assets import get_icon, get_pixmap, apply_stylesheet
 
 # Another
-import os, json, base64
+import os
 
 
 class AuthDialog(QDialog):
-	def __init__(self, user_repo: SQLiteUserRepository, auth_cache_path = '.auth'):
+	def __init__(self, user_repo: SQLiteUserRepository, auth_cache_path = '.auth', session_manager: SessionManager = None):
 		super().__init__()
 		self.user_repo = user_repo
 		self.auth_cache_path = auth_cache_path
+		self.session_manager = session_manager or SessionManager(user_repo, SessionManager.load_secret())
 		self.user = None
+		self.auth_worker = None
 		self.configure_window()
 		self.init_ui()
 		self.apply_styles()
@@ -38,7 +44,7 @@ class AuthDialog(QDialog):
 
 		# Применяем настройки
 		self.setWindowTitle("RepairService - Auth")
-		self.setWindowIcon(QIcon(KEY_ICO))
+		self.setWindowIcon(get_icon(KEY_ICO))
 		self.setFixedSize(window_width, window_height)
 
 	def init_ui(self):
@@ -49,12 +55,10 @@ class AuthDialog(QDialog):
 		
 		# Иконка
 		icon_label = QLabel()
-		pixmap = QPixmap(REPAIR_SHOP_ICO)
+		pixmap = get_pixmap(REPAIR_SHOP_ICO, 32)  # Иконка 32x32 из общего кэша
 		if pixmap.isNull():
 			print("Не удалось загрузить иконку. Проверьте путь к файлу.")
 		else:
-			# Масштабируем иконку до 32x32
-			pixmap = pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation)
 			icon_label.setPixmap(pixmap)
 		
 		icon_label.setFixedSize(32, 32)  # Устанавливаем размер 32x32 пикселя
@@ -115,6 +119,13 @@ class AuthDialog(QDialog):
 		buttons_layout.addWidget(self.button_register)
 		layout.addLayout(buttons_layout)
 
+		# Индикатор выполнения проверки пароля (показывается только во время работы bcrypt)
+		self.progress_bar = QProgressBar()
+		self.progress_bar.setRange(0, 0)
+		self.progress_bar.setTextVisible(True)
+		self.progress_bar.hide()
+		layout.addWidget(self.progress_bar)
+
 		self.setLayout(layout)
 		#*
 
@@ -123,9 +134,31 @@ class AuthDialog(QDialog):
 		self.button_register.clicked.connect(self.register)
 
 	def apply_styles(self):
-		styles_path = resource_path("resources/styles/dark_theme.css")
-		with open(styles_path, "r", encoding = "utf-8") as fp:
-			self.setStyleSheet(fp.read())
+		# Стили применяются один раз на уровне приложения
+		apply_stylesheet()
+
+	def set_busy(self, busy: bool, message: str = "") -> None:
+		"""Блокирует форму и показывает индикатор, пока пароль проверяется в фоне."""
+		for widget in (
+			self.entry_login, self.entry_password, self.entry_confirm,
+			self.button_login, self.button_register
+		):
+			widget.setEnabled(not busy)
+		self.progress_bar.setFormat(message)
+		self.progress_bar.setVisible(busy)
+
+	def run_auth_task(self, message: str, on_finished, fn, *args) -> None:
+		"""Запускает bcrypt-операцию в пуле потоков и вызывает on_finished с результатом в потоке GUI."""
+		self.set_busy(True, message)
+		self.auth_worker = AuthWorker(fn, *args)
+		self.auth_worker.signals.finished.connect(on_finished)
+		self.auth_worker.signals.failed.connect(self.on_auth_task_failed)
+		self.auth_worker.start()
+
+	def on_auth_task_failed(self, error: str) -> None:
+		self.set_busy(False)
+		self.auth_worker = None
+		QMessageBox.warning(self, "Ошибка", f"Не удалось выполнить авторизацию: {error}")
 
 	def login(self):
 		login = self.entry_login.text().strip()
@@ -134,11 +167,34 @@ class AuthDialog(QDialog):
 		if not login or not password:
 			QMessageBox.warning(self, "Ошибка", "Пожалуйста, заполните все поля!")
 			return
-		if self.user_repo.verify_user(login, password):
+
+		if getattr(self.user_repo, "remote", False):
+			# В режиме клиента пароль проверяет сервер; запрос выполняется в фоне
+			self.run_auth_task(
+				"Вход...",
+				lambda result: self.on_remote_auth(result, "Вход выполнен", "Неверное имя пользователя или пароль!"),
+				self.user_repo.login, login, password
+			)
+			return
+
+		stored_hash = self.user_repo.get_user_password_hash(login)
+		if stored_hash is None:
+			QMessageBox.warning(self, "Ошибка", "Неверное имя пользователя или пароль!")
+			return
+
+		self.run_auth_task(
+			"Проверка пароля...",
+			lambda is_valid: self.on_login_checked(login, is_valid),
+			SQLiteUserRepository.check_password, password, stored_hash
+		)
+
+	def on_login_checked(self, login: str, is_valid: bool) -> None:
+		self.set_busy(False)
+		self.auth_worker = None
+		if is_valid:
 			user_data = self.user_repo.get_user(login)
-			print(user_data)
 			self.user = User(*user_data, self.user_repo)
-			self.save_auth_cache(password)
+			self.save_auth_cache()
 			QMessageBox.information(self, "Вход выполнен", f"Добро пожаловать, {self.user.login}!")
 			self.accept()
 		else:
@@ -154,53 +210,116 @@ class AuthDialog(QDialog):
 		if password != confirm_password:
 			QMessageBox.warning(self, "Ошибка", "Пароли не совпадают!")
 			return
-		if self.user_repo.add_user(login, password):
+		if getattr(self.user_repo, "remote", False):
+			self.run_auth_task(
+				"Регистрация...",
+				lambda result: self.on_remote_auth(result, "Регистрация", "Пользователь уже существует!"),
+				self.user_repo.register, login, password
+			)
+			return
+		if self.user_repo.is_login_exists(login):
+			QMessageBox.warning(self, "Ошибка", "Пользователь уже существует!")
+			return
+
+		self.run_auth_task(
+			"Регистрация...",
+			lambda password_hash: self.on_password_hashed(login, password_hash),
+			SQLiteUserRepository.hash_password, password
+		)
+
+	def on_password_hashed(self, login: str, password_hash: bytes) -> None:
+		self.set_busy(False)
+		self.auth_worker = None
+		if self.user_repo.add_user_with_hash(login, password_hash):
 			user_data = self.user_repo.get_user(login)
 			self.user = User(*user_data, user_repo = self.user_repo)
-			self.save_auth_cache(password)
+			self.save_auth_cache()
 			QMessageBox.information(self, "Регистрация", f"Пользователь {self.user.login} успешно зарегистрирован!")
 			self.accept()
 		else:
 			QMessageBox.warning(self, "Ошибка", "Пользователь уже существует!")
 
-	def save_auth_cache(self, password: str):
-		"""Сохранение данных авторизации"""
-		data = f"{self.user.login}:{password}"
-		encoded_data = base64.b64encode(data.encode('utf-8')).decode('utf-8')  # Преобразуем bytes в str
+	def on_remote_auth(self, result, title: str, error: str) -> None:
+		"""Завершает вход или регистрацию через сервер: result — (данные пользователя, токен) или None."""
+		self.set_busy(False)
+		self.auth_worker = None
+		if result is None:
+			QMessageBox.warning(self, "Ошибка", error)
+			return
+		user_data, token = result
+		self.user = User(*user_data, user_repo = self.user_repo)
+		self.write_auth_cache(token)
+		QMessageBox.information(self, title, f"Добро пожаловать, {self.user.login}!")
+		self.accept()
+
+	def save_auth_cache(self):
+		"""Создает сессию и сохраняет ее токен в кэш авторизации (пароль на диск не попадает)"""
+		self.write_auth_cache(self.session_manager.create_session(self.user.login))
 
+	def write_auth_cache(self, token: str) -> None:
 		try:
-			with open(self.auth_cache_path, "w") as f:
-				f.write(encoded_data)
+			# Токен дает вход без пароля, поэтому файл доступен только владельцу (как .session_key)
+			fd = os.open(self.auth_cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+			if hasattr(os, "fchmod"):
+				# Режим os.open применяется только к новому файлу; кэш прежних версий мог быть 0644
+				os.fchmod(fd, 0o600)
+			with os.fdopen(fd, "w") as f:
+				f.write(token)
 			print("Данные авторизации успешно сохранены.")
 		except OSError as e:
 			print(f"Ошибка при сохранении кэша авторизации: {e}")
 
 	@staticmethod
-	def load_auth_cache(user_repo: SQLiteUserRepository, auth_cache_path='.auth'):
-		if os.path.exists(auth_cache_path):
-			try:
-				with open(auth_cache_path, 'r') as f:
-					encoded_data = f.read()
-				
-				if not encoded_data:
-					print("Отсутствуют данные авторизации в кэше.")
-					return None
-
-				decoded_data = base64.b64decode(encoded_data).decode('utf-8')
-				login, password = decoded_data.split(':', 1)  # Разделяем на login и password
-
-				if user_repo.verify_user(login, password):
-					user_data = user_repo.get_user(login)
-					print(*user_data)
-					return User(*user_data, user_repo = user_repo)
-				else:
-					print("Пользователь из кэша не найден в репозитории.")
-			except json.JSONDecodeError:
-				print("Некорректный формат JSON в кэше авторизации.")
-			except (base64.binascii.Error, ValueError) as e:
-				print(f"Ошибка декодирования данных авторизации: {e}")
-			except OSError as e:
-				print(f"Ошибка при работе с файлом кэша: {e}")
-		else:
+	def load_auth_cache(user_repo: SQLiteUserRepository, session_manager: SessionManager, auth_cache_path='.auth'):
+		"""
+		Восстанавливает пользователя по токену сессии из кэша авторизации.
+		Проверка — один запрос по индексу и сравнение подписи, без bcrypt.
+		"""
+		if not os.path.exists(auth_cache_path):
 			print("Кэш авторизации не существует.")
-		return None
+			return None
+
+		try:
+			with open(auth_cache_path, 'r') as f:
+				token = f.read()
+		except OSError as e:
+			print(f"Ошибка при работе с файлом кэша: {e}")
+			return None
+
+		if not token:
+			print("Отсутствуют данные авторизации в кэше.")
+			return None
+
+		if SessionManager.parse_token(token) is None:
+			# Кэш старого формата хранил логин и пароль (base64): он удаляется, а не только пропускается
+			print("Кэш авторизации устаревшего формата удален.")
+			AuthDialog.remove_auth_cache(auth_cache_path)
+			return None
+
+		user_data = session_manager.validate(token)
+		if user_data is None:
+			print("Сессия из кэша авторизации недействительна или истекла.")
+			# Сервер мог быть недоступен: удаленную сессию проверим при следующем запуске
+			if not getattr(session_manager, "remote", False):
+				AuthDialog.remove_auth_cache(auth_cache_path)
+			return None
+		# Скидки и подсказки окна показываются по действующим уровням членства (при работе через сервер — по серверным)
+		user_repo.refresh_membership_tiers()
+		return User(*user_data, user_repo = user_repo)
+
+	@staticmethod
+	def remove_auth_cache(auth_cache_path='.auth') -> None:
+		try:
+			os.remove(auth_cache_path)
+		except OSError as e:
+			print(f"Ошибка при работе с файлом кэша: {e}")
+
+	@staticmethod
+	def clear_auth_cache(session_manager: SessionManager, auth_cache_path='.auth') -> None:
+		"""Отзывает сессию из кэша авторизации и удаляет файл кэша."""
+		try:
+			with open(auth_cache_path, 'r') as f:
+				session_manager.revoke(f.read())
+			os.remove(auth_cache_path)
+		except OSError as e:
+			print(f"Ошибка при работе с файлом кэша: {e}")
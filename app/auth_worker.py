@@ -0,0 +1,33 @@
+# QT
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class AuthWorkerSignals(QObject):
+	"""Сигналы фоновой задачи авторизации. Доставляются в поток GUI через очередь событий."""
+	finished = pyqtSignal(object)
+	failed = pyqtSignal(str)
+
+
+class AuthWorker(QRunnable):
+	"""
+	Выполняет ресурсоемкую функцию (хэширование или проверку пароля bcrypt)
+	в пуле потоков Qt и сообщает результат сигналами.
+	Функция не должна обращаться к соединению SQLite, созданному в потоке GUI.
+	"""
+
+	def __init__(self, fn, *args):
+		super().__init__()
+		self.fn = fn
+		self.args = args
+		self.signals = AuthWorkerSignals()
+
+	def run(self):
+		try:
+			result = self.fn(*self.args)
+		except Exception as e:
+			self.signals.failed.emit(str(e))
+		else:
+			self.signals.finished.emit(result)
+
+	def start(self, pool: QThreadPool = None) -> None:
+		(pool or QThreadPool.globalInstance()).start(self)
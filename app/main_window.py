@@ -1,29 +1,47 @@
 # QT
 from PyQt5.QtWidgets import (
 	QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-	QLabel, QPushButton, QListWidget, QMessageBox, QListWidgetItem
+	QLabel, QPushButton, QListView, QMessageBox, QLineEdit
 )
-from PyQt5.QtGui import QFont, QIcon, QPixmap
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QSize, QTimer
 
 # Models
 from models.user import User
-from models.repair_service import SQLiteServiceRepository, ServiceFactory
-from models.booking import Booking
+from models.repair_service import SQLiteServiceRepository
+from models.booking import CartBooking, SQLiteBookingRepository
+from models.session import SessionManager
+from models.pricing import PricingEngine
+
+# Windows
+from app.service_list_model import ServiceListModel
+from app.auth_dialog import AuthDialog
 
 # Utils
-from utils.path_tools import resource_path
 from utils.icon_paths import *
+from utils.assets import get_icon, get_pixmap, apply_stylesheet
 
 # Another
 import os
 
 
 class RepairServiceApp(QMainWindow):
-	def __init__(self, service_repo: SQLiteServiceRepository, user: User):
+	SEARCH_DEBOUNCE_MS = 250
+
+	def __init__(
+		self,
+		service_repo: SQLiteServiceRepository,
+		user: User,
+		session_manager: SessionManager = None,
+		auth_cache_path = '.auth',
+		booking_repo: SQLiteBookingRepository = None
+	):
 		super().__init__()
 		self.service_repo = service_repo
 		self.user = user
+		self.booking_repo = booking_repo or SQLiteBookingRepository(user.user_repo)
+		self.session_manager = session_manager
+		self.auth_cache_path = auth_cache_path
 		self.selected_service = None
 		self.configure_window()
 		self.init_ui()
@@ -41,7 +59,7 @@ class RepairServiceApp(QMainWindow):
 
 		# Применяем настройки
 		self.setWindowTitle("RepairService - Main")
-		self.setWindowIcon(QIcon(REPAIR_SHOP_ICO))
+		self.setWindowIcon(get_icon(REPAIR_SHOP_ICO))
 		self.setFixedSize(QSize(window_width, window_height))
 
 	def init_ui(self):
@@ -60,12 +78,10 @@ class RepairServiceApp(QMainWindow):
 
 		# Иконка пользователя
 		user_icon_label = QLabel()
-		user_pixmap = QPixmap(USER_ICO)
+		user_pixmap = get_pixmap(USER_ICO, 32)  # Иконка 32x32 из общего кэша
 		if user_pixmap.isNull():
 			print("Не удалось загрузить иконку пользователя. Проверьте путь к файлу.")
 		else:
-			# Масштабируем иконку до 32x32
-			user_pixmap = user_pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation)
 			user_icon_label.setPixmap(user_pixmap)
 		
 		user_icon_label.setFixedSize(32, 32)  # Устанавливаем размер 32x32 пикселя
@@ -87,14 +103,12 @@ class RepairServiceApp(QMainWindow):
 		self.vip_icon_label = QLabel()
 		self.vip_icon_label.setToolTip(f"Скидка составляет: {self.user.get_membership_discount() * 100}%")
 		vip_icon_path = self.get_vip_icon_path(self.user.membership_level)
-		vip_pixmap = QPixmap(vip_icon_path) if vip_icon_path else QPixmap()
+		vip_pixmap = get_pixmap(vip_icon_path, 32)  # Иконка 32x32 из общего кэша
 		if vip_pixmap.isNull():
 			print("Не удалось загрузить иконку VIP уровня. Проверьте путь к файлу.")
 			self.vip_icon_label.setText("Нет VIP")
 			self.vip_icon_label.setFont(QFont('Ubuntu', 10, QFont.Bold))
 		else:
-			# Масштабируем иконку до 32x32
-			vip_pixmap = vip_pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation)
 			self.vip_icon_label.setPixmap(vip_pixmap)
 		
 		self.vip_icon_label.setFixedSize(32, 32)  # Устанавливаем размер 32x32 пикселя
@@ -119,8 +133,30 @@ class RepairServiceApp(QMainWindow):
 		# Добавляем header_layout в основной layout
 		main_layout.addLayout(header_layout)
 
-		# Список услуг
-		self.list_services = QListWidget()
+		# Строка поиска: запрос выполняется после паузы в наборе текста
+		self.search_input = QLineEdit()
+		self.search_input.setPlaceholderText("Поиск услуг...")
+		self.search_input.setClearButtonEnabled(True)
+		main_layout.addWidget(self.search_input)
+
+		self.search_timer = QTimer(self)
+		self.search_timer.setSingleShot(True)
+		self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+		self.search_timer.timeout.connect(self.apply_search)
+		self.search_input.textChanged.connect(self.search_timer.start)
+
+		# Список услуг (ленивая модель, страницы подгружаются при прокрутке)
+		self.pricing_engine = PricingEngine(self.service_repo)
+		self.services_model = ServiceListModel(
+			self.service_repo,
+			parent = self,
+			pricing_engine = self.pricing_engine,
+			membership_level = self.user.membership_level
+		)
+		self.list_services = QListView()
+		self.list_services.setUniformItemSizes(True)
+		self.list_services.setSelectionMode(QListView.ExtendedSelection)
+		self.list_services.setModel(self.services_model)
 		main_layout.addWidget(self.list_services)
 
 		# Layout для кнопок действий
@@ -128,14 +164,14 @@ class RepairServiceApp(QMainWindow):
 
 		# Создание кнопки "Оформить заказ" с иконкой
 		self.button_process_order = QPushButton("Оформить заказ")
-		self.button_process_order.setIcon(QIcon(MONEY_ICO))
+		self.button_process_order.setIcon(get_icon(MONEY_ICO))
 		self.button_process_order.setIconSize(QSize(24, 24))  # Устанавливаем размер иконки (по желанию)
-		self.button_process_order.setToolTip("Оформите выбранную услугу")
+		self.button_process_order.setToolTip("Оформите выбранные услуги (Ctrl/Shift — выбор нескольких)")
 		self.button_process_order.clicked.connect(self.process_order)
 
 		# Создание кнопки "Выйти" с иконкой
 		self.button_logout = QPushButton("Выйти")
-		self.button_logout.setIcon(QIcon(EXIT_ICO))
+		self.button_logout.setIcon(get_icon(EXIT_ICO))
 		self.button_logout.setIconSize(QSize(24, 24))
 		self.button_logout.setToolTip("Выйти из аккаунта")
 		self.button_logout.clicked.connect(self.logout)
@@ -162,46 +198,58 @@ class RepairServiceApp(QMainWindow):
 		return vip_icons.get(vip_level.lower())
 
 	def apply_styles(self):
-		styles_path = resource_path("resources/styles/dark_theme.css")
-		with open(styles_path, "r", encoding = "utf-8") as style_fp:
-			self.setStyleSheet(style_fp.read())
+		# Стили применяются один раз на уровне приложения
+		apply_stylesheet()
 
 	def populate_services(self):
-		services = self.service_repo.get_services()
-		self.list_services.clear()  # Очистка списка перед добавлением новых элементов
-		for service in services:
-			item = QListWidgetItem(service.get_description())
-			item.setData(Qt.UserRole, service.uid)  # Сохраняем ID услуги
-			self.list_services.addItem(item)
+		# Сбрасываем модель: первая страница загрузится по запросу представления
+		self.services_model.reload()
+
+	def apply_search(self):
+		"""Показывает результаты поиска по введенному тексту (пустой текст — весь каталог)."""
+		self.services_model.set_query(self.search_input.text())
 
 	def process_order(self):
-		current_item = self.list_services.currentItem()
+		selected_indexes = sorted(self.list_services.selectionModel().selectedIndexes(), key = lambda index: index.row())
 		
-		if current_item is None:
+		if not selected_indexes:
 			QMessageBox.warning(self, "Ошибка", "Сначала выберите услугу!")
 			return
 		
-		# Предполагается, что данные услуги хранятся в тексте элемента
-		selected_service_uid = current_item.data(Qt.UserRole)
-		selected_service_data = self.service_repo.get_service(selected_service_uid)
-		selected_service = ServiceFactory.create_service(*selected_service_data)
-
-		booking = Booking(self.user, selected_service)
-		cost = booking.process_booking()
-		self.user.add_spent(cost)
+		# ID услуги хранится в роли Qt.UserRole модели
+		selected_services = []
+		for index in selected_indexes:
+			selected_service = self.service_repo.find_service(index.data(Qt.UserRole))
+			if selected_service is None:
+				QMessageBox.warning(self, "Ошибка", "Услуга больше недоступна!")
+				self.populate_services()
+				return
+			selected_services.append(selected_service)
+
+		# Вся корзина оценивается за один проход и записывается одной операцией
+		booking = CartBooking(self.user, selected_services, self.booking_repo)
+		try:
+			cost = booking.process_booking()
+		except ValueError as e:
+			# Например, каталог изменился после загрузки списка (сверка цен в единой базе данных)
+			QMessageBox.warning(self, "Ошибка", f"Заказ не оформлен: {e}")
+			self.populate_services()
+			return
 
-		# update
-		vip_icon_path = self.get_vip_icon_path(self.user.membership_level)
-		vip_pixmap = QPixmap(vip_icon_path) if vip_icon_path else QPixmap()
-		vip_pixmap = vip_pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-		self.vip_icon_label.setPixmap(vip_pixmap)
+		# update: иконка нового уровня берется из кэша без повторного декодирования
+		vip_pixmap = get_pixmap(self.get_vip_icon_path(self.user.membership_level), 32)
+		if not vip_pixmap.isNull():
+			self.vip_icon_label.setPixmap(vip_pixmap)
 		self.vip_icon_label.setToolTip(f"Скидка составляет: {self.user.get_membership_discount() * 100}%")
 
+		# Цены в списке пересчитываются для нового уровня
+		self.services_model.set_membership_level(self.user.membership_level)
+
 		# Текст VIP статуса
 		self.vip_label.setText(f"VIP: {self.user.membership_level}")
 		self.vip_label.setToolTip(f"Скидка составляет: {self.user.get_membership_discount() * 100}%")
 
-		QMessageBox.information(self, "Заказ оформлен", f"Стоимость: ${cost}")
+		QMessageBox.information(self, "Заказ оформлен", f"Услуг: {len(selected_services)}\nСтоимость: ${cost}")
 
 	def logout(self):
 		"""Обработка выхода пользователя"""
@@ -213,5 +261,8 @@ class RepairServiceApp(QMainWindow):
 			QMessageBox.No
 		)
 		if reply == QMessageBox.Yes:
-			os.remove(".auth")
+			if self.session_manager is not None:
+				AuthDialog.clear_auth_cache(self.session_manager, self.auth_cache_path)
+			elif os.path.exists(self.auth_cache_path):
+				os.remove(self.auth_cache_path)
 			self.close()
\ No newline at end of file
@@ -0,0 +1,123 @@
+# QT
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QVariant
+
+# Models
+from models.repair_service import SQLiteServiceRepository
+from models.pricing import PricingEngine
+
+
+class ServiceListModel(QAbstractListModel):
+	"""
+	Ленивая модель каталога услуг для QListView.
+	Загружает услуги страницами по мере прокрутки списка, поэтому открытие окна
+	стоит одинаково для каталога из 10 и из миллиона записей.
+	В режиме поиска показывает результаты полнотекстового поиска, упорядоченные по релевантности.
+	Если задан движок цен, рядом с услугой показывается цена для уровня членства пользователя.
+	"""
+
+	def __init__(
+		self,
+		service_repo: SQLiteServiceRepository,
+		page_size: int = 100,
+		search_limit: int = 200,
+		parent = None,
+		pricing_engine: PricingEngine = None,
+		membership_level: str = None
+	):
+		super().__init__(parent)
+		self.service_repo = service_repo
+		self.page_size = page_size
+		self.search_limit = search_limit
+		self.pricing_engine = pricing_engine
+		self.membership_level = membership_level
+		self.query = ""
+		self._services = []
+		self._prices = []
+		self._last_key = 0
+		self._exhausted = False
+
+	def rowCount(self, parent = QModelIndex()) -> int:
+		if parent.isValid():
+			return 0
+		return len(self._services)
+
+	def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+		if not index.isValid() or index.row() >= len(self._services):
+			return QVariant()
+
+		service = self._services[index.row()]
+		price = self._prices[index.row()] if self._prices else None
+		if role == Qt.DisplayRole:
+			if price is None:
+				return service.get_description()
+			return f"{service.get_description()} — ${price:.2f}"
+		if role == Qt.UserRole:
+			return service.get_uid()
+		if role == Qt.ToolTipRole:
+			if price is None:
+				return f"Стоимость: ${service.get_cost()}"
+			return f"Стоимость: ${service.get_cost()}\nВаша цена: ${price:.2f}"
+		return QVariant()
+
+	def quote(self, services: list) -> list:
+		"""Рассчитывает цены пользователя для набора услуг одним пакетным вызовом."""
+		if self.pricing_engine is None or self.membership_level is None:
+			return []
+		return list(self.pricing_engine.quote_many([service.get_cost() for service in services], self.membership_level))
+
+	def set_membership_level(self, membership_level: str) -> None:
+		"""Пересчитывает цены загруженных услуг после смены уровня членства."""
+		if membership_level == self.membership_level:
+			return
+		self.membership_level = membership_level
+		self._prices = self.quote(self._services)
+		if self._services:
+			self.dataChanged.emit(self.index(0), self.index(len(self._services) - 1), [Qt.DisplayRole, Qt.ToolTipRole])
+
+	def canFetchMore(self, parent = QModelIndex()) -> bool:
+		if parent.isValid():
+			return False
+		return not self._exhausted
+
+	def fetchMore(self, parent = QModelIndex()) -> None:
+		if parent.isValid() or self._exhausted:
+			return
+
+		services, self._last_key = self.service_repo.get_services_page(self._last_key, self.page_size)
+		if len(services) < self.page_size:
+			self._exhausted = True
+		if not services:
+			return
+
+		first = len(self._services)
+		self.beginInsertRows(QModelIndex(), first, first + len(services) - 1)
+		self._services.extend(services)
+		self._prices.extend(self.quote(services))
+		self.endInsertRows()
+
+	def service(self, index: QModelIndex):
+		"""Возвращает объект услуги для индекса списка или None."""
+		if not index.isValid() or index.row() >= len(self._services):
+			return None
+		return self._services[index.row()]
+
+	def reload(self) -> None:
+		"""Сбрасывает загруженные страницы; первая страница будет загружена представлением заново."""
+		self.set_query(self.query)
+
+	def set_query(self, query: str) -> None:
+		"""
+		Переключает модель на результаты поиска по строке query.
+		Пустая строка возвращает постраничный просмотр всего каталога.
+		"""
+		self.beginResetModel()
+		self.query = query.strip()
+		self._last_key = 0
+		if self.query:
+			self._services = self.service_repo.search_services(self.query, self.search_limit)
+			self._exhausted = True
+		else:
+			self._services = []
+			self._exhausted = False
+		self._prices = self.quote(self._services)
+		self.endResetModel()
@@ -0,0 +1,245 @@
+"""
+Набор нагрузочных тестов для репозиториев, бронирования и авторизации.
+Не требует дисплея и PyQt5: работает только с моделями.
+
+Примеры:
+	python benchmarks/run_benchmarks.py --sizes 1000,100000 --output results.json
+	python benchmarks/run_benchmarks.py --sizes 1000 --compare results.json
+"""
+
+# DB
+import sqlite3
+
+# Another
+import argparse, datetime, json, os, platform, random, subprocess, sys, tempfile, time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Models
+from models.repair_service import SQLiteServiceRepository, PlumbingService, ElectricalService
+from models.user import SQLiteUserRepository, User
+from models.booking import Booking, CartBooking, SQLiteBookingRepository
+
+
+DESCRIPTIONS = (
+	"Замена крана", "Ремонт электропроводки", "Устранение утечек", "Установка розеток",
+	"Чистка труб", "Обслуживание электрощитов", "Монтаж водопровода", "Установка светильников",
+)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+	"""Перцентиль методом ближайшего ранга по отсортированному списку."""
+	if not sorted_values:
+		return 0.0
+	rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+	return sorted_values[rank]
+
+
+def summarize(latencies: list, total: float = None) -> dict:
+	"""Сводка по списку длительностей операций (в секундах)."""
+	values = sorted(latencies)
+	total = sum(values) if total is None else total
+	return {
+		"ops": len(values),
+		"total_s": round(total, 6),
+		"throughput_ops_s": round(len(values) / total, 2) if total > 0 else None,
+		"p50_ms": round(percentile(values, 0.50) * 1000, 4),
+		"p90_ms": round(percentile(values, 0.90) * 1000, 4),
+		"p99_ms": round(percentile(values, 0.99) * 1000, 4),
+		"max_ms": round(values[-1] * 1000, 4) if values else 0.0,
+	}
+
+
+def measure(fn, args_list: list) -> dict:
+	"""Вызывает fn для каждого набора аргументов и возвращает сводку по задержкам."""
+	latencies = []
+	for args in args_list:
+		started_at = time.perf_counter()
+		fn(*args)
+		latencies.append(time.perf_counter() - started_at)
+	return summarize(latencies)
+
+
+def generate_services(count: int):
+	for i in range(count):
+		service_class = PlumbingService if i % 2 == 0 else ElectricalService
+		yield service_class(description=f"{DESCRIPTIONS[i % len(DESCRIPTIONS)]} №{i}", cost=float(40 + i % 60))
+
+
+def seed_users(user_repo: SQLiteUserRepository, count: int, password_hash: bytes) -> list:
+	"""Массово создает пользователей с одним заранее вычисленным хэшем, чтобы не платить bcrypt за каждого."""
+	logins = [f"user{i}" for i in range(count)]
+	with user_repo.connection:
+		user_repo.connection.executemany(
+			"INSERT INTO users (login, password_hash, total_spent, membership_level) VALUES (?, ?, 0.0, 'Bronze')",
+			((login, password_hash) for login in logins)
+		)
+	return logins
+
+
+def run_size(size: int, args, db_dir: str) -> dict:
+	"""Запускает все замеры для каталога и базы пользователей размера size."""
+	rng = random.Random(args.seed)
+	results = {}
+	services_db = os.path.join(db_dir, f"services_{size}.db")
+	users_db = os.path.join(db_dir, f"users_{size}.db")
+	# Базы прошлого прогона в --db-dir удаляются: замеры идут на каталоге размера size и новых пользователях
+	for path in (services_db, users_db):
+		for suffix in ("", "-wal", "-shm"):
+			if os.path.exists(path + suffix):
+				os.remove(path + suffix)
+	service_repo = SQLiteServiceRepository(services_db)
+	user_repo = SQLiteUserRepository(users_db)
+
+	# Наполнение каталога (одна транзакция) — заодно замер массовой загрузки
+	started_at = time.perf_counter()
+	service_repo.add_services(generate_services(size), chunk_size=10000)
+	elapsed = time.perf_counter() - started_at
+	results["add_services_bulk"] = {"ops": size, "total_s": round(elapsed, 6), "throughput_ops_s": round(size / elapsed, 2)}
+
+	results["add_service"] = measure(
+		service_repo.add_service,
+		[(PlumbingService(description="Новая услуга", cost=50.0),) for _ in range(args.ops)]
+	)
+
+	get_services_runs = max(1, min(args.repeat, 10_000_000 // max(size, 1)))
+	results["get_services"] = measure(service_repo.get_services, [()] * get_services_runs)
+
+	uids = [row[0] for row in service_repo.connection.execute(
+		"SELECT id FROM services ORDER BY RANDOM() LIMIT ?", (args.ops,)
+	)]
+	service_repo.cache.clear()
+	results["get_service_cold"] = measure(service_repo.get_service, [(uid,) for uid in uids])
+	results["get_service_warm"] = measure(service_repo.get_service, [(uid,) for uid in uids])
+
+	# Пользователи
+	password = "benchmark-password"
+	password_hash = SQLiteUserRepository.hash_password(password)
+	logins = seed_users(user_repo, size, password_hash)
+
+	results["add_user"] = measure(
+		user_repo.add_user,
+		[(f"new_user{i}", password) for i in range(args.auth_ops)]
+	)
+	results["verify_user"] = measure(
+		user_repo.verify_user,
+		[(rng.choice(logins), password) for _ in range(args.auth_ops)]
+	)
+	results["update_spending"] = measure(
+		user_repo.update_spending,
+		[(rng.choice(logins), 10.0) for _ in range(args.ops)]
+	)
+
+	services = [service_repo.find_service(uid) for uid in uids]
+	users = [User(*user_repo.get_user(rng.choice(logins)), user_repo=user_repo) for _ in range(len(services))]
+	results["process_booking"] = measure(
+		lambda user, service: Booking(user, service).process_booking(),
+		list(zip(users, services))
+	)
+	# Полный путь заказа: корзина из трех услуг, журнал бронирований и расходы в одной транзакции
+	booking_repo = SQLiteBookingRepository(user_repo)
+	results["cart_booking"] = measure(
+		lambda user, cart: CartBooking(user, cart, booking_repo).process_booking(),
+		[(user, [rng.choice(services) for _ in range(3)]) for user in users]
+	)
+
+	service_repo.connection_manager.close_all()
+	user_repo.connection_manager.close_all()
+	return results
+
+
+def git_revision() -> str:
+	try:
+		return subprocess.check_output(
+			["git", "rev-parse", "--short", "HEAD"],
+			cwd=os.path.dirname(os.path.abspath(__file__)),
+			stderr=subprocess.DEVNULL
+		).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+	"""
+	Сравнивает результаты с базовым прогоном.
+
+	:return: Список строк с регрессиями: p50 вырос или пропускная способность упала больше чем на threshold.
+	"""
+	regressions = []
+	for size, benchmarks in current["results"].items():
+		for name, result in benchmarks.items():
+			base = baseline.get("results", {}).get(size, {}).get(name)
+			if base is None:
+				continue
+			if base.get("p50_ms") and result.get("p50_ms") is not None:
+				change = result["p50_ms"] / base["p50_ms"] - 1
+				if change > threshold:
+					regressions.append(f"{name}@{size}: p50 {base['p50_ms']} -> {result['p50_ms']} мс (+{change:.0%})")
+			elif base.get("throughput_ops_s") and result.get("throughput_ops_s"):
+				change = 1 - result["throughput_ops_s"] / base["throughput_ops_s"]
+				if change > threshold:
+					regressions.append(
+						f"{name}@{size}: {base['throughput_ops_s']} -> {result['throughput_ops_s']} оп/с (-{change:.0%})"
+					)
+	return regressions
+
+
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description="Нагрузочные тесты репозиториев, бронирования и авторизации")
+	parser.add_argument("--sizes", default="1000,10000", help="размеры наборов данных через запятую (1000..1000000)")
+	parser.add_argument("--ops", type=int, default=500, help="количество операций на замер")
+	parser.add_argument("--auth-ops", type=int, default=5, help="количество операций bcrypt (add_user, verify_user)")
+	parser.add_argument("--repeat", type=int, default=5, help="повторов полной загрузки каталога")
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("--db-dir", help="каталог для баз данных (по умолчанию временный; базы прошлого прогона в нем перезаписываются)")
+	parser.add_argument("--output", help="файл для записи результатов в JSON")
+	parser.add_argument("--compare", help="JSON предыдущего прогона для поиска регрессий")
+	parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение (0.2 = 20%%)")
+	return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+	args = parse_args(sys.argv[1:] if argv is None else argv)
+	sizes = [int(size) for size in args.sizes.split(",") if size]
+
+	report = {
+		"meta": {
+			"created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+			"git_revision": git_revision(),
+			"python": platform.python_version(),
+			"sqlite": sqlite3.sqlite_version,
+			"platform": platform.platform(),
+			"ops": args.ops,
+			"auth_ops": args.auth_ops,
+		},
+		"results": {},
+	}
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		db_dir = args.db_dir or tmp_dir
+		os.makedirs(db_dir, exist_ok=True)
+		for size in sizes:
+			print(f"Набор данных: {size}", file=sys.stderr)
+			report["results"][str(size)] = run_size(size, args, db_dir)
+			for name, result in report["results"][str(size)].items():
+				print(f"  {name:<20} {json.dumps(result, ensure_ascii=False)}", file=sys.stderr)
+
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as fp:
+			json.dump(report, fp, ensure_ascii=False, indent=2)
+	else:
+		json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+		print()
+
+	if args.compare:
+		with open(args.compare, "r", encoding="utf-8") as fp:
+			regressions = compare(report, json.load(fp), args.threshold)
+		for regression in regressions:
+			print(f"РЕГРЕССИЯ: {regression}", file=sys.stderr)
+		if regressions:
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
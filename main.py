@@ -1,54 +1,161 @@
-# QT
-from PyQt5.QtWidgets import QApplication, QDialog
+# Utils
+from utils.startup_profiler import StartupProfiler
 
-# Windows
-from app import *
+# Another
+import argparse, sys
 
-# Models
-from models import *
+# Тяжелые модули (PyQt5, окна, репозитории) импортируются внутри main(),
+# чтобы их стоимость попадала в профиль запуска и не платилась при разборе аргументов
 
-# Utils
-from utils import *
 
-# Another
-import sys
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description = "Repair Service Management App")
+	parser.add_argument(
+		"--profile-startup",
+		action = "store_true",
+		help = "вывести длительность фаз запуска в stderr"
+	)
+	parser.add_argument(
+		"--sql-metrics",
+		metavar = "PATH",
+		help = "собирать метрики SQL-запросов и периодически записывать их в JSON-файл"
+	)
+	parser.add_argument(
+		"--slow-query-ms",
+		type = float,
+		default = 100.0,
+		help = "порог медленного запроса в миллисекундах (для --sql-metrics)"
+	)
+	parser.add_argument(
+		"--write-behind",
+		action = "store_true",
+		help = "записывать расходы через журнал spending.journal и сохранять их в базу группами"
+	)
+	parser.add_argument(
+		"--database",
+		metavar = "PATH",
+		help = "единая база данных услуг и пользователей: заказ сверяется с каталогом и записывается одной транзакцией"
+	)
+	parser.add_argument(
+		"--server",
+		metavar = "URL",
+		help = "работать через сервер бронирований (server.py) вместо локальных баз данных"
+	)
+	# Остальные аргументы (например, -style) передаются в QApplication
+	args, qt_args = parser.parse_known_args(argv)
+	if args.write_behind and args.database:
+		# Заказ из журнала попадает в базу позже, уже без сверки цен с каталогом в одной транзакции
+		parser.error("--write-behind нельзя использовать вместе с --database")
+	return args, qt_args
+
+
+def seed_services(service_repo) -> None:
+	"""Добавляет стартовый набор услуг в пустой каталог."""
+	from models.repair_service import PlumbingService, ElectricalService
+
+	service_repo.add_services([
+		PlumbingService(description="Замена крана", cost=50.0),
+		ElectricalService(description="Ремонт электропроводки", cost=80.0),
+		PlumbingService(description="Устранение утечек", cost=60.0),
+		ElectricalService(description="Установка розеток", cost=70.0),
+		PlumbingService(description="Чистка труб", cost=55.0),
+		ElectricalService(description="Обслуживание электрощитов", cost=90.0),
+		PlumbingService(description="Монтаж водопровода", cost=65.0),
+		ElectricalService(description="Установка светильников", cost=75.0),
+		PlumbingService(description="Ремонт сифонов", cost=45.0),
+		ElectricalService(description="Диагностика электрооборудования", cost=85.0)
+	])
 
 
 def main():
-	app = QApplication(sys.argv)
-	service_repo = SQLiteServiceRepository("services.db")
-	user_repo = SQLiteUserRepository("users.db")
-
-	# Проверка авторизационного кеша
-	user = AuthDialog.load_auth_cache(user_repo)
-
-	# Проверяем, есть ли услуги в базе данных, и добавляем их, если база пустая
-	if not service_repo.get_services():
-		services_to_add = [
-			PlumbingService(description="Замена крана", cost=50.0),
-			ElectricalService(description="Ремонт электропроводки", cost=80.0),
-			PlumbingService(description="Устранение утечек", cost=60.0),
-			ElectricalService(description="Установка розеток", cost=70.0),
-			PlumbingService(description="Чистка труб", cost=55.0),
-			ElectricalService(description="Обслуживание электрощитов", cost=90.0),
-			PlumbingService(description="Монтаж водопровода", cost=65.0),
-			ElectricalService(description="Установка светильников", cost=75.0),
-			PlumbingService(description="Ремонт сифонов", cost=45.0),
-			ElectricalService(description="Диагностика электрооборудования", cost=85.0)
-		]
-
-		for service in services_to_add:
-			service_repo.add_service(service)
+	args, qt_args = parse_args(sys.argv[1:])
+	profiler = StartupProfiler(enabled = args.profile_startup)
+
+	with profiler.phase("Импорт PyQt5"):
+		from PyQt5.QtWidgets import QApplication, QDialog
+		from PyQt5.QtCore import QTimer
+
+	with profiler.phase("Импорт моделей"):
+		from models.repair_service import SQLiteServiceRepository
+		from models.user import SQLiteUserRepository
+		from models.session import SessionManager
+		from models.booking import SQLiteBookingRepository
+		from models.instrumentation import SQLMetrics
+
+	with profiler.phase("Импорт окон"):
+		from app.auth_dialog import AuthDialog
+		from app.main_window import RepairServiceApp
+		from utils.assets import apply_stylesheet, set_pixmap_cache_limit
+
+	with profiler.phase("QApplication и стили"):
+		app = QApplication(sys.argv[:1] + qt_args)
+		set_pixmap_cache_limit()
+		apply_stylesheet()
+
+	metrics = None
+	if args.sql_metrics:
+		metrics = SQLMetrics(slow_query_ms = args.slow_query_ms)
+		metrics.start_periodic_dump(args.sql_metrics, interval = 30.0)
+		app.aboutToQuit.connect(metrics.stop_periodic_dump)
+
+	with profiler.phase("Открытие баз данных"):
+		if args.server:
+			# Режим клиента: базы данных открывает только сервер, запись идет через его групповые транзакции
+			from api.client import (
+				ApiClient, RemoteServiceRepository, RemoteUserRepository, RemoteSessionManager, RemoteBookingRepository
+			)
+			client = ApiClient(args.server)
+			service_repo = RemoteServiceRepository(client)
+			user_repo = RemoteUserRepository(client)
+			session_manager = RemoteSessionManager(client)
+			booking_repo = RemoteBookingRepository(client)
+		else:
+			if args.database:
+				# Отдельные services.db и users.db переносятся в единую базу инструментом tools/unify_databases.py
+				from models.unified import UnifiedDatabase
+				database = UnifiedDatabase(args.database, metrics = metrics)
+				service_repo, user_repo = database.service_repo, database.user_repo
+			else:
+				service_repo = SQLiteServiceRepository("services.db", metrics = metrics)
+				user_repo = SQLiteUserRepository("users.db", metrics = metrics)
+			if args.write_behind:
+				# Заказ дописывается в журнал, а в базу расходы попадают одной транзакцией раз в секунду
+				from models.spending_journal import SpendingAccumulator
+				user_repo = SpendingAccumulator(user_repo, "spending.journal")
+				app.aboutToQuit.connect(user_repo.close)
+				booking_repo = user_repo
+			else:
+				booking_repo = SQLiteBookingRepository(user_repo, service_repo if args.database else None)
+			session_manager = SessionManager(user_repo, SessionManager.load_secret())
+
+	with profiler.phase("Проверка сессии"):
+		# Проверка авторизационного кеша (токен сессии, без bcrypt)
+		user = AuthDialog.load_auth_cache(user_repo, session_manager)
+
+	with profiler.phase("Проверка каталога"):
+		# Проверяем, есть ли услуги в базе данных (без загрузки каталога), и добавляем их, если база пустая
+		if not args.server and not service_repo.has_services():
+			seed_services(service_repo)
+
+	def report_first_paint():
+		profiler.mark("Первая отрисовка")
+		profiler.report()
 
 	if user:
 		# Если пользователь уже авторизован, открыть главное окно
-		main_window = RepairServiceApp(service_repo, user)
-		main_window.show()
+		with profiler.phase("Создание главного окна"):
+			main_window = RepairServiceApp(service_repo, user, session_manager, booking_repo = booking_repo)
+			main_window.show()
+		# Таймер срабатывает в первой итерации цикла событий, после отрисовки показанного окна
+		QTimer.singleShot(0, report_first_paint)
 	else:
 		# Иначе показать диалог авторизации/регистрации
-		auth_dialog = AuthDialog(user_repo)
+		with profiler.phase("Создание диалога авторизации"):
+			auth_dialog = AuthDialog(user_repo, session_manager = session_manager)
+		# Первая отрисовка — диалог авторизации; время ввода пароля в профиль не входит
+		QTimer.singleShot(0, report_first_paint)
 		if auth_dialog.exec_() == QDialog.Accepted and auth_dialog.user:
-			main_window = RepairServiceApp(service_repo, auth_dialog.user)
+			main_window = RepairServiceApp(service_repo, auth_dialog.user, session_manager, booking_repo = booking_repo)
 			main_window.show()
 		else:
 			# Если авторизация не прошла, завершить приложение
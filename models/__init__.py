@@ -1,3 +1,11 @@
+from .database import ConnectionManager
 from .user import User, SQLiteUserRepository
-from .repair_service import SQLiteServiceRepository, PlumbingService, ElectricalService, ServiceFactory
-from .booking import Booking
\ No newline at end of file
+from .repair_service import SQLiteServiceRepository, PlumbingService, ElectricalService, ServiceFactory, ServiceCatalog
+from .booking import Booking, CartBooking, SQLiteBookingRepository
+from .session import SessionManager
+from .pricing import PricingEngine
+from .instrumentation import SQLMetrics
+from .async_repository import AsyncExecutor, AsyncServiceRepository, AsyncUserRepository, AsyncBookingRepository
+from .spending_journal import SpendingAccumulator
+from .reports import ReportRepository
+from .unified import UnifiedDatabase
@@ -0,0 +1,210 @@
+# Models
+from models.repair_service import SQLiteServiceRepository, RepairService
+from models.user import SQLiteUserRepository
+from models.booking import SQLiteBookingRepository
+
+# Another
+from concurrent.futures import Executor, ThreadPoolExecutor
+import asyncio, functools, os, weakref
+
+
+class AsyncExecutor:
+	"""
+	Выполняет блокирующие функции вне цикла событий. Очередь ограничена: если в исполнителе
+	уже max_pending задач, следующие корутины ждут освобождения места, а не копят задачи в памяти.
+	Один экземпляр можно разделять между несколькими асинхронными репозиториями.
+	"""
+
+	def __init__(self, max_workers: int = 1, max_pending: int = 1000, executor: Executor = None, name: str = "db"):
+		"""
+		:param max_workers: Количество потоков, если executor не задан.
+		:param max_pending: Максимальное количество задач в исполнителе (выполняемых и ожидающих).
+		:param executor: Готовый исполнитель (например, ProcessPoolExecutor для bcrypt).
+		:param name: Префикс имен потоков.
+		"""
+		self.owns_executor = executor is None
+		self.executor = executor or ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = name)
+		self.max_pending = max_pending
+		# asyncio.Semaphore привязывается к циклу событий, поэтому для каждого цикла свой
+		self._semaphores = weakref.WeakKeyDictionary()
+
+	def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+		semaphore = self._semaphores.get(loop)
+		if semaphore is None:
+			semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_pending)
+		return semaphore
+
+	async def run(self, fn, *args, **kwargs):
+		"""Выполняет fn(*args, **kwargs) в исполнителе и возвращает результат."""
+		loop = asyncio.get_running_loop()
+		semaphore = self._semaphore(loop)
+		await semaphore.acquire()
+		try:
+			future = self.executor.submit(functools.partial(fn, *args, **kwargs))
+		except BaseException:
+			semaphore.release()
+			raise
+
+		def release(_):
+			# Место освобождается, когда задача действительно завершилась, даже если корутину отменили
+			try:
+				loop.call_soon_threadsafe(semaphore.release)
+			except RuntimeError:
+				pass  # цикл событий уже закрыт
+
+		future.add_done_callback(release)
+		return await asyncio.wrap_future(future)
+
+	def shutdown(self, wait: bool = True) -> None:
+		if self.owns_executor:
+			self.executor.shutdown(wait = wait)
+
+
+def default_hash_executor() -> AsyncExecutor:
+	"""Исполнитель для bcrypt: bcrypt освобождает GIL, поэтому достаточно пула потоков по числу ядер."""
+	return AsyncExecutor(max_workers = os.cpu_count() or 1, max_pending = 10000, name = "bcrypt")
+
+
+class AsyncServiceRepository:
+	"""Асинхронный интерфейс SQLiteServiceRepository: запросы выполняются в исполнителе базы данных."""
+
+	def __init__(self, service_repo: SQLiteServiceRepository, db_executor: AsyncExecutor = None):
+		"""
+		:param service_repo: Синхронный репозиторий услуг.
+		:param db_executor: Исполнитель запросов (по умолчанию — собственный поток с очередью на 1000 задач).
+		"""
+		self.service_repo = service_repo
+		self.db_executor = db_executor or AsyncExecutor()
+		self._owns_executor = db_executor is None
+
+	async def add_service(self, service: RepairService) -> None:
+		await self.db_executor.run(self.service_repo.add_service, service)
+
+	async def add_services(self, services, chunk_size: int = 1000, on_conflict: str = "error") -> int:
+		return await self.db_executor.run(self.service_repo.add_services, services, chunk_size, on_conflict)
+
+	async def get_services(self, columnar: bool = False):
+		return await self.db_executor.run(self.service_repo.get_services, columnar)
+
+	async def get_services_page(self, after: int = 0, limit: int = 100) -> tuple:
+		return await self.db_executor.run(self.service_repo.get_services_page, after, limit)
+
+	async def find_service(self, uid: str):
+		# Попадание в кэш обслуживается без перехода в другой поток. Кэш сначала сверяется с базой
+		# (как в find_service), но не чаще раза в cache_check_interval секунд
+		self.service_repo.validate_cache()
+		service = self.service_repo.cache.get(uid)
+		if service is not None:
+			return service
+		return await self.db_executor.run(self.service_repo.find_service, uid)
+
+	async def find_services(self, service_type = None, min_cost: float = None, max_cost: float = None, limit: int = None) -> list:
+		return await self.db_executor.run(self.service_repo.find_services, service_type, min_cost, max_cost, limit)
+
+	async def search_services(self, query: str, limit: int = 50) -> list:
+		return await self.db_executor.run(self.service_repo.search_services, query, limit)
+
+	async def has_services(self) -> bool:
+		return await self.db_executor.run(self.service_repo.has_services)
+
+	async def get_service(self, uid: str) -> tuple:
+		return await self.db_executor.run(self.service_repo.get_service, uid)
+
+	def close(self) -> None:
+		if self._owns_executor:
+			self.db_executor.shutdown()
+
+
+class AsyncUserRepository:
+	"""
+	Асинхронный интерфейс SQLiteUserRepository. Запросы выполняются в исполнителе базы данных,
+	хэширование и проверка паролей bcrypt — в отдельном исполнителе, чтобы не занимать поток базы данных.
+	"""
+
+	def __init__(self, user_repo: SQLiteUserRepository, db_executor: AsyncExecutor = None, hash_executor: AsyncExecutor = None):
+		"""
+		:param user_repo: Синхронный репозиторий пользователей.
+		:param db_executor: Исполнитель запросов (по умолчанию — собственный поток с очередью на 1000 задач).
+		:param hash_executor: Исполнитель bcrypt (по умолчанию — пул потоков по числу ядер).
+		"""
+		self.user_repo = user_repo
+		self.db_executor = db_executor or AsyncExecutor()
+		self.hash_executor = hash_executor or default_hash_executor()
+		self._owned_executors = [
+			executor for executor, given in ((self.db_executor, db_executor), (self.hash_executor, hash_executor))
+			if given is None
+		]
+
+	async def is_login_exists(self, login: str) -> bool:
+		return await self.db_executor.run(self.user_repo.is_login_exists, login)
+
+	async def add_user(self, login: str, password: str) -> bool:
+		if await self.is_login_exists(login):
+			return False
+		password_hash = await self.hash_password(password)
+		return await self.add_user_with_hash(login, password_hash)
+
+	async def add_user_with_hash(self, login: str, password_hash: bytes) -> bool:
+		return await self.db_executor.run(self.user_repo.add_user_with_hash, login, password_hash)
+
+	async def get_user(self, login: str):
+		return await self.db_executor.run(self.user_repo.get_user, login)
+
+	async def get_user_password_hash(self, login: str):
+		return await self.db_executor.run(self.user_repo.get_user_password_hash, login)
+
+	async def get_user_membership_level(self, login: str) -> str:
+		return await self.db_executor.run(self.user_repo.get_user_membership_level, login)
+
+	async def get_users_by_membership(self, membership_level: str, min_spent: float = None, limit: int = None) -> list:
+		return await self.db_executor.run(self.user_repo.get_users_by_membership, membership_level, min_spent, limit)
+
+	async def verify_user(self, login: str, password: str) -> bool:
+		stored_hash = await self.get_user_password_hash(login)
+		if stored_hash is None:
+			return False
+		return await self.check_password(password, stored_hash)
+
+	async def check_password(self, password: str, stored_hash: bytes) -> bool:
+		return await self.hash_executor.run(SQLiteUserRepository.check_password, password, stored_hash)
+
+	async def hash_password(self, password: str) -> bytes:
+		return await self.hash_executor.run(SQLiteUserRepository.hash_password, password)
+
+	async def recalculate_membership_levels(self) -> int:
+		return await self.db_executor.run(self.user_repo.recalculate_membership_levels)
+
+	async def add_spending(self, login: str, amount: float):
+		return await self.db_executor.run(self.user_repo.add_spending, login, amount)
+
+	async def update_spending(self, login: str, amount: float) -> bool:
+		return await self.db_executor.run(self.user_repo.update_spending, login, amount)
+
+	def close(self) -> None:
+		for executor in self._owned_executors:
+			executor.shutdown()
+
+
+class AsyncBookingRepository:
+	"""Асинхронный интерфейс журнала бронирований SQLiteBookingRepository."""
+
+	def __init__(self, booking_repo: SQLiteBookingRepository, db_executor: AsyncExecutor = None):
+		self.booking_repo = booking_repo
+		self.db_executor = db_executor or AsyncExecutor()
+		self._owns_executor = db_executor is None
+
+	async def record_bookings(self, login: str, lines: list, created_at: float = None):
+		return await self.db_executor.run(self.booking_repo.record_bookings, login, lines, created_at)
+
+	async def get_user_history(self, login: str, since: float = None, until: float = None, limit: int = 100) -> list:
+		return await self.db_executor.run(self.booking_repo.get_user_history, login, since, until, limit)
+
+	async def get_user_total(self, login: str, since: float = None, until: float = None) -> tuple:
+		return await self.db_executor.run(self.booking_repo.get_user_total, login, since, until)
+
+	async def get_service_stats(self, service_id: str, since: float = None, until: float = None) -> tuple:
+		return await self.db_executor.run(self.booking_repo.get_service_stats, service_id, since, until)
+
+	def close(self) -> None:
+		if self._owns_executor:
+			self.db_executor.shutdown()
@@ -1,7 +1,27 @@
-from models.user import User
+# DB
+import sqlite3
+from models.database import retry_on_busy
+
+# Models
+from models.user import User, SQLiteUserRepository, membership_level_sql
+
+# Another
+from typing import NamedTuple
+import time
+
+
+class BookingLine(NamedTuple):
+	"""Строка заказа: услуга и ее цена с учетом скидки уровня членства."""
+	service_id: str
+	list_price: float
+	discount: float
+	final_price: float
+	membership_level: str
 
 
 class Booking:
+	__slots__ = ("user", "service")
+
 	def __init__(self, user: User, service):
 		self.user = user
 		self.service = service
@@ -12,3 +32,242 @@ class Booking:
 		discount_amount = cost * discount
 		cost -= discount_amount
 		return cost
+
+
+class CartBooking:
+	"""
+	Бронирование корзины услуг одной операцией: вся корзина оценивается за один проход,
+	а расходы пользователя записываются одной транзакцией.
+	"""
+
+	__slots__ = ("user", "services", "booking_repo")
+
+	def __init__(self, user: User, services: list, booking_repo = None):
+		"""
+		:param user: Пользователь, оформляющий заказ.
+		:param services: Услуги корзины.
+		:param booking_repo: Журнал бронирований (SQLiteBookingRepository). Если задан, строки заказа
+			и расходы пользователя записываются в него одной транзакцией.
+		"""
+		self.user = user
+		self.services = list(services)
+		self.booking_repo = booking_repo
+
+	def price_cart(self) -> list:
+		"""
+		Рассчитывает стоимость каждой услуги корзины. Если по ходу корзины сумма расходов
+		переходит порог следующего уровня, последующие услуги получают новую скидку.
+
+		:return: Список BookingLine в порядке услуг корзины.
+		"""
+		# Уровни членства могли изменить другие процессы; проверка дешева и выполняется не чаще раза в секунду
+		user_repo = self.user.user_repo or getattr(self.booking_repo, "user_repo", None)
+		refresh_tiers = getattr(user_repo, "refresh_membership_tiers", None)
+		if refresh_tiers is not None:
+			refresh_tiers()
+
+		running_total = self.user.total_spent
+		level = self.user.membership_level
+		lines = []
+		for service in self.services:
+			cost = service.get_cost()
+			discount = User.get_discount_for_level(level)
+			final_price = cost - cost * discount
+			lines.append(BookingLine(service.get_uid(), cost, discount, final_price, level))
+
+			running_total += final_price
+			level = User.determine_membership_level(running_total)
+		return lines
+
+	def process_booking(self) -> float:
+		"""
+		Оформляет корзину и записывает расходы пользователя одной операцией.
+
+		:return: Итоговая стоимость корзины.
+		"""
+		lines = self.price_cart()
+		total = sum(line.final_price for line in lines)
+		if not lines:
+			return total
+
+		if self.booking_repo is None:
+			self.user.add_spent(total)
+			return total
+
+		if getattr(self.booking_repo, "remote", False):
+			# Сервер пересчитывает цены по актуальным расходам пользователя; итог берется из его ответа
+			lines, state = self.booking_repo.book_cart(self.user.login, lines)
+			total = sum(line.final_price for line in lines)
+		else:
+			state = self.booking_repo.record_bookings(self.user.login, lines)
+		if state is None:
+			raise ValueError(f"Unknown user: {self.user.login}")
+		self.user.total_spent, self.user.membership_level = state
+		return total
+
+
+# Журнал бронирований: хранится в базе пользователей, записи только добавляются
+class SQLiteBookingRepository:
+	INSERT_SQL = '''
+		INSERT INTO bookings (login, service_id, list_price, discount, final_price, created_at)
+		VALUES (?, ?, ?, ?, ?, ?)
+	'''
+
+	def __init__(self, user_repo: SQLiteUserRepository, service_repo = None):
+		"""
+		:param user_repo: Репозиторий пользователей; журнал использует его соединение,
+			чтобы строки заказа и расходы пользователя записывались одной транзакцией.
+		:param service_repo: Репозиторий услуг той же (единой) базы данных. Если задан, цены заказа
+			сверяются с каталогом в транзакции записи заказа.
+		"""
+		if service_repo is not None and service_repo.connection_manager is not user_repo.connection_manager:
+			raise ValueError("Service repository must share the users database connection")
+		self.user_repo = user_repo
+		self.service_repo = service_repo
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		return self.user_repo.connection
+
+	@retry_on_busy
+	def record_bookings(self, login: str, lines: list, created_at: float = None):
+		"""
+		Записывает строки заказа в журнал и увеличивает расходы пользователя одной транзакцией.
+
+		:param login: Логин пользователя.
+		:param lines: Список BookingLine.
+		:param created_at: Время заказа (unix time); по умолчанию текущее.
+		:return: Кортеж (новый total_spent, новый уровень членства) или None, если пользователь не найден.
+		"""
+		with self.connection:
+			if self.service_repo is not None:
+				# Блокировка записи берется до чтения каталога, чтобы цены не изменились до записи заказа
+				self.connection.execute("BEGIN IMMEDIATE")
+				self.check_prices(self.connection, lines)
+			state = self.write_bookings(self.connection, login, lines, created_at)
+			self.connection.commit()
+		return state
+
+	@staticmethod
+	def check_prices(connection: sqlite3.Connection, lines: list) -> None:
+		"""
+		Сверяет цены строк заказа с таблицей services в текущей транзакции (только в единой базе данных).
+
+		:raises ValueError: Услуга удалена из каталога или ее цена изменилась после расчета заказа.
+		"""
+		uids = list({line.service_id for line in lines})
+		costs = dict(connection.execute(
+			f'SELECT id, cost FROM services WHERE id IN ({", ".join("?" * len(uids))})', uids
+		).fetchall())
+		for line in lines:
+			cost = costs.get(line.service_id)
+			if cost is None:
+				raise ValueError(f"Service not found: {line.service_id}")
+			if cost != line.list_price:
+				raise ValueError(f"Service price changed: {line.service_id}")
+
+	@classmethod
+	def write_bookings(cls, connection: sqlite3.Connection, login: str, lines: list, created_at: float = None):
+		"""
+		Выполняет запись заказа в текущей транзакции соединения, не фиксируя ее
+		(фиксирует вызывающий код, например групповая запись сервера).
+
+		:return: Кортеж (новый total_spent, новый уровень членства) или None, если пользователь не найден.
+		"""
+		created_at = time.time() if created_at is None else created_at
+		total = sum(line.final_price for line in lines)
+		rows = connection.execute(
+			SQLiteUserRepository.ADD_SPENDING_SQL, {"login": login, "amount": total}
+		).fetchall()
+		if not rows:
+			return None
+		connection.executemany(cls.INSERT_SQL, [
+			(login, line.service_id, line.list_price, line.discount, line.final_price, created_at)
+			for line in lines
+		])
+		return rows[0]
+
+	@staticmethod
+	def _range_filter(since: float, until: float) -> tuple:
+		"""Условие по created_at: since включительно, until не включительно."""
+		conditions, params = [], []
+		if since is not None:
+			conditions.append("created_at >= ?")
+			params.append(since)
+		if until is not None:
+			conditions.append("created_at < ?")
+			params.append(until)
+		return "".join(f" AND {condition}" for condition in conditions), params
+
+	def get_user_history(self, login: str, since: float = None, until: float = None, limit: int = 100) -> list:
+		"""
+		Возвращает заказы пользователя за период, от новых к старым.
+
+		:return: Список кортежей (service_id, list_price, discount, final_price, created_at).
+		"""
+		condition, params = self._range_filter(since, until)
+		cursor = self.connection.execute(f'''
+			SELECT service_id, list_price, discount, final_price, created_at
+			FROM bookings
+			WHERE login = ?{condition}
+			ORDER BY created_at DESC
+			LIMIT ?
+		''', (login, *params, limit))
+		return cursor.fetchall()
+
+	def get_user_total(self, login: str, since: float = None, until: float = None) -> tuple:
+		"""Возвращает (количество заказов, сумма final_price) пользователя за период."""
+		condition, params = self._range_filter(since, until)
+		cursor = self.connection.execute(f'''
+			SELECT COUNT(*), COALESCE(SUM(final_price), 0.0)
+			FROM bookings
+			WHERE login = ?{condition}
+		''', (login, *params))
+		return cursor.fetchone()
+
+	def get_service_stats(self, service_id: str, since: float = None, until: float = None) -> tuple:
+		"""Возвращает (количество заказов, выручка) по услуге за период."""
+		condition, params = self._range_filter(since, until)
+		cursor = self.connection.execute(f'''
+			SELECT COUNT(*), COALESCE(SUM(final_price), 0.0)
+			FROM bookings
+			WHERE service_id = ?{condition}
+		''', (service_id, *params))
+		return cursor.fetchone()
+
+	def find_total_mismatches(self, tolerance: float = 1e-6) -> list:
+		"""
+		Сверяет users.total_spent с суммой заказов в журнале.
+
+		:return: Список кортежей (login, total_spent, сумма по журналу) для расхождений.
+		"""
+		cursor = self.connection.execute('''
+			SELECT u.login, u.total_spent, COALESCE(l.ledger_total, 0.0)
+			FROM users AS u
+			LEFT JOIN (
+				SELECT login, SUM(final_price) AS ledger_total
+				FROM bookings
+				GROUP BY login
+			) AS l ON l.login = u.login
+			WHERE ABS(u.total_spent - COALESCE(l.ledger_total, 0.0)) > ?
+		''', (tolerance,))
+		return cursor.fetchall()
+
+	@retry_on_busy
+	def rebuild_totals(self) -> int:
+		"""
+		Пересчитывает total_spent и уровень членства всех пользователей по журналу.
+		Покупки, сделанные до появления журнала, при этом теряются.
+
+		:return: Количество пользователей, у которых изменилась сумма.
+		"""
+		ledger_total = "(SELECT COALESCE(SUM(final_price), 0.0) FROM bookings WHERE bookings.login = users.login)"
+		with self.connection:
+			cursor = self.connection.execute(f'''
+				UPDATE users
+				SET total_spent = {ledger_total},
+					membership_level = {membership_level_sql(ledger_total)}
+				WHERE total_spent IS NOT {ledger_total}
+			''')
+			self.connection.commit()
+		return cursor.rowcount
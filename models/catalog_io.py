@@ -0,0 +1,178 @@
+# Models
+from models.repair_service import SQLiteServiceRepository, ServiceFactory
+
+# Another
+from typing import NamedTuple
+import csv, json, math, uuid
+
+
+# Колонки файла каталога: тип записывается именем класса, при загрузке принимается также код или короткое имя
+CATALOG_COLUMNS = ("id", "type", "description", "cost")
+
+
+class CatalogFormatError(ValueError):
+	"""Некорректная запись файла каталога; line — номер строки в файле."""
+
+	def __init__(self, line: int, message: str):
+		super().__init__(f"line {line}: {message}")
+		self.line = line
+
+
+class ImportResult(NamedTuple):
+	records: int   # записей источника обработано (включая пропущенные при возобновлении)
+	written: int   # строк добавлено или обновлено
+	skipped: int   # некорректных записей пропущено
+	resumed_from: int  # с какой записи продолжена загрузка
+	errors: list   # первые ошибки пропущенных записей
+
+
+def read_csv(fp):
+	"""Лениво читает записи CSV с заголовком: (номер строки, словарь полей)."""
+	reader = csv.DictReader(fp)
+	for record in reader:
+		yield reader.line_num, record
+
+
+def read_jsonl(fp):
+	"""Лениво читает записи JSON Lines: (номер строки, словарь полей или ошибка разбора)."""
+	for line_number, line in enumerate(fp, 1):
+		if not line.strip():
+			continue
+		try:
+			yield line_number, json.loads(line)
+		except ValueError as e:
+			yield line_number, CatalogFormatError(line_number, f"invalid JSON: {e}")
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def parse_record(line: int, record) -> tuple:
+	"""
+	Проверяет запись файла каталога и преобразует ее в строку таблицы services.
+
+	:return: Кортеж (id, код типа, description, cost).
+	:raises CatalogFormatError: Неизвестный тип, некорректная стоимость или id.
+	"""
+	if isinstance(record, CatalogFormatError):
+		raise record
+	if not isinstance(record, dict):
+		raise CatalogFormatError(line, "record must be an object")
+
+	service_type = record.get("type")
+	if service_type in (None, ""):
+		raise CatalogFormatError(line, "service type is required")
+	if isinstance(service_type, str) and service_type.isdigit():
+		service_type = int(service_type)
+	try:
+		service_class = ServiceFactory.get_class(service_type)
+	except (ValueError, AttributeError):
+		raise CatalogFormatError(line, f"unknown service type {service_type!r}")
+
+	uid = record.get("id") or str(uuid.uuid4())
+	if not isinstance(uid, str):
+		raise CatalogFormatError(line, "id must be a string")
+
+	description = record.get("description")
+	if description in (None, ""):
+		description = service_class.DEFAULT_DESCRIPTION
+	elif not isinstance(description, str):
+		raise CatalogFormatError(line, "description must be a string")
+
+	cost = record.get("cost")
+	if cost in (None, ""):
+		cost = service_class.DEFAULT_COST
+	try:
+		cost = float(cost)
+	except (TypeError, ValueError):
+		raise CatalogFormatError(line, f"invalid cost {cost!r}")
+	if not math.isfinite(cost) or cost < 0:
+		raise CatalogFormatError(line, f"cost must be a non-negative number, got {cost!r}")
+
+	return uid, service_class.TYPE_CODE, description, cost
+
+
+def import_catalog(
+	service_repo: SQLiteServiceRepository,
+	fp,
+	fmt: str,
+	job: str,
+	chunk_size: int = 5000,
+	on_conflict: str = "error",
+	skip_invalid: bool = False,
+	max_errors: int = 100
+) -> ImportResult:
+	"""
+	Загружает каталог из файла порциями по chunk_size записей. Каждая порция фиксируется вместе
+	с позицией в источнике, поэтому прерванную загрузку с тем же job можно запустить повторно:
+	уже записанные записи будут пропущены без разбора.
+
+	:param fp: Открытый текстовый файл.
+	:param fmt: "csv" или "jsonl".
+	:param job: Имя загрузки (например, путь к файлу), по нему хранится позиция.
+	:param on_conflict: Поведение при совпадении id: "error", "ignore" или "replace".
+	:param skip_invalid: Пропускать некорректные записи вместо остановки загрузки.
+	:param max_errors: Сколько ошибок пропущенных записей сохранять в результате.
+	:raises CatalogFormatError: Некорректная запись (если skip_invalid=False); предыдущие порции
+		при этом уже зафиксированы, и загрузку можно продолжить после исправления файла.
+	"""
+	if fmt not in READERS:
+		raise ValueError(f"Unknown catalog format: {fmt}")
+	if on_conflict not in SQLiteServiceRepository.BULK_INSERT_SQL:
+		raise ValueError(f"Unknown conflict mode: {on_conflict}")
+	if chunk_size <= 0:
+		raise ValueError("chunk_size must be positive")
+
+	resumed_from = service_repo.get_import_position(job)
+	position = written = skipped = 0
+	errors = []
+	chunk = []
+	for line, record in READERS[fmt](fp):
+		position += 1
+		if position <= resumed_from:
+			continue
+		try:
+			chunk.append(parse_record(line, record))
+		except CatalogFormatError as e:
+			if not skip_invalid:
+				raise
+			skipped += 1
+			if len(errors) < max_errors:
+				errors.append(str(e))
+		if position % chunk_size == 0:
+			written += service_repo.write_import_chunk(chunk, job, position, on_conflict)
+			chunk = []
+
+	if chunk:
+		written += service_repo.write_import_chunk(chunk, job, position, on_conflict)
+	service_repo.finish_import(job)
+	return ImportResult(position, written, skipped, resumed_from, errors)
+
+
+def export_catalog(service_repo: SQLiteServiceRepository, fp, fmt: str, batch_size: int = 5000) -> int:
+	"""
+	Выгружает каталог в CSV или JSON Lines одним проходом курсора, не создавая объектов услуг.
+
+	:return: Количество выгруженных услуг.
+	"""
+	if fmt not in READERS:
+		raise ValueError(f"Unknown catalog format: {fmt}")
+	type_names = {code: service_class.__name__ for code, service_class in ServiceFactory.types_by_code.items()}
+	rows = service_repo.iter_service_rows(batch_size)
+
+	count = 0
+	if fmt == "csv":
+		writer = csv.writer(fp)
+		writer.writerow(CATALOG_COLUMNS)
+		for uid, type_code, description, cost in rows:
+			writer.writerow((uid, type_names.get(type_code, type_code), description, cost))
+			count += 1
+	else:
+		for uid, type_code, description, cost in rows:
+			fp.write(json.dumps(
+				{"id": uid, "type": type_names.get(type_code, type_code), "description": description, "cost": cost},
+				ensure_ascii = False
+			))
+			fp.write("\n")
+			count += 1
+	return count
@@ -0,0 +1,235 @@
+# DB
+import sqlite3
+
+# Models
+from models.instrumentation import SQLMetrics, InstrumentedConnection
+
+# Another
+from typing import NamedTuple
+import functools, os, random, threading, time
+
+
+# Профиль настроек SQLite для рабочих баз данных
+DEFAULT_PRAGMAS = {
+	"journal_mode": "WAL",           # читатели не блокируются писателем
+	"synchronous": "NORMAL",         # в режиме WAL безопасно и без fsync на каждый коммит
+	"mmap_size": 256 * 1024 * 1024,  # 256 МБ
+	"cache_size": -64 * 1024,        # 64 МБ (отрицательное значение задается в КБ)
+	"busy_timeout": 5000,            # мс ожидания блокировки до SQLITE_BUSY
+	"temp_store": "MEMORY",
+}
+
+BUSY_ERROR_CODES = {
+	getattr(sqlite3, "SQLITE_BUSY", 5),
+	getattr(sqlite3, "SQLITE_LOCKED", 6),
+}
+
+
+def is_busy_error(error: Exception) -> bool:
+	"""Проверяет, что ошибка вызвана занятой базой данных (SQLITE_BUSY/SQLITE_LOCKED)."""
+	if not isinstance(error, sqlite3.OperationalError):
+		return False
+	code = getattr(error, "sqlite_errorcode", None)
+	if code is not None:
+		return code & 0xFF in BUSY_ERROR_CODES
+	message = str(error).lower()
+	return "database is locked" in message or "database is busy" in message
+
+
+def retry_on_busy(fn = None, *, attempts: int = 5, delay: float = 0.05):
+	"""
+	Декоратор: повторяет операцию с экспоненциальной задержкой, если база данных занята.
+	Операция должна быть целой транзакцией (with connection: ...), чтобы повтор был безопасен.
+
+	:param attempts: Максимальное количество попыток.
+	:param delay: Начальная задержка между попытками в секундах.
+	"""
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			for attempt in range(attempts):
+				try:
+					return func(*args, **kwargs)
+				except sqlite3.OperationalError as e:
+					if not is_busy_error(e) or attempt == attempts - 1:
+						raise
+					time.sleep(delay * (2 ** attempt) * (0.5 + random.random()))
+		return wrapper
+
+	if fn is not None:
+		return decorator(fn)
+	return decorator
+
+
+def get_schema_version(connection: sqlite3.Connection, component: str = None) -> int:
+	"""
+	Возвращает версию схемы базы данных: PRAGMA user_version или, если задан component,
+	версию схемы компонента из таблицы schema_versions (0, если ее еще нет).
+	"""
+	if component is None:
+		return connection.execute("PRAGMA user_version").fetchone()[0]
+	try:
+		row = connection.execute("SELECT version FROM schema_versions WHERE component = ?", (component,)).fetchone()
+	except sqlite3.OperationalError:
+		# Таблица создается первой миграцией компонента
+		return 0
+	return row[0] if row else 0
+
+
+def set_schema_version(connection: sqlite3.Connection, version: int, component: str = None) -> None:
+	if component is None:
+		connection.execute(f"PRAGMA user_version = {int(version)}")
+		return
+	connection.execute(
+		"CREATE TABLE IF NOT EXISTS schema_versions (component TEXT NOT NULL PRIMARY KEY, version INTEGER NOT NULL)"
+	)
+	connection.execute('''
+		INSERT INTO schema_versions (component, version) VALUES (?, ?)
+		ON CONFLICT (component) DO UPDATE SET version = excluded.version
+	''', (component, int(version)))
+
+
+class Migration(NamedTuple):
+	"""
+	Шаг миграции схемы. После применения версия схемы (PRAGMA user_version или schema_versions) равна version.
+
+	steps — SQL-операторы (строки) или функции, принимающие соединение; выполняются по порядку.
+	"""
+	version: int
+	description: str
+	steps: tuple
+
+
+def apply_migrations(connection: sqlite3.Connection, migrations: list, component: str = None) -> int:
+	"""
+	Применяет к базе данных шаги миграции, версия которых больше текущей версии схемы.
+	Все недостающие шаги выполняются в одной транзакции: при ошибке база остается в исходной версии.
+	Если база актуальна, выполняется только чтение версии — без DDL и без блокировки.
+
+	:param migrations: Шаги миграции в порядке возрастания версий.
+	:param component: Имя схемы в базе данных, общей для нескольких репозиториев. Версия такой схемы
+		хранится в таблице schema_versions, потому что PRAGMA user_version у файла один.
+	:return: Версия схемы после миграции.
+	"""
+	versions = [migration.version for migration in migrations]
+	if versions != sorted(set(versions)):
+		raise ValueError("Migration versions must be unique and ascending")
+
+	target = versions[-1] if versions else 0
+	if get_schema_version(connection, component) >= target:
+		return get_schema_version(connection, component)
+
+	# DDL в sqlite3 не открывает транзакцию неявно, поэтому она открывается явно
+	connection.execute("BEGIN IMMEDIATE")
+	try:
+		# Другой процесс мог обновить схему, пока мы ждали блокировку
+		version = get_schema_version(connection, component)
+		for migration in migrations:
+			if migration.version <= version:
+				continue
+			for step in migration.steps:
+				if callable(step):
+					step(connection)
+				else:
+					connection.execute(step)
+			set_schema_version(connection, migration.version, component)
+			version = migration.version
+		connection.commit()
+	except BaseException:
+		connection.rollback()
+		raise
+	return version
+
+
+class ConnectionManager:
+	"""
+	Выдает каждому потоку собственное соединение с базой данных и применяет к нему профиль PRAGMA.
+	Базы данных в памяти используют одно общее соединение, иначе каждый поток видел бы свою пустую базу.
+	"""
+
+	def __init__(
+		self,
+		db_name: str,
+		pragmas: dict = None,
+		timeout: float = 5.0,
+		metrics: SQLMetrics = None,
+		unified: bool = False
+	):
+		"""
+		:param db_name: Путь к файлу базы данных или ":memory:".
+		:param pragmas: Переопределения профиля DEFAULT_PRAGMAS (значение None отключает PRAGMA).
+		:param timeout: Таймаут ожидания блокировки при открытии соединения в секундах.
+		:param metrics: Сборщик метрик SQL. Если задан, все соединения менеджера инструментируются.
+		:param unified: В базе хранятся таблицы нескольких репозиториев (услуги и пользователи);
+			версии их схем ведутся по компонентам в таблице schema_versions.
+		"""
+		self.db_name = db_name
+		self.unified = unified
+		self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+		self.timeout = timeout
+		self.metrics = metrics
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._connections = []
+		self._shared = self._connect() if self.is_memory else None
+
+	@property
+	def is_memory(self) -> bool:
+		return self.db_name == ":memory:" or "mode=memory" in self.db_name
+
+	def schema_component(self, component: str):
+		"""Имя компонента для apply_migrations: в единой базе — component, в отдельном файле — None."""
+		if not self.unified:
+			# Единая база, открытая без unified (например, инструментом каталога), узнается по таблице schema_versions
+			self.unified = self.connection().execute(
+				"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_versions'"
+			).fetchone() is not None
+		return component if self.unified else None
+
+	def _connect(self) -> sqlite3.Connection:
+		connection = sqlite3.connect(
+			self.db_name,
+			timeout = self.timeout,
+			check_same_thread = False,
+			uri = self.db_name.startswith("file:"),
+			factory = InstrumentedConnection if self.metrics is not None else sqlite3.Connection
+		)
+		if self.metrics is not None:
+			connection.instrument(self.metrics, os.path.basename(self.db_name))
+		for name, value in self.pragmas.items():
+			if value is not None:
+				connection.execute(f"PRAGMA {name} = {value}").fetchall()
+		with self._lock:
+			self._connections.append(connection)
+		return connection
+
+	def connection(self) -> sqlite3.Connection:
+		"""Возвращает соединение текущего потока, открывая его при первом обращении."""
+		if self._shared is not None:
+			return self._shared
+
+		connection = getattr(self._local, "connection", None)
+		if connection is None:
+			connection = self._connect()
+			self._local.connection = connection
+		return connection
+
+	def close(self) -> None:
+		"""Закрывает соединение текущего потока."""
+		if self._shared is not None:
+			return
+		connection = getattr(self._local, "connection", None)
+		if connection is not None:
+			self._local.connection = None
+			with self._lock:
+				self._connections.remove(connection)
+			connection.close()
+
+	def close_all(self) -> None:
+		"""Закрывает все соединения, открытые менеджером."""
+		with self._lock:
+			connections, self._connections = self._connections, []
+		for connection in connections:
+			connection.close()
+		self._local = threading.local()
+		self._shared = None
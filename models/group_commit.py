@@ -0,0 +1,120 @@
+# DB
+import sqlite3
+from models.database import ConnectionManager
+
+# Another
+from concurrent.futures import Future
+import queue, threading, time
+
+
+class GroupCommitWriter:
+	"""
+	Единственный писатель базы данных. Операции записи из разных потоков ставятся в очередь,
+	а поток писателя выполняет все накопившиеся операции одной транзакцией с одним COMMIT.
+	Каждая операция выполняется в своей точке сохранения (SAVEPOINT), поэтому ошибка одной
+	операции откатывает только ее, не затрагивая остальные операции группы.
+	"""
+
+	_STOP = object()
+
+	def __init__(self, connection_manager: ConnectionManager, max_batch: int = 256, max_delay: float = 0.0):
+		"""
+		:param connection_manager: Менеджер соединений базы данных; писатель использует соединение своего потока.
+		:param max_batch: Максимальное количество операций в одной транзакции.
+		:param max_delay: Сколько секунд ждать новых операций перед COMMIT, если группа не заполнена.
+			При 0 группа состоит из операций, накопившихся, пока выполнялась предыдущая транзакция.
+		"""
+		self.connection_manager = connection_manager
+		self.max_batch = max_batch
+		self.max_delay = max_delay
+		self.batches = 0
+		self.operations = 0
+		self._queue = queue.Queue()
+		self._thread = threading.Thread(target = self._run, name = "group-commit", daemon = True)
+		self._thread.start()
+
+	def submit(self, operation) -> Future:
+		"""
+		Ставит операцию в очередь записи.
+
+		:param operation: Функция, принимающая соединение. Она выполняется внутри общей транзакции
+			и не должна вызывать commit/rollback. Результаты запросов (в том числе RETURNING) нужно
+			прочитать внутри операции: незавершенный запрос не дает освободить точку сохранения.
+		:return: Future с результатом операции (устанавливается после COMMIT группы).
+		"""
+		future = Future()
+		self._queue.put((operation, future))
+		return future
+
+	def execute(self, operation, timeout: float = None):
+		"""Выполняет операцию в ближайшей группе и возвращает ее результат."""
+		return self.submit(operation).result(timeout)
+
+	def close(self) -> None:
+		"""Выполняет уже поставленные операции и останавливает поток писателя."""
+		if self._thread.is_alive():
+			self._queue.put(self._STOP)
+			self._thread.join()
+
+	def _collect(self, first) -> tuple:
+		batch = [first]
+		stop = False
+		deadline = time.monotonic() + self.max_delay
+		while len(batch) < self.max_batch:
+			timeout = deadline - time.monotonic()
+			try:
+				item = self._queue.get(timeout = timeout) if timeout > 0 else self._queue.get_nowait()
+			except queue.Empty:
+				break
+			if item is self._STOP:
+				stop = True
+				break
+			batch.append(item)
+		return batch, stop
+
+	def _run(self) -> None:
+		while True:
+			item = self._queue.get()
+			if item is self._STOP:
+				break
+			batch, stop = self._collect(item)
+			self._commit_batch(batch)
+			if stop:
+				break
+		self.connection_manager.close()
+
+	def _commit_batch(self, batch: list) -> None:
+		connection = self.connection_manager.connection()
+		results = []
+		try:
+			connection.execute("BEGIN IMMEDIATE")
+			for operation, future in batch:
+				if not future.set_running_or_notify_cancel():
+					continue
+				connection.execute("SAVEPOINT operation")
+				try:
+					results.append((future, operation(connection), None))
+					connection.execute("RELEASE operation")
+				except Exception as e:
+					connection.execute("ROLLBACK TO operation")
+					connection.execute("RELEASE operation")
+					results.append((future, None, e))
+			connection.commit()
+		except sqlite3.Error as e:
+			# Не удалось открыть или зафиксировать транзакцию: не записана ни одна операция группы
+			if connection.in_transaction:
+				connection.rollback()
+			for operation, future in batch:
+				if future.done():
+					continue
+				if future.running() or future.set_running_or_notify_cancel():
+					future.set_exception(e)
+			return
+
+		self.batches += 1
+		self.operations += len(results)
+		for future, result, error in results:
+			if error is not None:
+				future.set_exception(error)
+			else:
+				future.set_result(result)
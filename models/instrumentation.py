@@ -0,0 +1,245 @@
+# DB
+import sqlite3
+
+# Another
+import json, logging, os, threading, time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержек в миллисекундах (последняя корзина — все, что больше)
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+# Через сколько инструкций виртуальной машины SQLite вызывается progress handler
+PROGRESS_STEP = 1000
+
+
+def normalize_sql(sql: str) -> str:
+	"""Схлопывает пробелы и переводы строк, чтобы один и тот же запрос всегда давал один ключ."""
+	return " ".join(sql.split())
+
+
+class StatementStats:
+	"""Накопленная статистика одного SQL-запроса."""
+
+	__slots__ = ("count", "errors", "total", "max", "rows", "vm_steps", "histogram")
+
+	def __init__(self):
+		self.count = 0
+		self.errors = 0
+		self.total = 0.0
+		self.max = 0.0
+		self.rows = 0
+		self.vm_steps = 0
+		self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+	def add(self, duration: float, rows: int, vm_steps: int, failed: bool) -> None:
+		self.count += 1
+		self.errors += failed
+		self.total += duration
+		self.max = max(self.max, duration)
+		self.rows += max(rows, 0)
+		self.vm_steps += vm_steps
+		duration_ms = duration * 1000
+		for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+			if duration_ms <= bound:
+				self.histogram[i] += 1
+				break
+		else:
+			self.histogram[-1] += 1
+
+	def to_dict(self) -> dict:
+		labels = [f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"]
+		return {
+			"count": self.count,
+			"errors": self.errors,
+			"total_ms": round(self.total * 1000, 3),
+			"avg_ms": round(self.total * 1000 / self.count, 4) if self.count else 0.0,
+			"max_ms": round(self.max * 1000, 4),
+			"rows": self.rows,
+			"vm_steps": self.vm_steps,
+			"histogram_ms": dict(zip(labels, self.histogram)),
+		}
+
+
+class SQLMetrics:
+	"""
+	Собирает метрики SQL-запросов со всех инструментированных соединений: количество вызовов,
+	гистограммы задержек и журнал медленных запросов. Потокобезопасен.
+	Параметры запросов не сохраняются: среди них бывают хэши паролей и токены.
+	"""
+
+	def __init__(self, slow_query_ms: float = 100.0, slow_log_size: int = 200):
+		"""
+		:param slow_query_ms: Порог в миллисекундах, начиная с которого запрос попадает в журнал медленных.
+		:param slow_log_size: Сколько последних медленных запросов хранить.
+		"""
+		self.slow_query_ms = slow_query_ms
+		self._lock = threading.Lock()
+		self._statements = {}
+		self._traced = {}
+		self._slow = deque(maxlen=slow_log_size)
+		self._started_at = time.time()
+		self._dump_thread = None
+		self._dump_stop = threading.Event()
+
+	def record(self, database: str, sql: str, duration: float, rows: int = -1, vm_steps: int = 0, failed: bool = False) -> None:
+		"""Учитывает выполнение одного запроса (вызывается инструментированным курсором)."""
+		key = normalize_sql(sql)
+		with self._lock:
+			stats = self._statements.get((database, key))
+			if stats is None:
+				stats = self._statements[(database, key)] = StatementStats()
+			stats.add(duration, rows, vm_steps, failed)
+
+		if duration * 1000 >= self.slow_query_ms:
+			entry = {
+				"at": round(time.time(), 3),
+				"database": database,
+				"sql": key,
+				"duration_ms": round(duration * 1000, 3),
+				"vm_steps": vm_steps,
+				"thread": threading.current_thread().name,
+			}
+			with self._lock:
+				self._slow.append(entry)
+			logger.warning("Медленный запрос (%.1f мс) к %s: %s", entry["duration_ms"], database, key)
+
+	def record_trace(self, database: str, statement: str) -> None:
+		"""
+		Учитывает оператор, выполненный движком SQLite (включая неявные BEGIN/COMMIT).
+		Текст из trace callback содержит подставленные значения параметров, поэтому сохраняется только ключевое слово.
+		"""
+		keyword = statement.split(None, 1)[0].upper() if statement.strip() else ""
+		with self._lock:
+			counts = self._traced.setdefault(database, {})
+			counts[keyword] = counts.get(keyword, 0) + 1
+
+	def snapshot(self) -> dict:
+		"""
+		:return: Метрики в виде словаря, пригодного для JSON: запросы по базам данных (от самых затратных),
+			операторы движка по ключевым словам и журнал медленных запросов.
+		"""
+		with self._lock:
+			statements = sorted(self._statements.items(), key=lambda item: item[1].total, reverse=True)
+			result = {
+				"started_at": round(self._started_at, 3),
+				"taken_at": round(time.time(), 3),
+				"slow_query_ms": self.slow_query_ms,
+				"statements": {},
+				"traced": {database: dict(counts) for database, counts in self._traced.items()},
+				"slow_queries": list(self._slow),
+			}
+			for (database, sql), stats in statements:
+				result["statements"].setdefault(database, {})[sql] = stats.to_dict()
+		return result
+
+	def slow_queries(self) -> list:
+		with self._lock:
+			return list(self._slow)
+
+	def reset(self) -> None:
+		with self._lock:
+			self._statements.clear()
+			self._traced.clear()
+			self._slow.clear()
+			self._started_at = time.time()
+
+	def dump(self, path: str) -> None:
+		"""Записывает снимок метрик в JSON-файл (через временный файл, чтобы читатель не увидел половину)."""
+		tmp_path = f"{path}.tmp"
+		with open(tmp_path, "w", encoding="utf-8") as fp:
+			json.dump(self.snapshot(), fp, ensure_ascii=False, indent=2)
+		os.replace(tmp_path, path)
+
+	def start_periodic_dump(self, path: str, interval: float = 60.0) -> None:
+		"""Запускает фоновый поток, который каждые interval секунд записывает метрики в path."""
+		if self._dump_thread is not None:
+			return
+
+		def run():
+			while not self._dump_stop.wait(interval):
+				try:
+					self.dump(path)
+				except OSError as e:
+					logger.error("Не удалось записать метрики SQL в %s: %s", path, e)
+
+		self._dump_stop.clear()
+		self._dump_path = path
+		self._dump_thread = threading.Thread(target=run, name="sql-metrics-dump", daemon=True)
+		self._dump_thread.start()
+
+	def stop_periodic_dump(self) -> None:
+		"""Останавливает фоновую запись и сохраняет итоговый снимок."""
+		if self._dump_thread is None:
+			return
+		self._dump_stop.set()
+		self._dump_thread.join()
+		self._dump_thread = None
+		self.dump(self._dump_path)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+	"""Курсор, замеряющий время execute/executemany/executescript."""
+
+	def execute(self, sql, parameters=()):
+		return self.connection._timed(super().execute, sql, parameters)
+
+	def executemany(self, sql, seq_of_parameters):
+		return self.connection._timed(super().executemany, sql, seq_of_parameters)
+
+	def executescript(self, sql_script):
+		return self.connection._timed(super().executescript, sql_script)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+	"""
+	Соединение, передающее метрики в SQLMetrics. Время выполнения замеряется обертками курсора,
+	объем работы — через progress handler (инструкции виртуальной машины), а trace callback
+	подсчитывает все операторы, которые реально выполнил движок.
+	Замер execute охватывает подготовку запроса и первый шаг; выборка остальных строк (fetchall) в него не входит.
+	"""
+
+	metrics = None
+	database = ""
+
+	def instrument(self, metrics: SQLMetrics, database: str) -> None:
+		self.metrics = metrics
+		self.database = database
+		self._vm_steps = 0
+		self.set_progress_handler(self._on_progress, PROGRESS_STEP)
+		self.set_trace_callback(lambda statement: metrics.record_trace(database, statement))
+
+	def _on_progress(self) -> int:
+		self._vm_steps += PROGRESS_STEP
+		return 0
+
+	def _timed(self, method, sql, *args):
+		if self.metrics is None:
+			return method(sql, *args)
+
+		self._vm_steps = 0
+		failed = True
+		cursor = None
+		started_at = time.perf_counter()
+		try:
+			cursor = method(sql, *args)
+			failed = False
+			return cursor
+		finally:
+			duration = time.perf_counter() - started_at
+			rows = cursor.rowcount if cursor is not None else -1
+			self.metrics.record(self.database, sql, duration, rows, self._vm_steps, failed)
+
+	def cursor(self, factory=InstrumentedCursor):
+		return super().cursor(factory)
+
+	# sqlite3.Connection.execute* создают курсор в обход метода cursor(), поэтому переопределены явно
+	def execute(self, sql, parameters=()):
+		return self.cursor().execute(sql, parameters)
+
+	def executemany(self, sql, seq_of_parameters):
+		return self.cursor().executemany(sql, seq_of_parameters)
+
+	def executescript(self, sql_script):
+		return self.cursor().executescript(sql_script)
@@ -0,0 +1,98 @@
+# Models
+from models.repair_service import SQLiteServiceRepository
+from models.user import get_membership_tiers
+
+# Another
+from array import array
+
+
+def apply_discount(costs, discount: float) -> array:
+	"""Применяет скидку ко всем ценам за один проход (та же формула, что и в Booking.process_booking)."""
+	return array('d', [cost - cost * discount for cost in costs])
+
+
+class PriceTable:
+	"""
+	Цены всего каталога по уровням членства.
+	Хранит параллельные массивы: uid услуг, базовые цены и цены для каждого уровня.
+	"""
+
+	def __init__(self, uids: list, costs: array, prices: dict):
+		self.uids = uids
+		self.costs = costs
+		self.prices = prices
+		self._positions = {uid: position for position, uid in enumerate(uids)}
+
+	def __len__(self) -> int:
+		return len(self.uids)
+
+	def price(self, uid: str, membership_level: str):
+		"""Возвращает цену услуги для уровня членства или None, если услуги нет в каталоге."""
+		position = self._positions.get(uid)
+		if position is None:
+			return None
+		return self.prices[membership_level][position]
+
+
+class PricingEngine:
+	"""
+	Рассчитывает цены каталога для всех уровней членства одним пакетным проходом.
+	Таблица цен кэшируется и пересчитывается только при изменении каталога
+	(ревизия репозитория услуг) или скидок уровней.
+	"""
+
+	def __init__(self, service_repo: SQLiteServiceRepository, tiers: tuple = None):
+		"""
+		:param service_repo: Репозиторий услуг.
+		:param tiers: Уровни членства в формате MEMBERSHIP_TIERS: (название, порог, скидка).
+			По умолчанию — действующие уровни (таблица membership_tiers), включая их последующие изменения.
+		"""
+		self.service_repo = service_repo
+		self._tiers = tuple(tiers) if tiers is not None else None
+		self._table = None
+		self._table_key = None
+
+	@property
+	def tiers(self) -> tuple:
+		return self._tiers if self._tiers is not None else get_membership_tiers()
+
+	@property
+	def discounts(self) -> dict:
+		return {level: discount for level, _, discount in self.tiers}
+
+	def set_tiers(self, tiers: tuple) -> None:
+		"""Заменяет уровни членства; таблица цен будет пересчитана при следующем обращении."""
+		self._tiers = tuple(tiers)
+
+	def invalidate(self) -> None:
+		self._table = None
+		self._table_key = None
+
+	def price_table(self) -> PriceTable:
+		"""Возвращает таблицу цен всего каталога, пересчитывая ее только при необходимости."""
+		self.service_repo.validate_cache()
+		key = (self.service_repo.revision, self.tiers)
+		if self._table is not None and self._table_key == key:
+			return self._table
+
+		uids = []
+		costs = array('d')
+		for uid, cost in self.service_repo.connection.execute('SELECT id, cost FROM services ORDER BY rowid'):
+			uids.append(uid)
+			costs.append(cost)
+
+		prices = {level: apply_discount(costs, discount) for level, discount in self.discounts.items()}
+		self._table = PriceTable(uids, costs, prices)
+		self._table_key = key
+		return self._table
+
+	def quote(self, uid: str, membership_level: str):
+		"""Возвращает цену услуги для уровня членства по таблице цен."""
+		return self.price_table().price(uid, membership_level)
+
+	def quote_many(self, costs, membership_level: str) -> array:
+		"""
+		Рассчитывает цены для набора базовых цен (например, загруженной страницы каталога)
+		одним проходом, не строя таблицу всего каталога.
+		"""
+		return apply_discount(costs, self.discounts.get(membership_level, 0.0))
@@ -1,16 +1,30 @@
 # DB
 import sqlite3
+from models.database import ConnectionManager, Migration, apply_migrations, retry_on_busy
+from models.instrumentation import SQLMetrics
 
 # Another
 from abc import ABC, abstractmethod
-import uuid
+from array import array
+from collections import OrderedDict
+from itertools import islice
+import re, sys, threading, time, uuid
 
 
 class RepairService(ABC):
-	def __init__(self, uid: str = None, description: str = "", cost: float = 0.0):
+	# Без __dict__ у каждого экземпляра: в каталоге могут быть миллионы услуг
+	__slots__ = ("uid", "description", "cost")
+
+	DEFAULT_DESCRIPTION = ""
+	DEFAULT_COST = 0.0
+	# Код типа в таблице services, назначается ServiceFactory.register
+	TYPE_CODE = None
+
+	def __init__(self, uid: str = None, description: str = None, cost: float = None):
 		self.uid = uid or str(uuid.uuid4())
-		self.description = description
-		self.cost = cost
+		# Описания повторяются у множества услуг, поэтому хранится одна общая копия строки
+		self.description = sys.intern(self.DEFAULT_DESCRIPTION if description is None else description)
+		self.cost = self.DEFAULT_COST if cost is None else cost
 
 	@abstractmethod
 	def get_uid(self) -> str:
@@ -25,9 +39,73 @@ class RepairService(ABC):
 		pass
 	
 
+class ServiceFactory:
+	"""
+	Реестр видов услуг: целочисленный код типа (хранится в таблице services) -> класс услуги.
+	Новые виды услуг подключаются декоратором ServiceFactory.register(code).
+	"""
+
+	types_by_code = {}
+	# Имена классов и короткие имена ("PlumbingService", "plumbing") для совместимости со строковыми типами
+	types_by_name = {}
+
+	@classmethod
+	def register(cls, code: int, *aliases: str):
+		"""
+		Декоратор: регистрирует класс услуги под кодом типа.
+
+		:param code: Код типа в таблице services (0..255). Код нельзя менять после появления данных в базе.
+		:param aliases: Дополнительные имена типа для create_service.
+		"""
+		# Коды хранятся в ServiceCatalog.type_codes — массиве array("B")
+		if isinstance(code, bool) or not isinstance(code, int) or code not in range(256):
+			raise ValueError(f"Service type code must be an integer in 0..255, got {code!r}")
+
+		def decorator(service_class):
+			registered = cls.types_by_code.get(code)
+			if registered is not None and registered is not service_class:
+				raise ValueError(f"Service type code {code} is already used by {registered.__name__}")
+			service_class.TYPE_CODE = code
+			cls.types_by_code[code] = service_class
+			name = service_class.__name__
+			for alias in (name, name.lower(), name.replace("Service", "").lower(), *aliases):
+				cls.types_by_name[alias] = service_class
+			return service_class
+		return decorator
+
+	@classmethod
+	def get_class(cls, service_type) -> type:
+		"""
+		:param service_type: Код типа или имя типа.
+		:return: Класс услуги.
+		"""
+		if isinstance(service_type, int):
+			service_class = cls.types_by_code.get(service_type)
+		else:
+			service_class = cls.types_by_name.get(service_type) or cls.types_by_name.get(service_type.lower())
+		if service_class is None:
+			raise ValueError(f"Unknown service type: {service_type}")
+		return service_class
+
+	@classmethod
+	def type_code(cls, service: RepairService) -> int:
+		code = type(service).TYPE_CODE
+		if code is None:
+			raise ValueError(f"Service type {type(service).__name__} is not registered")
+		return code
+
+	@classmethod
+	def create_service(cls, uid: str, service_type, description: str = "", cost: float = 0.0) -> RepairService:
+		# Пустое описание и нулевая стоимость заменяются значениями по умолчанию для вида услуги
+		return cls.get_class(service_type)(uid, description or None, cost or None)
+
+
+@ServiceFactory.register(1)
 class PlumbingService(RepairService):
-	def __init__(self, uid: str = None, description: str = "Сантехнические работы", cost: float = 50.0):
-		super().__init__(uid, description, cost)
+	__slots__ = ()
+
+	DEFAULT_DESCRIPTION = "Сантехнические работы"
+	DEFAULT_COST = 50.0
 
 	def get_uid(self) -> str:
 		return self.uid
@@ -39,9 +117,12 @@ class PlumbingService(RepairService):
 		return self.cost
 
 
+@ServiceFactory.register(2)
 class ElectricalService(RepairService):
-	def __init__(self, uid: str = None, description: str = "Электромонтажные работы: ремонт проводки и электрощитков.", cost: float = 80.0):
-		super().__init__(uid, description, cost)
+	__slots__ = ()
+
+	DEFAULT_DESCRIPTION = "Электромонтажные работы: ремонт проводки и электрощитков."
+	DEFAULT_COST = 80.0
 
 	def get_uid(self) -> str:
 		return self.uid
@@ -51,70 +132,657 @@ class ElectricalService(RepairService):
 
 	def get_cost(self) -> float:
 		return self.cost
-	
-class ServiceFactory:
-	@staticmethod
-	def create_service(uid: str, service_type: str, description: str = "", cost: float = 0.0) -> RepairService:
-		service_type = service_type.replace('Service', '').lower()
-		if service_type.lower() == "plumbing":
-			return PlumbingService(uid=uid, description=description or "Сантехнические работы", cost = cost or 50.0)
-		elif service_type.lower() == "electrical":
-			return ElectricalService(uid=uid, description=description or "Электромонтажные работы: ремонт проводки и электрощитков.", cost = cost or 80.0)
+
+
+class ServiceCache:
+	"""
+	Ограниченный по размеру LRU-кэш услуг, ключ — uid услуги.
+	При переполнении вытесняются давно не использованные услуги. Потокобезопасен.
+	"""
+
+	def __init__(self, max_size: int = 10000):
+		self.max_size = max_size
+		self._services = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self._services)
+
+	def __contains__(self, uid: str) -> bool:
+		return uid in self._services
+
+	def get(self, uid: str):
+		with self._lock:
+			service = self._services.get(uid)
+			if service is not None:
+				self._services.move_to_end(uid)
+			return service
+
+	def put(self, service: RepairService) -> None:
+		if self.max_size <= 0:
+			return
+		uid = service.get_uid()
+		with self._lock:
+			self._services[uid] = service
+			self._services.move_to_end(uid)
+			while len(self._services) > self.max_size:
+				self._services.popitem(last = False)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._services.clear()
+
+
+# Канонический вид uuid4, который генерирует RepairService: такие id в ServiceCatalog хранятся 16 байтами
+CANONICAL_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class ServiceCatalog:
+	"""
+	Колоночное представление каталога для массовой обработки: вместо объекта на каждую услугу
+	хранятся параллельные массивы идентификаторов, кодов типов, описаний и стоимостей.
+	Идентификаторы-UUID упакованы по 16 байт, коды типов (ServiceFactory) и стоимости лежат в array,
+	одинаковые описания — одной общей строкой. Объекты услуг создаются только по запросу.
+	"""
+
+	__slots__ = ("type_codes", "descriptions", "costs", "_uid_bytes", "_uid_list", "_positions")
+
+	def __init__(self):
+		self.type_codes = array("B")
+		self.descriptions = []
+		self.costs = array("d")
+		self._uid_bytes = bytearray()
+		# Список строк заводится, только если встретился id не в каноническом виде UUID
+		self._uid_list = None
+		# Позиции услуг по uid, строятся при первом поиске
+		self._positions = None
+
+	@classmethod
+	def from_rows(cls, rows) -> "ServiceCatalog":
+		"""
+		:param rows: Итерируемый объект строк (id, код типа, description, cost).
+		"""
+		catalog = cls()
+		for row in rows:
+			catalog.append(*row)
+		return catalog
+
+	def append(self, uid: str, type_code: int, description: str, cost: float) -> None:
+		if self._uid_list is None and CANONICAL_UUID_RE.fullmatch(uid):
+			self._uid_bytes += bytes.fromhex(uid.replace("-", ""))
 		else:
-			raise ValueError(f"Unknown service type: {service_type}")
-		
+			if self._uid_list is None:
+				self._uid_list = [self.uid(i) for i in range(len(self.costs))]
+				self._uid_bytes = bytearray()
+			self._uid_list.append(uid)
+
+		self.type_codes.append(type_code)
+		self.descriptions.append(sys.intern(description))
+		self.costs.append(cost)
+		self._positions = None
+
+	def __len__(self) -> int:
+		return len(self.costs)
+
+	def __iter__(self):
+		for i in range(len(self.costs)):
+			yield self.service(i)
+
+	def uid(self, i: int) -> str:
+		if self._uid_list is not None:
+			return self._uid_list[i]
+		if not -len(self.costs) <= i < len(self.costs):
+			raise IndexError("catalog index out of range")
+		i %= len(self.costs)
+		h = self._uid_bytes[i * 16:(i + 1) * 16].hex()
+		return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+	@property
+	def uids(self) -> list:
+		return list(self._uid_list) if self._uid_list is not None else [self.uid(i) for i in range(len(self.costs))]
+
+	def type_name(self, i: int) -> str:
+		return ServiceFactory.types_by_code[self.type_codes[i]].__name__
+
+	def row(self, i: int) -> tuple:
+		return (self.uid(i), self.type_codes[i], self.descriptions[i], self.costs[i])
+
+	def service(self, i: int) -> RepairService:
+		"""Создает объект услуги для строки i."""
+		return ServiceFactory.create_service(*self.row(i))
+
+	def position(self, uid: str) -> int:
+		"""
+		:return: Номер строки услуги или -1, если услуги нет в каталоге.
+		"""
+		if self._positions is None:
+			self._positions = {uid: i for i, uid in enumerate(self.uids)}
+		return self._positions.get(uid, -1)
+
+	def find_service(self, uid: str):
+		i = self.position(uid)
+		return self.service(i) if i >= 0 else None
+
+
 class ServiceRepository(ABC):
 	@abstractmethod
 	def add_service(self, service: RepairService):
 		pass
 
 	@abstractmethod
-	def get_services(self) -> list:
+	def add_services(self, services, chunk_size: int = 1000, on_conflict: str = "error") -> int:
+		pass
+
+	@abstractmethod
+	def get_services(self, columnar: bool = False):
 		pass
 
+	@abstractmethod
+	def get_services_page(self, after: int = 0, limit: int = 100) -> tuple:
+		pass
+
+	@abstractmethod
+	def find_service(self, uid: str):
+		pass
+
+	@abstractmethod
+	def find_services(self, service_type = None, min_cost: float = None, max_cost: float = None, limit: int = None) -> list:
+		pass
+
+	@abstractmethod
+	def search_services(self, query: str, limit: int = 50) -> list:
+		pass
+
+
+def _create_fts_triggers(connection: sqlite3.Connection) -> None:
+	connection.execute('''
+		CREATE TRIGGER IF NOT EXISTS services_fts_insert AFTER INSERT ON services BEGIN
+			INSERT INTO services_fts (rowid, description) VALUES (new.rowid, new.description);
+		END
+	''')
+	connection.execute('''
+		CREATE TRIGGER IF NOT EXISTS services_fts_delete AFTER DELETE ON services BEGIN
+			INSERT INTO services_fts (services_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+		END
+	''')
+	connection.execute('''
+		CREATE TRIGGER IF NOT EXISTS services_fts_update AFTER UPDATE OF description ON services BEGIN
+			INSERT INTO services_fts (services_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+			INSERT INTO services_fts (rowid, description) VALUES (new.rowid, new.description);
+		END
+	''')
+
+
+def _create_services_v1(connection: sqlite3.Connection) -> None:
+	"""Версия 1: таблица services с типом-именем класса и полнотекстовый индекс по описаниям."""
+	connection.execute('''
+		CREATE TABLE IF NOT EXISTS services (
+			id TEXT PRIMARY KEY,
+			type TEXT NOT NULL,
+			description TEXT NOT NULL,
+			cost REAL NOT NULL
+		)
+	''')
+
+	# Полнотекстовый индекс по описаниям. unicode61 приводит кириллицу к нижнему регистру, но "ё" и "е"
+	# не отождествляет (это делает версия 5); prefix ускоряет поиск по началу слова
+	fts_exists = connection.execute(
+		"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'services_fts'"
+	).fetchone() is not None
+	connection.execute('''
+		CREATE VIRTUAL TABLE IF NOT EXISTS services_fts USING fts5(
+			description,
+			content = 'services',
+			content_rowid = 'rowid',
+			tokenize = 'unicode61 remove_diacritics 2',
+			prefix = '2 3'
+		)
+	''')
+	_create_fts_triggers(connection)
+	if not fts_exists:
+		# Индексируем услуги, добавленные до появления полнотекстового индекса
+		connection.execute("INSERT INTO services_fts (services_fts) VALUES ('rebuild')")
+
+
+def _migrate_service_type_codes(connection: sqlite3.Connection) -> None:
+	"""
+	Версия 2: тип услуги хранится целочисленным кодом ServiceFactory вместо имени класса.
+	Тип столбца в SQLite не меняется через ALTER, поэтому таблица пересоздается. Заодно rowid
+	становится явным столбцом seq: неявный rowid может измениться при VACUUM, а на него
+	ссылаются полнотекстовый индекс и ключи постраничной загрузки. Значения rowid сохраняются.
+	"""
+	names = [row[0] for row in connection.execute("SELECT DISTINCT type FROM services")]
+	unknown = [name for name in names if name not in ServiceFactory.types_by_name]
+	if unknown:
+		raise ValueError(f"Cannot migrate unknown service types: {', '.join(map(str, unknown))}")
+
+	type_case = " ".join(
+		f"WHEN '{name}' THEN {ServiceFactory.types_by_name[name].TYPE_CODE}" for name in names
+	)
+	connection.execute('''
+		CREATE TABLE services_v2 (
+			seq INTEGER PRIMARY KEY,
+			id TEXT NOT NULL UNIQUE,
+			type INTEGER NOT NULL,
+			description TEXT NOT NULL,
+			cost REAL NOT NULL
+		)
+	''')
+	if names:
+		connection.execute(f'''
+			INSERT INTO services_v2 (seq, id, type, description, cost)
+			SELECT rowid, id, CASE type {type_case} END, description, cost FROM services
+		''')
+	# Триггеры удаляются вместе со старой таблицей; содержимое полнотекстового индекса
+	# остается верным, так как rowid сохранены
+	connection.execute("DROP TABLE services")
+	connection.execute("ALTER TABLE services_v2 RENAME TO services")
+	_create_fts_triggers(connection)
+
+
+def fold_yo_sql(expression: str) -> str:
+	"""SQL-выражение, заменяющее "ё" на "е" (как normalize_search_text)."""
+	return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def normalize_search_text(text: str) -> str:
+	"""Заменяет "ё" на "е": токенизатор unicode61 считает их разными буквами."""
+	return text.replace("ё", "е").replace("Ё", "Е")
+
+
+def _create_normalized_fts(connection: sqlite3.Connection) -> None:
+	"""
+	Версия 5: полнотекстовый индекс хранит собственную копию описаний с "ё", замененной на "е".
+	Индекс с внешним содержимым (content = 'services') при rebuild и проверке целостности читает
+	описания из services без замены, поэтому нормализованный текст хранится в самом индексе.
+	"""
+	for trigger in ("services_fts_insert", "services_fts_delete", "services_fts_update"):
+		connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+	connection.execute("DROP TABLE IF EXISTS services_fts")
+	connection.execute('''
+		CREATE VIRTUAL TABLE services_fts USING fts5(
+			description,
+			tokenize = 'unicode61 remove_diacritics 2',
+			prefix = '2 3'
+		)
+	''')
+	connection.execute(f'''
+		CREATE TRIGGER services_fts_insert AFTER INSERT ON services BEGIN
+			INSERT INTO services_fts (rowid, description) VALUES (new.rowid, {fold_yo_sql("new.description")});
+		END
+	''')
+	connection.execute('''
+		CREATE TRIGGER services_fts_delete AFTER DELETE ON services BEGIN
+			DELETE FROM services_fts WHERE rowid = old.rowid;
+		END
+	''')
+	connection.execute(f'''
+		CREATE TRIGGER services_fts_update AFTER UPDATE OF description ON services BEGIN
+			UPDATE services_fts SET description = {fold_yo_sql("new.description")} WHERE rowid = new.rowid;
+		END
+	''')
+	connection.execute(
+		f"INSERT INTO services_fts (rowid, description) SELECT rowid, {fold_yo_sql('description')} FROM services"
+	)
+
+
+# Миграции services.db по порядку версий (PRAGMA user_version, в единой базе — компонент "services")
+SERVICES_MIGRATIONS = [
+	Migration(1, "Таблица услуг и полнотекстовый индекс", (_create_services_v1,)),
+	Migration(2, "Целочисленные коды типов услуг", (_migrate_service_type_codes,)),
+	Migration(3, "Индексы для выборок по типу и диапазону стоимости", (
+		"CREATE INDEX IF NOT EXISTS idx_services_type_cost ON services (type, cost)",
+		"CREATE INDEX IF NOT EXISTS idx_services_cost ON services (cost)",
+	)),
+	Migration(4, "Позиции незавершенных загрузок каталога", ('''
+		CREATE TABLE IF NOT EXISTS catalog_imports (
+			job TEXT NOT NULL PRIMARY KEY,
+			records INTEGER NOT NULL
+		)
+	''',)),
+	Migration(5, 'Полнотекстовый индекс с заменой "ё" на "е"', (_create_normalized_fts,)),
+	Migration(6, "Счетчик изменений каталога", (
+		'''
+		CREATE TABLE IF NOT EXISTS services_revision (
+			id INTEGER PRIMARY KEY CHECK (id = 0),
+			revision INTEGER NOT NULL
+		)
+		''',
+		"INSERT OR IGNORE INTO services_revision (id, revision) VALUES (0, 0)",
+		*(
+			f'''
+			CREATE TRIGGER IF NOT EXISTS services_revision_{event.lower()} AFTER {event} ON services BEGIN
+				UPDATE services_revision SET revision = revision + 1 WHERE id = 0;
+			END
+			'''
+			for event in ("INSERT", "UPDATE", "DELETE")
+		),
+	)),
+]
+
 
 class SQLiteServiceRepository(ServiceRepository):
-	def __init__(self, db_name: str):
-		self.connection = sqlite3.connect(db_name)
+	MIGRATIONS = SERVICES_MIGRATIONS
+	# Версия схемы services.db; при совпадении DDL при запуске не выполняется
+	SCHEMA_VERSION = MIGRATIONS[-1].version
+
+	BULK_INSERT_SQL = {
+		"error": '''
+			INSERT INTO services (id, type, description, cost)
+			VALUES (?, ?, ?, ?)
+		''',
+		"ignore": '''
+			INSERT OR IGNORE INTO services (id, type, description, cost)
+			VALUES (?, ?, ?, ?)
+		''',
+		"replace": '''
+			INSERT INTO services (id, type, description, cost)
+			VALUES (?, ?, ?, ?)
+			ON CONFLICT (id) DO UPDATE SET
+				type = excluded.type,
+				description = excluded.description,
+				cost = excluded.cost
+		''',
+	}
+
+	def __init__(
+		self,
+		db_name: str,
+		cache_size: int = 10000,
+		cache_check_interval: float = 1.0,
+		connection_manager: ConnectionManager = None,
+		metrics: SQLMetrics = None
+	):
+		"""
+		:param db_name: Путь к файлу базы данных.
+		:param cache_size: Максимальное количество услуг в кэше каталога.
+		:param cache_check_interval: Как часто (в секундах) проверять, не изменили ли каталог другие соединения.
+		:param connection_manager: Готовый менеджер соединений (по умолчанию создается для db_name).
+		:param metrics: Сборщик метрик SQL для менеджера соединений, создаваемого по умолчанию.
+		"""
+		self.connection_manager = connection_manager or ConnectionManager(db_name, metrics=metrics)
+		self.cache = ServiceCache(cache_size)
+		self.cache_check_interval = cache_check_interval
+		# Ревизия каталога: увеличивается при каждом известном изменении таблицы services
+		self.revision = 0
+		# PRAGMA data_version имеет смысл только в пределах одного соединения, поэтому хранится по потокам
+		self._cache_state = threading.local()
 		self.create_table()
+		self.validate_cache()
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		"""Соединение текущего потока."""
+		return self.connection_manager.connection()
 
 	def create_table(self):
-		with self.connection:
-			self.connection.execute('''
-				CREATE TABLE IF NOT EXISTS services (
-					id TEXT PRIMARY KEY,
-					type TEXT NOT NULL,
-					description TEXT NOT NULL,
-					cost REAL NOT NULL
-				)
-			''')
-			self.connection.commit()
+		apply_migrations(self.connection, self.MIGRATIONS, self.connection_manager.schema_component("services"))
 
+	@retry_on_busy
 	def add_service(self, service: RepairService):
 		with self.connection:
 			self.connection.execute('''
 				INSERT INTO services (id, type, description, cost) 
 				VALUES (?, ?, ?, ?)
-			''', (service.get_uid(), service.__class__.__name__, service.get_description(), service.get_cost()))
+			''', (service.get_uid(), ServiceFactory.type_code(service), service.get_description(), service.get_cost()))
 			self.connection.commit()
+		self.revision += 1
+		self.cache.put(service)
+
+	def add_services(self, services, chunk_size: int = 1000, on_conflict: str = "error") -> int:
+		"""
+		Массово добавляет услуги одной транзакцией: строки передаются в executemany
+		порциями по chunk_size, поэтому итерируемый объект может быть потоковым.
 
-	def get_services(self) -> list:
+		:param services: Итерируемый объект с услугами.
+		:param chunk_size: Размер порции строк для одного вызова executemany.
+		:param on_conflict: Поведение при совпадении id: "error" — откатить всю загрузку,
+			"ignore" — пропустить существующие услуги, "replace" — обновить существующие услуги.
+		:return: Количество добавленных или обновленных строк.
+		"""
+		# Без retry_on_busy: потоковый итерируемый объект нельзя прочитать повторно
+		if on_conflict not in self.BULK_INSERT_SQL:
+			raise ValueError(f"Unknown conflict mode: {on_conflict}")
+		if chunk_size <= 0:
+			raise ValueError("chunk_size must be positive")
+
+		sql = self.BULK_INSERT_SQL[on_conflict]
+		rows = (
+			(service.get_uid(), ServiceFactory.type_code(service), service.get_description(), service.get_cost())
+			for service in services
+		)
+		written = 0
+		with self.connection:
+			while True:
+				chunk = list(islice(rows, chunk_size))
+				if not chunk:
+					break
+				written += self.connection.executemany(sql, chunk).rowcount
+
+		if written:
+			self.revision += 1
+			if on_conflict == "replace":
+				# Обновленные услуги могли остаться в кэше со старыми данными
+				self.cache.clear()
+		return written
+
+	def get_import_position(self, job: str) -> int:
+		"""Количество записей источника, уже загруженных незавершенной загрузкой job (0, если ее нет)."""
+		row = self.connection.execute('SELECT records FROM catalog_imports WHERE job = ?', (job,)).fetchone()
+		return row[0] if row else 0
+
+	@retry_on_busy
+	def write_import_chunk(self, rows: list, job: str, position: int, on_conflict: str = "error") -> int:
+		"""
+		Записывает порцию загрузки каталога и позицию загрузки в источнике одной транзакцией,
+		поэтому после сбоя загрузка продолжается ровно с первой незаписанной записи.
+
+		:param rows: Строки (id, код типа, description, cost).
+		:param job: Имя загрузки.
+		:param position: Количество записей источника, прочитанных вместе с этой порцией.
+		:param on_conflict: Поведение при совпадении id (как в add_services).
+		:return: Количество добавленных или обновленных строк.
+		"""
+		with self.connection:
+			written = self.connection.executemany(self.BULK_INSERT_SQL[on_conflict], rows).rowcount if rows else 0
+			self.connection.execute('''
+				INSERT INTO catalog_imports (job, records) VALUES (?, ?)
+				ON CONFLICT (job) DO UPDATE SET records = excluded.records
+			''', (job, position))
+			self.connection.commit()
+		if written:
+			self.revision += 1
+			if on_conflict == "replace":
+				self.cache.clear()
+		return written
+
+	def finish_import(self, job: str) -> None:
+		"""Удаляет позицию завершенной загрузки."""
+		with self.connection:
+			self.connection.execute('DELETE FROM catalog_imports WHERE job = ?', (job,))
+			self.connection.commit()
+
+	def iter_service_rows(self, batch_size: int = 1000):
+		"""
+		Потоково отдает строки каталога (id, код типа, description, cost) в порядке rowid,
+		читая курсор порциями по batch_size, без создания объектов услуг.
+		"""
+		cursor = self.connection.execute('SELECT id, type, description, cost FROM services ORDER BY rowid')
+		try:
+			while True:
+				rows = cursor.fetchmany(batch_size)
+				if not rows:
+					return
+				yield from rows
+		finally:
+			cursor.close()
+
+	def validate_cache(self) -> None:
+		"""
+		Сбрасывает кэш каталога, если таблицу services изменило другое соединение.
+		PRAGMA data_version меняется от записи другого соединения в любую таблицу файла (в единой
+		базе это и пользователи, и заказы), поэтому кэш сбрасывается, только если изменился и счетчик
+		services_revision, который увеличивают триггеры services. Собственные записи соединения
+		data_version не меняют — их репозиторий учитывает сам.
+		"""
+		state = self._cache_state
+		now = time.monotonic()
+		checked_at = getattr(state, "checked_at", None)
+		if checked_at is not None and now - checked_at < self.cache_check_interval:
+			return
+
+		data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+		catalog_revision = self.connection.execute(
+			'SELECT revision FROM services_revision WHERE id = 0'
+		).fetchone()[0]
+		if (
+			getattr(state, "data_version", data_version) != data_version
+			and getattr(state, "catalog_revision", catalog_revision) != catalog_revision
+		):
+			self.cache.clear()
+			self.revision += 1
+		state.data_version = data_version
+		state.catalog_revision = catalog_revision
+		state.checked_at = now
+
+	def _hydrate(self, uid: str, type_code: int, description: str, cost: float) -> RepairService:
+		"""Возвращает услугу из кэша или создает ее из строки таблицы и кэширует."""
+		service = self.cache.get(uid)
+		if service is None:
+			service = ServiceFactory.types_by_code[type_code](uid, description or None, cost or None)
+			self.cache.put(service)
+		return service
+
+	def _service_row_factory(self, cursor: sqlite3.Cursor, row: tuple) -> RepairService:
+		"""row_factory для запросов вида SELECT id, type, description, cost: курсор сразу отдает объекты услуг."""
+		return self._hydrate(*row)
+
+	def _service_cursor(self) -> sqlite3.Cursor:
 		cursor = self.connection.cursor()
-		cursor.execute('SELECT id, type, description, cost FROM services')
-		rows = cursor.fetchall()
-		services = []
-		for uid, service_type, description, cost in rows:
-			service = ServiceFactory.create_service(
-				service_type=service_type.replace('Service', '').lower(),
-				uid=uid,
-				description=description,
-				cost=cost
+		cursor.row_factory = self._service_row_factory
+		return cursor
+
+	def get_services(self, columnar: bool = False):
+		"""
+		:param columnar: Вернуть ServiceCatalog (параллельные массивы, без объекта на каждую услугу
+			и без заполнения кэша) вместо списка объектов — для массовой обработки больших каталогов.
+		:return: Список услуг или ServiceCatalog.
+		"""
+		self.validate_cache()
+		if columnar:
+			return ServiceCatalog.from_rows(
+				self.connection.execute('SELECT id, type, description, cost FROM services')
 			)
-			services.append(service)
-		return services
+		return self._service_cursor().execute('SELECT id, type, description, cost FROM services').fetchall()
+
+	def get_services_page(self, after: int = 0, limit: int = 100) -> tuple:
+		"""
+		Возвращает страницу услуг после заданного ключа (keyset-пагинация по rowid).
+		Стоимость запроса не зависит от размера каталога и номера страницы.
+
+		:param after: Ключ последней полученной услуги (0 — с начала каталога).
+		:param limit: Максимальное количество услуг на странице.
+		:return: Кортеж (список услуг, ключ последней услуги на странице).
+		"""
+		self.validate_cache()
+		cursor = self.connection.execute(
+			'SELECT rowid, id, type, description, cost FROM services WHERE rowid > ? ORDER BY rowid LIMIT ?',
+			(after, limit)
+		)
+		services = []
+		last_key = after
+		for last_key, *row in cursor:
+			services.append(self._hydrate(*row))
+		return services, last_key
+
+	def find_service(self, uid: str):
+		"""
+		Возвращает объект услуги по uid. Повторные запросы обслуживаются из кэша
+		без чтения таблицы.
+
+		:param uid: Идентификатор услуги.
+		:return: Объект услуги или None, если услуга не найдена.
+		"""
+		self.validate_cache()
+		service = self.cache.get(uid)
+		if service is not None:
+			return service
+
+		return self._service_cursor().execute(
+			'SELECT id, type, description, cost FROM services WHERE id = ?', (uid,)
+		).fetchone()
 	
-	def get_service(self, uid: str) -> list:
-		cursor = self.connection.cursor()
-		cursor.execute('SELECT * FROM services WHERE id = ?', (uid,))
-		row = cursor.fetchone()
-		return row
+	def find_services(self, service_type = None, min_cost: float = None, max_cost: float = None, limit: int = None) -> list:
+		"""
+		Возвращает услуги заданного вида и/или диапазона стоимости, упорядоченные по стоимости.
+		Запрос обслуживается индексами idx_services_type_cost и idx_services_cost.
+
+		:param service_type: Код, имя или класс вида услуги (None — все виды).
+		:param min_cost: Нижняя граница стоимости включительно.
+		:param max_cost: Верхняя граница стоимости включительно.
+		:param limit: Максимальное количество услуг (None — без ограничения).
+		"""
+		conditions, params = [], []
+		if service_type is not None:
+			service_class = service_type if isinstance(service_type, type) else ServiceFactory.get_class(service_type)
+			conditions.append("type = ?")
+			params.append(service_class.TYPE_CODE)
+		if min_cost is not None:
+			conditions.append("cost >= ?")
+			params.append(min_cost)
+		if max_cost is not None:
+			conditions.append("cost <= ?")
+			params.append(max_cost)
+
+		sql = "SELECT id, type, description, cost FROM services"
+		if conditions:
+			sql += " WHERE " + " AND ".join(conditions)
+		sql += " ORDER BY cost"
+		if limit is not None:
+			sql += " LIMIT ?"
+			params.append(limit)
+
+		self.validate_cache()
+		return self._service_cursor().execute(sql, params).fetchall()
+
+	@staticmethod
+	def build_match_query(query: str) -> str:
+		"""
+		Преобразует пользовательский ввод в запрос FTS5: каждое слово ищется по префиксу,
+		все слова должны встретиться в описании. Спецсимволы FTS5 отбрасываются, "ё" ищется как "е".
+		"""
+		words = re.findall(r"\w+", normalize_search_text(query.lower()))
+		return " ".join(f'"{word}"*' for word in words)
+
+	def search_services(self, query: str, limit: int = 50) -> list:
+		"""
+		Ищет услуги по описанию через полнотекстовый индекс, результаты упорядочены по релевантности (bm25).
+
+		:param query: Строка поиска; слова ищутся по префиксу без учета регистра.
+		:param limit: Максимальное количество результатов.
+		:return: Список услуг.
+		"""
+		match_query = self.build_match_query(query)
+		if not match_query:
+			return []
+
+		self.validate_cache()
+		cursor = self._service_cursor().execute('''
+			SELECT s.id, s.type, s.description, s.cost
+			FROM services_fts
+			JOIN services AS s ON s.rowid = services_fts.rowid
+			WHERE services_fts MATCH ?
+			ORDER BY services_fts.rank
+			LIMIT ?
+		''', (match_query, limit))
+		return cursor.fetchall()
+	
+	def has_services(self) -> bool:
+		"""Проверяет, что каталог не пуст, не загружая его (O(1))."""
+		return self.connection.execute('SELECT EXISTS (SELECT 1 FROM services)').fetchone()[0] == 1
+	
+	def get_service(self, uid: str) -> tuple:
+		service = self.find_service(uid)
+		if service is None:
+			return None
+		return (service.get_uid(), service.__class__.__name__, service.get_description(), service.get_cost())
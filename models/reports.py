@@ -0,0 +1,247 @@
+# DB
+from models.database import ConnectionManager
+
+# Models
+from models.repair_service import ServiceFactory
+
+# Another
+from typing import NamedTuple
+from urllib.request import pathname2url
+import csv, json, os
+
+
+# Отчеты только читают данные; временные структуры сортировки хранятся на диске, а кэш страниц ограничен,
+# поэтому объем памяти не зависит от размера баз данных
+REPORT_PRAGMAS = {
+	"journal_mode": None,
+	"synchronous": None,
+	"temp_store": "FILE",
+	"cache_size": -16 * 1024,  # 16 МБ
+	"mmap_size": 0,  # страницы читаются в ограниченный кэш, а не отображаются в память целиком
+	"query_only": 1,
+}
+
+
+class Report(NamedTuple):
+	"""Описание отчета: имя метода ReportRepository, колонки результата и нужные базы данных."""
+	name: str
+	description: str
+	columns: tuple
+	requires: tuple
+
+
+REPORTS = {report.name: report for report in (
+	Report(
+		"tier_spending", "Пользователи и расходы по уровням членства",
+		("membership_level", "users", "total_spent", "avg_spent", "max_spent"), ("users",)
+	),
+	Report(
+		"top_customers", "Пользователи с наибольшими расходами",
+		("login", "membership_level", "total_spent", "bookings"), ("users",)
+	),
+	Report(
+		"daily_revenue", "Заказы и выручка по дням (UTC)",
+		("day", "bookings", "revenue"), ("users",)
+	),
+	Report(
+		"service_usage", "Заказы и выручка по услугам",
+		("service_id", "service_type", "description", "bookings", "revenue"), ("users", "services")
+	),
+	Report(
+		"service_type_revenue", "Заказы и выручка по видам услуг",
+		("service_type", "bookings", "revenue"), ("users", "services")
+	),
+	Report(
+		"catalog_summary", "Количество и стоимость услуг по видам",
+		("service_type", "services", "min_cost", "avg_cost", "max_cost"), ("services",)
+	),
+)}
+
+
+def service_type_name(type_code) -> str:
+	"""Имя вида услуги по коду типа; для услуг, удаленных из каталога, — "unknown"."""
+	if type_code is None:
+		return "unknown"
+	try:
+		return ServiceFactory.get_class(type_code).__name__
+	except ValueError:
+		return "unknown"
+
+
+def read_only_uri(path: str) -> str:
+	return "file:" + pathname2url(os.path.abspath(path)) + "?mode=ro"
+
+
+def _range_filter(since: float, until: float) -> tuple:
+	"""Условие по created_at журнала бронирований и его параметры."""
+	conditions, params = [], {}
+	if since is not None:
+		conditions.append("created_at >= :since")
+		params["since"] = since
+	if until is not None:
+		conditions.append("created_at < :until")
+		params["until"] = until
+	return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+class ReportRepository:
+	"""
+	Агрегирующие отчеты по базам пользователей и услуг. Агрегация выполняется в SQL, а строки
+	результата читаются генераторами порциями по batch_size, поэтому в Python не загружаются
+	ни пользователи, ни каталог. Отдельная база услуг подключается к базе пользователей через ATTACH
+	(схема catalog), чтобы отчеты по заказам могли соединять их с каталогом; в единой базе данных
+	(UnifiedDatabase) обе таблицы находятся в одном файле.
+	"""
+
+	def __init__(self, users_db: str = None, services_db: str = None, batch_size: int = 1000):
+		"""
+		:param users_db: Путь к базе пользователей (users, bookings); открывается только для чтения.
+		:param services_db: Путь к базе услуг (services); открывается только для чтения.
+		:param batch_size: Количество строк, читаемых из курсора за раз.
+		"""
+		if users_db is None and services_db is None:
+			raise ValueError("At least one database is required")
+		self.databases = {name for name, path in (("users", users_db), ("services", services_db)) if path}
+		self.batch_size = batch_size
+		self.connection_manager = ConnectionManager(read_only_uri(users_db or services_db), pragmas = REPORT_PRAGMAS)
+		self.connection = self.connection_manager.connection()
+		# Для единой базы данных каталог находится в том же файле и не подключается
+		if users_db is not None and services_db is not None and os.path.abspath(users_db) != os.path.abspath(services_db):
+			self.connection.execute("ATTACH DATABASE ? AS catalog", (read_only_uri(services_db),))
+			self.catalog = "catalog"
+		else:
+			self.catalog = "main"
+
+	def close(self) -> None:
+		self.connection_manager.close_all()
+
+	def _stream(self, sql: str, params = ()):
+		"""Выполняет запрос и отдает строки по мере чтения из курсора."""
+		cursor = self.connection.execute(sql, params)
+		try:
+			while True:
+				rows = cursor.fetchmany(self.batch_size)
+				if not rows:
+					return
+				yield from rows
+		finally:
+			cursor.close()
+
+	def run(self, name: str, **params) -> tuple:
+		"""
+		Запускает отчет по имени.
+
+		:param name: Имя отчета из REPORTS.
+		:param params: Параметры метода отчета (since, until, limit).
+		:return: Кортеж (колонки, генератор строк).
+		"""
+		report = REPORTS.get(name)
+		if report is None:
+			raise ValueError(f"Unknown report: {name}")
+		missing = set(report.requires) - self.databases
+		if missing:
+			raise ValueError(f"Report {name} requires databases: {', '.join(sorted(missing))}")
+		return report.columns, getattr(self, name)(**params)
+
+	def tier_spending(self):
+		# Индекс idx_users_membership_spent покрывает запрос: группировка без сортировки и без чтения таблицы
+		return self._stream('''
+			SELECT membership_level, COUNT(*), SUM(total_spent), AVG(total_spent), MAX(total_spent)
+			FROM users
+			GROUP BY membership_level
+		''')
+
+	def top_customers(self, limit: int = 100):
+		# При LIMIT сортировка хранит только limit лучших строк
+		return self._stream('''
+			SELECT login, membership_level, total_spent,
+				(SELECT COUNT(*) FROM bookings WHERE bookings.login = users.login)
+			FROM users
+			ORDER BY total_spent DESC
+			LIMIT ?
+		''', (limit,))
+
+	def daily_revenue(self, since: float = None, until: float = None):
+		where, params = _range_filter(since, until)
+		return self._stream(f'''
+			SELECT date(created_at, 'unixepoch') AS day, COUNT(*), SUM(final_price)
+			FROM bookings
+			{where}
+			GROUP BY day
+			ORDER BY day
+		''', params)
+
+	def service_usage(self, since: float = None, until: float = None):
+		# Группировка по service_id идет по индексу idx_bookings_service_created без сортировки,
+		# каталог читается по уникальному индексу id для каждой группы
+		where, params = _range_filter(since, until)
+		rows = self._stream(f'''
+			SELECT usage.service_id, s.type, s.description, usage.bookings, usage.revenue
+			FROM (
+				SELECT service_id, COUNT(*) AS bookings, SUM(final_price) AS revenue
+				FROM bookings
+				{where}
+				GROUP BY service_id
+			) AS usage
+			LEFT JOIN {self.catalog}.services AS s ON s.id = usage.service_id
+		''', params)
+		for service_id, type_code, description, bookings, revenue in rows:
+			yield service_id, service_type_name(type_code), description, bookings, revenue
+
+	def service_type_revenue(self, since: float = None, until: float = None):
+		where, params = _range_filter(since, until)
+		rows = self._stream(f'''
+			SELECT s.type, SUM(usage.bookings), SUM(usage.revenue)
+			FROM (
+				SELECT service_id, COUNT(*) AS bookings, SUM(final_price) AS revenue
+				FROM bookings
+				{where}
+				GROUP BY service_id
+			) AS usage
+			LEFT JOIN {self.catalog}.services AS s ON s.id = usage.service_id
+			GROUP BY s.type
+		''', params)
+		for type_code, bookings, revenue in rows:
+			yield service_type_name(type_code), bookings, revenue
+
+	def catalog_summary(self):
+		# Индекс idx_services_type_cost покрывает запрос
+		rows = self._stream(f'''
+			SELECT type, COUNT(*), MIN(cost), AVG(cost), MAX(cost)
+			FROM {self.catalog}.services
+			GROUP BY type
+		''')
+		for type_code, *values in rows:
+			yield (service_type_name(type_code), *values)
+
+
+def write_csv(columns: tuple, rows, fp) -> int:
+	"""
+	Записывает строки отчета в CSV по одной, не накапливая их в памяти.
+
+	:return: Количество записанных строк.
+	"""
+	writer = csv.writer(fp)
+	writer.writerow(columns)
+	count = 0
+	for row in rows:
+		writer.writerow(row)
+		count += 1
+	return count
+
+
+def write_jsonl(columns: tuple, rows, fp) -> int:
+	"""
+	Записывает строки отчета в JSON Lines (один объект на строку).
+
+	:return: Количество записанных строк.
+	"""
+	count = 0
+	for row in rows:
+		fp.write(json.dumps(dict(zip(columns, row)), ensure_ascii = False))
+		fp.write("\n")
+		count += 1
+	return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
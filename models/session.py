@@ -0,0 +1,145 @@
+# DB
+import sqlite3
+from models.database import retry_on_busy
+
+# Models
+from models.user import SQLiteUserRepository
+
+# Another
+import hashlib, hmac, os, secrets, time
+
+
+# Менеджер сессий: выдает подписанные HMAC токены, чтобы повторный запуск не требовал bcrypt
+class SessionManager:
+	DEFAULT_TTL = 30 * 24 * 60 * 60  # 30 дней
+
+	INSERT_SQL = '''
+		INSERT INTO sessions (id, login, expires_at, created_at)
+		VALUES (?, ?, ?, ?)
+	'''
+
+	def __init__(self, user_repo: SQLiteUserRepository, secret: bytes, ttl: int = DEFAULT_TTL):
+		"""
+		:param user_repo: Репозиторий пользователей; таблица sessions создается им в той же базе данных.
+		:param secret: Секретный ключ для подписи токенов.
+		:param ttl: Время жизни сессии в секундах.
+		"""
+		self.user_repo = user_repo
+		self.secret = secret
+		self.ttl = ttl
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		return self.user_repo.connection
+
+	@staticmethod
+	def load_secret(path: str = '.session_key') -> bytes:
+		"""Читает секретный ключ из файла или создает новый, доступный только владельцу."""
+		try:
+			with open(path, 'rb') as f:
+				secret = f.read()
+			if secret:
+				return secret
+		except FileNotFoundError:
+			pass
+
+		secret = secrets.token_bytes(32)
+		fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+		with os.fdopen(fd, 'wb') as f:
+			f.write(secret)
+		return secret
+
+	def sign(self, session_id: str, login: str, expires_at: int) -> str:
+		message = f"{session_id}.{login}.{expires_at}".encode('utf-8')
+		return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+	def new_session(self, login: str) -> tuple:
+		"""
+		Генерирует сессию, не записывая ее в базу данных (например, для групповой записи).
+
+		:return: Кортеж (параметры для INSERT_SQL, токен).
+		"""
+		session_id = secrets.token_urlsafe(24)
+		now = int(time.time())
+		expires_at = now + self.ttl
+		token = f"{session_id}.{expires_at}.{self.sign(session_id, login, expires_at)}"
+		return (session_id, login, expires_at, now), token
+
+	@retry_on_busy
+	def create_session(self, login: str) -> str:
+		"""
+		Создает сессию для пользователя, уже прошедшего проверку пароля.
+
+		:param login: Логин пользователя.
+		:return: Токен вида "<id>.<expires_at>.<подпись>".
+		"""
+		row, token = self.new_session(login)
+		with self.connection:
+			self.connection.execute(self.INSERT_SQL, row)
+			self.connection.commit()
+		return token
+
+	@staticmethod
+	def parse_token(token: str):
+		"""Разбирает токен на (id, expires_at, подпись) или возвращает None."""
+		parts = token.strip().split('.')
+		if len(parts) != 3 or not parts[2]:
+			return None
+		session_id, expires_at, signature = parts
+		try:
+			return session_id, int(expires_at), signature
+		except ValueError:
+			return None
+
+	def validate(self, token: str):
+		"""
+		Проверяет токен одним запросом по первичному ключу и сравнением подписи за постоянное время.
+
+		:param token: Токен сессии.
+		:return: Данные пользователя (как в get_user) или None, если токен недействителен.
+		"""
+		parsed = self.parse_token(token)
+		if parsed is None:
+			return None
+		session_id, expires_at, signature = parsed
+
+		row = self.connection.execute('''
+			SELECT s.expires_at, u.login, u.password_hash, u.total_spent, u.membership_level
+			FROM sessions AS s
+			JOIN users AS u ON u.login = s.login
+			WHERE s.id = ?
+		''', (session_id,)).fetchone()
+		if row is None:
+			return None
+
+		stored_expires_at, *user_data = row
+		expected = self.sign(session_id, user_data[0], stored_expires_at)
+		if not hmac.compare_digest(expected, signature) or stored_expires_at != expires_at:
+			return None
+		if stored_expires_at <= time.time():
+			return None
+		return tuple(user_data)
+
+	def revoke(self, token: str) -> bool:
+		"""Отзывает сессию (например, при выходе из аккаунта)."""
+		parsed = self.parse_token(token)
+		if parsed is None:
+			return False
+		with self.connection:
+			cursor = self.connection.execute('DELETE FROM sessions WHERE id = ?', (parsed[0],))
+			self.connection.commit()
+		return cursor.rowcount > 0
+
+	def revoke_all(self, login: str) -> int:
+		"""Отзывает все сессии пользователя. Возвращает количество отозванных сессий."""
+		with self.connection:
+			cursor = self.connection.execute('DELETE FROM sessions WHERE login = ?', (login,))
+			self.connection.commit()
+		return cursor.rowcount
+
+	def purge_expired(self) -> int:
+		"""Удаляет истекшие сессии. Возвращает количество удаленных сессий."""
+		with self.connection:
+			cursor = self.connection.execute('DELETE FROM sessions WHERE expires_at <= ?', (int(time.time()),))
+			self.connection.commit()
+		return cursor.rowcount
@@ -0,0 +1,277 @@
+# DB
+import sqlite3
+from models.database import retry_on_busy
+
+# Models
+from models.user import User, SQLiteUserRepository
+from models.booking import SQLiteBookingRepository
+
+# Another
+import json, os, threading, time
+
+
+class SpendingAccumulator:
+	"""
+	Отложенная запись расходов (write-behind). Каждое пополнение расходов (и строки заказа) дописывается
+	в журнал на диске, а состояние пользователя в памяти обновляется сразу. Накопленные пополнения
+	объединяются по пользователям и записываются в базу одной транзакцией: по таймеру, при накоплении
+	max_pending записей и при закрытии.
+
+	Записи журнала пронумерованы; номер последней примененной записи хранится в таблице
+	spending_journal_state в той же транзакции, что и расходы. Поэтому после сбоя при запуске
+	применяются ровно те записи, которые не успели попасть в базу.
+
+	Объект можно передавать вместо SQLiteUserRepository (остальные методы делегируются ему)
+	и вместо SQLiteBookingRepository (record_bookings).
+	"""
+
+	def __init__(
+		self,
+		user_repo: SQLiteUserRepository,
+		journal_path: str,
+		flush_interval: float = 1.0,
+		max_pending: int = 500,
+		sync: bool = False
+	):
+		"""
+		:param user_repo: Репозиторий пользователей, в базу которого записываются расходы.
+		:param journal_path: Путь к файлу журнала (один журнал — один процесс).
+		:param flush_interval: Период записи в базу в секундах.
+		:param max_pending: Количество записей журнала, при котором запись в базу начинается досрочно.
+		:param sync: Выполнять fsync после каждой записи журнала. По умолчанию запись только передается
+			ОС (flush): она переживает падение процесса, но не сбой питания — так же, как фиксация
+			в базе с WAL и synchronous=NORMAL. fsync защищает и от сбоя питания, но стоит
+			синхронной записи на диск в каждом заказе.
+		"""
+		self.user_repo = user_repo
+		self.journal_path = os.path.abspath(journal_path)
+		self.flush_interval = flush_interval
+		self.max_pending = max_pending
+		self.sync = sync
+
+		self._lock = threading.Lock()
+		self._flush_lock = threading.Lock()
+		self._entries = []  # записи журнала, ожидающие записи в базу
+		self._inflight = []  # записи, которые записываются в базу прямо сейчас
+		self._totals = {}  # login -> total_spent с учетом пополнений, еще не записанных в базу
+		self._seq = self.recover()
+		self._journal = open(self.journal_path, "a", encoding = "utf-8")
+
+		self._wake = threading.Event()
+		self._stopped = False
+		self._thread = threading.Thread(target = self._run, name = "spending-flush", daemon = True)
+		self._thread.start()
+
+	def __getattr__(self, name: str):
+		return getattr(self.user_repo, name)
+
+	def _read_journal(self) -> list:
+		"""Читает записи журнала. Недописанная последняя строка (сбой во время записи) пропускается."""
+		entries = []
+		try:
+			with open(self.journal_path, "r", encoding = "utf-8") as f:
+				for line in f:
+					try:
+						entries.append(json.loads(line))
+					except ValueError:
+						break
+		except FileNotFoundError:
+			pass
+		return entries
+
+	def _applied_seq(self) -> int:
+		row = self.user_repo.connection.execute(
+			'SELECT applied_seq FROM spending_journal_state WHERE journal = ?', (self.journal_path,)
+		).fetchone()
+		return row[0] if row else 0
+
+	def recover(self) -> int:
+		"""
+		Применяет к базе записи журнала, оставшиеся после предыдущего запуска, и очищает журнал.
+
+		:return: Номер последней записи журнала.
+		"""
+		applied_seq = self._applied_seq()
+		entries = [entry for entry in self._read_journal() if entry["seq"] > applied_seq]
+		if entries:
+			self._apply(entries)
+		with open(self.journal_path, "w"):
+			pass
+		return max([applied_seq] + [entry["seq"] for entry in entries])
+
+	@retry_on_busy
+	def _apply(self, entries: list) -> dict:
+		"""
+		Записывает пополнения одной транзакцией: строки заказов, суммы по пользователям
+		и номер последней примененной записи журнала.
+
+		:return: Словарь login -> (total_spent, membership_level) после записи.
+		"""
+		amounts = {}
+		bookings = []
+		for entry in entries:
+			amounts[entry["login"]] = amounts.get(entry["login"], 0.0) + entry["amount"]
+			bookings.extend((entry["login"], *line, entry["created_at"]) for line in entry.get("lines", ()))
+
+		connection = self.user_repo.connection
+		states = {}
+		with connection:
+			for login, amount in amounts.items():
+				rows = connection.execute(
+					SQLiteUserRepository.ADD_SPENDING_SQL, {"login": login, "amount": amount}
+				).fetchall()
+				if rows:
+					states[login] = rows[0]
+				else:
+					print(f"Пользователь {login} не найден, расходы из журнала пропущены.")
+			if bookings:
+				connection.executemany(SQLiteBookingRepository.INSERT_SQL, bookings)
+			connection.execute('''
+				INSERT INTO spending_journal_state (journal, applied_seq) VALUES (?, ?)
+				ON CONFLICT (journal) DO UPDATE SET applied_seq = excluded.applied_seq
+			''', (self.journal_path, entries[-1]["seq"]))
+			connection.commit()
+		return states
+
+	def _read_user(self, login: str):
+		"""
+		Читает пользователя с учетом пополнений, еще не записанных в базу.
+		Сумма расходов и номер примененной записи журнала читаются одним запросом, поэтому
+		пополнения не учитываются дважды, даже если запись группы завершилась во время чтения.
+
+		:return: Данные пользователя (как в get_user) или None.
+		"""
+		row = self.user_repo.connection.execute('''
+			SELECT login, password_hash, total_spent, membership_level,
+				COALESCE((SELECT applied_seq FROM spending_journal_state WHERE journal = :journal), 0)
+			FROM users
+			WHERE login = :login
+		''', {"login": login, "journal": self.journal_path}).fetchone()
+		if row is None:
+			return None
+		*user_data, applied_seq = row
+		with self._lock:
+			pending = sum(
+				entry["amount"] for entry in self._inflight + self._entries
+				if entry["login"] == login and entry["seq"] > applied_seq
+			)
+		if not pending:
+			return tuple(user_data)
+		total = user_data[2] + pending
+		return user_data[0], user_data[1], total, User.determine_membership_level(total)
+
+	def _append(self, login: str, amount: float, lines: list = None, created_at: float = None):
+		self.user_repo.refresh_membership_tiers()
+		if login not in self._totals:
+			user_data = self._read_user(login)
+			if user_data is None:
+				return None
+			with self._lock:
+				self._totals.setdefault(login, user_data[2])
+
+		with self._lock:
+			self._seq += 1
+			entry = {"seq": self._seq, "login": login, "amount": amount}
+			if lines:
+				entry["lines"] = [
+					(line.service_id, line.list_price, line.discount, line.final_price) for line in lines
+				]
+				entry["created_at"] = time.time() if created_at is None else created_at
+			self._journal.write(json.dumps(entry, ensure_ascii = False) + "\n")
+			self._journal.flush()
+			if self.sync:
+				os.fsync(self._journal.fileno())
+
+			self._entries.append(entry)
+			total = self._totals[login] = self._totals[login] + amount
+			if len(self._entries) >= self.max_pending:
+				self._wake.set()
+		return total, User.determine_membership_level(total)
+
+	def add_spending(self, login: str, amount: float):
+		"""
+		Записывает пополнение в журнал; в базу оно попадет при следующей записи группы.
+
+		:return: Кортеж (новый total_spent, новый уровень членства) или None, если пользователь не найден.
+		"""
+		return self._append(login, amount)
+
+	def update_spending(self, login: str, amount: float) -> bool:
+		return self.add_spending(login, amount) is not None
+
+	def record_bookings(self, login: str, lines: list, created_at: float = None):
+		"""Записывает заказ в журнал (интерфейс SQLiteBookingRepository.record_bookings)."""
+		return self._append(login, sum(line.final_price for line in lines), lines, created_at)
+
+	def get_user(self, login: str):
+		return self._read_user(login)
+
+	def flush(self) -> int:
+		"""
+		Записывает накопленные пополнения в базу одной транзакцией.
+
+		:return: Количество записанных записей журнала.
+		"""
+		with self._flush_lock:
+			with self._lock:
+				entries, self._entries = self._entries, []
+				self._inflight = entries
+			if not entries:
+				return 0
+
+			try:
+				states = self._apply(entries)
+			except BaseException:
+				# Записи остаются в журнале и в очереди и будут записаны следующей группой
+				with self._lock:
+					self._entries = entries + self._entries
+					self._inflight = []
+				raise
+
+			with self._lock:
+				self._inflight = []
+				# База могла измениться другими процессами: берем ее итог и добавляем новые пополнения
+				for login, (total_spent, _) in states.items():
+					self._totals[login] = total_spent + sum(
+						entry["amount"] for entry in self._entries if entry["login"] == login
+					)
+				self._compact_journal()
+			return len(entries)
+
+	def _compact_journal(self) -> None:
+		"""Оставляет в журнале только записи, еще не записанные в базу (вызывается под _lock)."""
+		if not self._entries:
+			self._journal.truncate(0)
+			return
+		tmp_path = self.journal_path + ".tmp"
+		with open(tmp_path, "w", encoding = "utf-8") as f:
+			for entry in self._entries:
+				f.write(json.dumps(entry, ensure_ascii = False) + "\n")
+			f.flush()
+			if self.sync:
+				os.fsync(f.fileno())
+		self._journal.close()
+		os.replace(tmp_path, self.journal_path)
+		self._journal = open(self.journal_path, "a", encoding = "utf-8")
+
+	def _run(self) -> None:
+		while True:
+			self._wake.wait(self.flush_interval)
+			self._wake.clear()
+			if self._stopped:
+				break
+			try:
+				self.flush()
+			except sqlite3.Error as e:
+				print(f"Ошибка при записи расходов из журнала: {e}")
+		self.user_repo.connection_manager.close()
+
+	def close(self) -> None:
+		"""Останавливает фоновую запись, записывает оставшиеся пополнения и закрывает журнал."""
+		if self._stopped:
+			return
+		self._stopped = True
+		self._wake.set()
+		self._thread.join()
+		self.flush()
+		self._journal.close()
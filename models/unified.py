@@ -0,0 +1,114 @@
+# DB
+import sqlite3
+from models.database import ConnectionManager
+from models.instrumentation import SQLMetrics
+
+# Models
+from models.repair_service import SQLiteServiceRepository
+from models.user import SQLiteUserRepository
+from models.booking import SQLiteBookingRepository
+
+# Another
+import os
+
+
+class UnifiedDatabase:
+	"""
+	Единая база данных: каталог услуг, пользователи и журнал бронирований в одном файле
+	с общими соединениями. Заказ (сверка цен с каталогом, строки заказа и расходы пользователя)
+	фиксируется одной транзакцией и одним fsync, а соединения users и services выполняются в SQLite.
+
+	Отдельные файлы, подключенные через ATTACH, этого не дают: в режиме WAL транзакция, затрагивающая
+	несколько файлов, атомарна в каждом из них, но не в целом. Поэтому ATTACH используется только
+	для одноразового переноса данных из отдельных файлов (merge_split_databases).
+	"""
+
+	def __init__(self, db_name: str, cache_size: int = 10000, metrics: SQLMetrics = None):
+		"""
+		:param db_name: Путь к файлу единой базы данных.
+		:param cache_size: Максимальное количество услуг в кэше каталога.
+		:param metrics: Сборщик метрик SQL.
+		"""
+		self.db_name = db_name
+		self.connection_manager = ConnectionManager(db_name, metrics = metrics, unified = True)
+		self.service_repo = SQLiteServiceRepository(
+			db_name, cache_size = cache_size, connection_manager = self.connection_manager
+		)
+		self.user_repo = SQLiteUserRepository(db_name, connection_manager = self.connection_manager)
+		self.booking_repo = SQLiteBookingRepository(self.user_repo, self.service_repo)
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		"""Соединение текущего потока."""
+		return self.connection_manager.connection()
+
+	def close(self) -> None:
+		self.connection_manager.close_all()
+
+
+def _source_tables(connection: sqlite3.Connection, schema: str) -> list:
+	"""
+	Таблицы подключенной базы, данные которых переносятся. Полнотекстовый индекс не копируется:
+	его заполняют триггеры services при вставке строк.
+	"""
+	return [name for (name,) in connection.execute(f'''
+		SELECT name FROM {schema}.sqlite_master
+		WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'services_fts%'
+		ORDER BY rowid
+	''')]
+
+
+def merge_split_databases(services_db: str, users_db: str, db_name: str) -> dict:
+	"""
+	Переносит данные из отдельных services.db и users.db в новую единую базу данных.
+	Исходные файлы сначала обновляются до текущих версий схем, затем подключаются через ATTACH,
+	и все таблицы копируются INSERT ... SELECT одной транзакцией единой базы: при ошибке она
+	остается пустой. Исходные файлы не изменяются (кроме миграций схемы) и могут служить резервной копией.
+
+	:param services_db: Путь к базе данных каталога услуг.
+	:param users_db: Путь к базе данных пользователей и заказов.
+	:param db_name: Путь к единой базе данных (создается, если ее нет; должна быть пустой).
+	:return: Словарь {таблица: количество перенесенных строк}.
+	"""
+	for path in (services_db, users_db):
+		if not os.path.exists(path):
+			raise FileNotFoundError(path)
+
+	# Колонки таблиц совпадают, только если исходные файлы прошли те же миграции
+	SQLiteServiceRepository(services_db, cache_size = 0).connection_manager.close_all()
+	SQLiteUserRepository(users_db).connection_manager.close_all()
+
+	database = UnifiedDatabase(db_name, cache_size = 0)
+	connection = database.connection
+	try:
+		if connection.execute('SELECT EXISTS (SELECT 1 FROM services) OR EXISTS (SELECT 1 FROM users)').fetchone()[0]:
+			raise ValueError(f"Database {db_name} already contains data")
+
+		# ATTACH недоступен внутри транзакции, поэтому базы подключаются до BEGIN
+		sources = (("split_services", services_db), ("split_users", users_db))
+		for schema, path in sources:
+			connection.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+		copied = {}
+		try:
+			connection.execute("BEGIN IMMEDIATE")
+			for schema, _ in sources:
+				for table in _source_tables(connection, schema):
+					columns = ", ".join(row[1] for row in connection.execute(f"PRAGMA main.table_info({table})"))
+					# Таблица могла получить строки по умолчанию при создании (например, membership_tiers)
+					connection.execute(f"DELETE FROM main.{table}")
+					copied[table] = connection.execute(
+						f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM {schema}.{table}"
+					).rowcount
+			connection.commit()
+		except BaseException:
+			connection.rollback()
+			raise
+		finally:
+			for schema, _ in sources:
+				connection.execute(f"DETACH DATABASE {schema}")
+
+		# Уровни членства единой базы становятся действующими в процессе
+		database.user_repo.load_membership_tiers()
+	finally:
+		database.close()
+	return copied
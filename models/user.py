@@ -1,9 +1,70 @@
 # DB
 import sqlite3
+from models.database import ConnectionManager, Migration, apply_migrations, retry_on_busy
+from models.instrumentation import SQLMetrics
 
 # Another
 from abc import ABC, abstractmethod
-import bcrypt
+import sys, threading, time
+
+
+# Уровни членства по умолчанию: (название, минимальная сумма расходов, скидка), от старшего к младшему.
+# Действующие уровни хранятся в таблице membership_tiers и загружаются репозиторием при открытии базы
+MEMBERSHIP_TIERS = (
+	("Platinum", 1000, 0.15),
+	("Gold", 500, 0.1),
+	("Silver", 200, 0.05),
+	("Bronze", 0, 0.0),
+)
+
+_active_tiers = MEMBERSHIP_TIERS
+
+
+def validate_membership_tiers(tiers) -> tuple:
+	"""
+	Проверяет уровни членства и упорядочивает их от старшего к младшему.
+
+	:param tiers: Итерируемый объект кортежей (название, порог, скидка).
+	:return: Кортеж уровней, отсортированный по убыванию порога.
+	:raises ValueError: Если названия или пороги повторяются, нет уровня с порогом 0
+		или скидка вне диапазона [0, 1).
+	"""
+	tiers = tuple(sorted(
+		((str(level), float(threshold), float(discount)) for level, threshold, discount in tiers),
+		key = lambda tier: tier[1],
+		reverse = True
+	))
+	if not tiers:
+		raise ValueError("At least one membership tier is required")
+	if len({level for level, _, _ in tiers}) != len(tiers) or len({threshold for _, threshold, _ in tiers}) != len(tiers):
+		raise ValueError("Membership tier names and thresholds must be unique")
+	if tiers[-1][1] != 0:
+		raise ValueError("The lowest membership tier must start at 0")
+	if any(not 0 <= discount < 1 for _, _, discount in tiers):
+		raise ValueError("Membership discounts must be in [0, 1)")
+	return tiers
+
+
+def get_membership_tiers() -> tuple:
+	"""Действующие уровни членства (по умолчанию MEMBERSHIP_TIERS)."""
+	return _active_tiers
+
+
+def set_membership_tiers(tiers) -> None:
+	"""Заменяет действующие уровни членства процесса (в базе данных они не меняются)."""
+	global _active_tiers
+	_active_tiers = validate_membership_tiers(tiers)
+
+
+def membership_level_sql(total_expression: str) -> str:
+	"""
+	Строит SQL-выражение, вычисляющее уровень членства по сумме расходов
+	поиском в таблице membership_tiers (по уникальному индексу порогов).
+	"""
+	return f'''COALESCE(
+		(SELECT level FROM membership_tiers WHERE min_spent <= {total_expression} ORDER BY min_spent DESC LIMIT 1),
+		(SELECT level FROM membership_tiers ORDER BY min_spent LIMIT 1)
+	)'''
 
 
 class UserRepository(ABC):
@@ -28,24 +89,152 @@ class UserRepository(ABC):
 	def verify_user(self, password: str) -> bool:
 		...
 
+	@abstractmethod
+	def add_spending(self, login: str, amount: float):
+		...
+
+	@abstractmethod
+	def get_users_by_membership(self, membership_level: str, min_spent: float = None, limit: int = None) -> list:
+		...
+
+	@abstractmethod
+	def recalculate_membership_levels(self) -> int:
+		...
+
+
+def _create_users_v1(connection: sqlite3.Connection) -> None:
+	"""Версия 1: пользователи, сессии и журнал бронирований."""
+	connection.execute('''
+		CREATE TABLE IF NOT EXISTS users (
+			login TEXT NOT NULL PRIMARY KEY,
+			password_hash TEXT NOT NULL,
+			total_spent REAL NOT NULL,
+			membership_level TEXT NOT NULL
+		)
+	''')
+
+	# Сессии (SessionManager)
+	connection.execute('''
+		CREATE TABLE IF NOT EXISTS sessions (
+			id TEXT NOT NULL PRIMARY KEY,
+			login TEXT NOT NULL,
+			expires_at INTEGER NOT NULL,
+			created_at INTEGER NOT NULL
+		)
+	''')
+	connection.execute('CREATE INDEX IF NOT EXISTS idx_sessions_login ON sessions (login)')
+
+	# Журнал бронирований (SQLiteBookingRepository)
+	connection.execute('''
+		CREATE TABLE IF NOT EXISTS bookings (
+			id INTEGER PRIMARY KEY,
+			login TEXT NOT NULL,
+			service_id TEXT NOT NULL,
+			list_price REAL NOT NULL,
+			discount REAL NOT NULL,
+			final_price REAL NOT NULL,
+			created_at REAL NOT NULL
+		)
+	''')
+	# Индексы покрывают запросы истории и агрегаты, поэтому они не читают саму таблицу
+	connection.execute('''
+		CREATE INDEX IF NOT EXISTS idx_bookings_login_created
+		ON bookings (login, created_at, service_id, list_price, discount, final_price)
+	''')
+	connection.execute('''
+		CREATE INDEX IF NOT EXISTS idx_bookings_service_created
+		ON bookings (service_id, created_at, final_price)
+	''')
+	connection.execute('''
+		CREATE TRIGGER IF NOT EXISTS bookings_no_update BEFORE UPDATE ON bookings
+		BEGIN SELECT RAISE(ABORT, 'bookings ledger is append-only'); END
+	''')
+	connection.execute('''
+		CREATE TRIGGER IF NOT EXISTS bookings_no_delete BEFORE DELETE ON bookings
+		BEGIN SELECT RAISE(ABORT, 'bookings ledger is append-only'); END
+	''')
+
+
+def _create_membership_tiers(connection: sqlite3.Connection) -> None:
+	"""Версия 4: таблица уровней членства, заполненная значениями по умолчанию."""
+	connection.execute('''
+		CREATE TABLE IF NOT EXISTS membership_tiers (
+			level TEXT NOT NULL PRIMARY KEY,
+			min_spent REAL NOT NULL UNIQUE,
+			discount REAL NOT NULL CHECK (discount >= 0 AND discount < 1)
+		)
+	''')
+	connection.executemany(
+		'INSERT OR IGNORE INTO membership_tiers (level, min_spent, discount) VALUES (?, ?, ?)',
+		MEMBERSHIP_TIERS
+	)
+
+
+# Миграции users.db по порядку версий (PRAGMA user_version, в единой базе — компонент "users")
+USERS_MIGRATIONS = [
+	Migration(1, "Пользователи, сессии и журнал бронирований", (_create_users_v1,)),
+	Migration(2, "Индекс для выборок по уровню членства и сумме расходов", (
+		"CREATE INDEX IF NOT EXISTS idx_users_membership_spent ON users (membership_level, total_spent)",
+	)),
+	Migration(3, "Позиции журналов отложенной записи расходов", ('''
+		CREATE TABLE IF NOT EXISTS spending_journal_state (
+			journal TEXT NOT NULL PRIMARY KEY,
+			applied_seq INTEGER NOT NULL
+		)
+	''',)),
+	Migration(4, "Таблица уровней членства", (_create_membership_tiers,)),
+]
+
 
 # Репозиторий пользователей для хранения и проверки пользователей
 class SQLiteUserRepository(UserRepository):
-	def __init__(self, db_name):
-		self.connection = sqlite3.connect(db_name)
+	MIGRATIONS = USERS_MIGRATIONS
+	# Версия схемы users.db; при совпадении DDL при запуске не выполняется
+	SCHEMA_VERSION = MIGRATIONS[-1].version
+
+	# Новый пользователь получает младший уровень членства
+	INSERT_USER_SQL = f'''
+		INSERT INTO users (login, password_hash, total_spent, membership_level)
+		VALUES (?, ?, 0.0, {membership_level_sql("0.0")})
+	'''
+
+	# Инкремент расходов и пересчет уровня членства одним атомарным UPDATE.
+	# CAST нужен потому, что RETURNING отдает целое значение REAL (например, 300.0) как int
+	ADD_SPENDING_SQL = f'''
+		UPDATE users
+		SET total_spent = total_spent + :amount,
+			membership_level = {membership_level_sql("(total_spent + :amount)")}
+		WHERE login = :login
+		RETURNING CAST(total_spent AS REAL), membership_level
+	'''
+
+	def __init__(
+		self,
+		db_name,
+		connection_manager: ConnectionManager = None,
+		metrics: SQLMetrics = None,
+		tiers_check_interval: float = 1.0
+	):
+		"""
+		:param db_name: Путь к файлу базы данных.
+		:param connection_manager: Готовый менеджер соединений (по умолчанию создается для db_name).
+		:param metrics: Сборщик метрик SQL для менеджера соединений, создаваемого по умолчанию.
+		:param tiers_check_interval: Как часто (в секундах) проверять, не изменили ли уровни членства другие процессы.
+		"""
+		self.connection_manager = connection_manager or ConnectionManager(db_name, metrics=metrics)
+		self.tiers_check_interval = tiers_check_interval
+		# PRAGMA data_version имеет смысл только в пределах одного соединения, поэтому хранится по потокам
+		self._tiers_state = threading.local()
 		self.create_table()
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		"""Соединение текущего потока."""
+		return self.connection_manager.connection()
 	
 	def create_table(self) -> None:
-		with self.connection:
-			self.connection.execute('''
-				CREATE TABLE IF NOT EXISTS users (
-					login TEXT NOT NULL PRIMARY KEY,
-					password_hash TEXT NOT NULL,
-					total_spent REAL NOT NULL,
-					membership_level TEXT NOT NULL
-				)
-			''')
-			self.connection.commit()
+		apply_migrations(self.connection, self.MIGRATIONS, self.connection_manager.schema_component("users"))
+		self.load_membership_tiers()
 
 	def is_login_exists(self, login: str) -> bool:
 		with self.connection:
@@ -57,16 +246,50 @@ class SQLiteUserRepository(UserRepository):
 	def add_user(self, login: str, password: str) -> bool:
 		if self.is_login_exists(login):
 			return False
-		
-		with self.connection:
-			self.connection.execute('''
-				INSERT INTO users (login, password_hash, total_spent, membership_level) 
-				VALUES (?, ?, ?, ?)
-			''', (login, self.hash_password(password), 0.0, "Bronze"))
-			self.connection.commit()
+		return self.add_user_with_hash(login, self.hash_password(password))
+
+	@retry_on_busy
+	def add_user_with_hash(self, login: str, password_hash: bytes) -> bool:
+		"""
+		Добавляет пользователя с уже вычисленным хэшем пароля.
+		Позволяет хэшировать пароль вне потока, владеющего соединением.
+
+		:param login: Логин пользователя.
+		:param password_hash: Хэш пароля, полученный из hash_password.
+		:return: True, если пользователь добавлен, False, если логин уже занят.
+		"""
+		try:
+			with self.connection:
+				self.connection.execute(self.INSERT_USER_SQL, (login, password_hash))
+				self.connection.commit()
+		except sqlite3.IntegrityError:
+			return False
 		return True
 
+	def get_users_by_membership(self, membership_level: str, min_spent: float = None, limit: int = None) -> list:
+		"""
+		Возвращает пользователей уровня членства, от больших расходов к меньшим.
+		Запрос обслуживается индексом idx_users_membership_spent без сортировки.
+
+		:param membership_level: Уровень членства.
+		:param min_spent: Нижняя граница суммы расходов включительно.
+		:param limit: Максимальное количество пользователей (None — без ограничения).
+		:return: Список строк (login, password_hash, total_spent, membership_level).
+		"""
+		sql = 'SELECT * FROM users WHERE membership_level = ?'
+		params = [membership_level]
+		if min_spent is not None:
+			sql += ' AND total_spent >= ?'
+			params.append(min_spent)
+		sql += ' ORDER BY total_spent DESC'
+		if limit is not None:
+			sql += ' LIMIT ?'
+			params.append(limit)
+		return self.connection.execute(sql, params).fetchall()
+
 	def get_user(self, login: str) -> list:
+		# Уровень и скидка пользователя показываются по действующим уровням членства
+		self.refresh_membership_tiers()
 		cursor = self.connection.cursor()
 		cursor.execute('SELECT * FROM users WHERE login = ?', (login,))
 		row = cursor.fetchall()
@@ -101,14 +324,123 @@ class SQLiteUserRepository(UserRepository):
 		if stored_hash is None:
 			return False
 
+		return self.check_password(password, stored_hash)
+
+	@staticmethod
+	def check_password(password: str, stored_hash: bytes) -> bool:
+		"""Сверяет пароль с хэшем. Не обращается к базе данных, поэтому безопасно вызывается из любого потока."""
+		import bcrypt  # Ленивый импорт: не нужен при входе по токену сессии
 		return bcrypt.checkpw(password.encode('utf-8'), stored_hash)
 
 	@staticmethod
 	def hash_password(password: str) -> bytes:
+		import bcrypt
+
 		# Генерируем соль и хешируем пароль
 		salt = bcrypt.gensalt()
 		return bcrypt.hashpw(password.encode('utf-8'), salt)
 	
+	@retry_on_busy
+	def add_spending(self, login: str, amount: float):
+		"""
+		Атомарно увеличивает total_spent и пересчитывает уровень членства одним UPDATE.
+		Корректно работает при одновременной записи из нескольких соединений.
+
+		:param login: Логин пользователя.
+		:param amount: Сумма для добавления к total_spent.
+		:return: Кортеж (новый total_spent, новый уровень членства) или None, если пользователь не найден.
+		"""
+		with self.connection:
+			rows = self.connection.execute(
+				self.ADD_SPENDING_SQL, {"login": login, "amount": amount}
+			).fetchall()
+			self.connection.commit()
+		return rows[0] if rows else None
+
+	def load_membership_tiers(self) -> tuple:
+		"""
+		Читает уровни членства из базы данных и делает их действующими в процессе
+		(User.determine_membership_level, скидки, PricingEngine).
+
+		:return: Кортеж уровней (название, порог, скидка) от старшего к младшему.
+		"""
+		rows = self.connection.execute(
+			'SELECT level, min_spent, discount FROM membership_tiers ORDER BY min_spent DESC'
+		).fetchall()
+		set_membership_tiers(rows)
+		return get_membership_tiers()
+
+	def refresh_membership_tiers(self) -> None:
+		"""
+		Перечитывает уровни членства, если базу данных изменило другое соединение (например,
+		tools/membership_tiers.py в другом процессе), чтобы цены и уровни в Python совпадали
+		с ADD_SPENDING_SQL. Изменения определяются по PRAGMA data_version не чаще раза в
+		tiers_check_interval секунд, поэтому вызов дешев на пути каждого заказа.
+		"""
+		state = self._tiers_state
+		now = time.monotonic()
+		checked_at = getattr(state, "checked_at", None)
+		if checked_at is not None and now - checked_at < self.tiers_check_interval:
+			return
+
+		data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+		if data_version != getattr(state, "data_version", None):
+			self.load_membership_tiers()
+		state.data_version = data_version
+		state.checked_at = now
+
+	@staticmethod
+	def _recalculate_levels(connection: sqlite3.Connection, tiers: tuple) -> int:
+		"""Назначает уровни членства всем пользователям одним UPDATE, не фиксируя транзакцию."""
+		branches = " ".join("WHEN total_spent >= ? THEN ?" for _ in tiers[:-1])
+		case = f"CASE {branches} ELSE ? END"
+		params = [value for level, threshold, _ in tiers[:-1] for value in (threshold, level)] + [tiers[-1][0]]
+		cursor = connection.execute(
+			f'UPDATE users SET membership_level = {case} WHERE membership_level IS NOT {case}',
+			params * 2
+		)
+		return cursor.rowcount
+
+	@retry_on_busy
+	def recalculate_membership_levels(self) -> int:
+		"""
+		Пересчитывает уровень членства всех пользователей по таблице membership_tiers
+		одним UPDATE (без загрузки пользователей в Python).
+
+		:return: Количество пользователей, у которых изменился уровень.
+		"""
+		with self.connection:
+			# Блокировка записи берется до чтения уровней, чтобы они не изменились до UPDATE
+			self.connection.execute("BEGIN IMMEDIATE")
+			tiers = validate_membership_tiers(self.connection.execute(
+				'SELECT level, min_spent, discount FROM membership_tiers'
+			).fetchall())
+			changed = self._recalculate_levels(self.connection, tiers)
+			self.connection.commit()
+		set_membership_tiers(tiers)
+		return changed
+
+	@retry_on_busy
+	def save_membership_tiers(self, tiers) -> int:
+		"""
+		Заменяет уровни членства в базе данных и сразу пересчитывает уровни всех пользователей
+		в той же транзакции.
+
+		:param tiers: Кортежи (название, порог, скидка).
+		:return: Количество пользователей, у которых изменился уровень.
+		"""
+		tiers = validate_membership_tiers(tiers)
+		with self.connection:
+			self.connection.execute("BEGIN IMMEDIATE")
+			self.connection.execute('DELETE FROM membership_tiers')
+			self.connection.executemany(
+				'INSERT INTO membership_tiers (level, min_spent, discount) VALUES (?, ?, ?)', tiers
+			)
+			changed = self._recalculate_levels(self.connection, tiers)
+			self.connection.commit()
+		set_membership_tiers(tiers)
+		return changed
+
 	def update_spending(self, login: str, amount: float) -> bool:
 		"""
 		Инкрементирует поле total_spent на заданную сумму и обновляет уровень членства, если необходимо.
@@ -117,34 +449,8 @@ class SQLiteUserRepository(UserRepository):
 		:param amount: Сумма для добавления к total_spent.
 		:return: True, если обновление прошло успешно, False в противном случае.
 		"""
-		if not self.is_login_exists(login):
-			return False
-
 		try:
-			with self.connection:
-				# Получаем текущую сумму
-				cursor = self.connection.execute(
-					"SELECT total_spent FROM users WHERE login = ?", (login,)
-				)
-				row = cursor.fetchone()
-				if row is None:
-					return False
-				current_total = row[0]
-
-				# Инкрементируем сумму
-				new_total = current_total + amount
-
-				# Определяем новый уровень членства
-				new_level = User.determine_membership_level(new_total)
-
-				# Обновляем базу данных
-				self.connection.execute('''
-					UPDATE users 
-					SET total_spent = ?, membership_level = ?
-					WHERE login = ?
-				''', (new_total, new_level, login))
-				self.connection.commit()
-			return True
+			return self.add_spending(login, amount) is not None
 		except sqlite3.Error as e:
 			print(f"Ошибка при обновлении расходов пользователя: {e}")
 			return False
@@ -152,34 +458,51 @@ class SQLiteUserRepository(UserRepository):
 
 # Класс пользователя
 class User():
+	__slots__ = ("login", "password_hash", "total_spent", "membership_level", "user_repo")
+
 	def __init__(
 		self,
 		login: str,
 		password_hash: str,
 		total_spent: float,
 		membership_level: str,
-		user_repo: SQLiteUserRepository
+		user_repo: SQLiteUserRepository = None
 	):
+		"""
+		:param user_repo: Репозиторий для записи расходов. Пользователи, загруженные только для чтения
+			(например, массово для отчетов), могут не хранить ссылку на репозиторий.
+		"""
 		self.login = login
 		self.password_hash = password_hash
-		self.membership_level = membership_level
+		# Уровней членства всего несколько, все пользователи ссылаются на одни и те же строки
+		self.membership_level = sys.intern(membership_level)
 		self.total_spent = total_spent
 		self.user_repo = user_repo
 	
 	def get_membership_discount(self):
-		if self.membership_level == "Platinum":
-			return 0.15
-		elif self.membership_level == "Gold":
-			return 0.1
-		elif self.membership_level == "Silver":
-			return 0.05
-		else:
-			return 0.0
+		return self.get_discount_for_level(self.membership_level)
+
+	@staticmethod
+	def get_discount_for_level(membership_level: str) -> float:
+		for level, _, discount in get_membership_tiers():
+			if membership_level == level:
+				return discount
+		return 0.0
 		
 	def add_spent(self, sum: float) -> None:
-		self.total_spent += sum
-		self.user_repo.update_spending(self.login, sum)
-		self.membership_level = self.determine_membership_level(self.total_spent)
+		state = None
+		if self.user_repo is not None:
+			try:
+				state = self.user_repo.add_spending(self.login, sum)
+			except sqlite3.Error as e:
+				print(f"Ошибка при обновлении расходов пользователя: {e}")
+
+		if state is not None:
+			# Состояние, возвращенное базой данных, учитывает покупки из других окон и процессов
+			self.total_spent, self.membership_level = state
+		else:
+			self.total_spent += sum
+			self.membership_level = self.determine_membership_level(self.total_spent)
 
 	@staticmethod
 	def determine_membership_level(total_spent: float) -> str:
@@ -189,11 +512,8 @@ class User():
 		:param total_spent: Общая сумма расходов пользователя.
 		:return: Строка с уровнем членства.
 		"""
-		if total_spent >= 1000:
-			return "Platinum"
-		elif total_spent >= 500:
-			return "Gold"
-		elif total_spent >= 200:
-			return "Silver"
-		else:
-			return "Bronze"
+		tiers = get_membership_tiers()
+		for level, threshold, _ in tiers:
+			if total_spent >= threshold:
+				return level
+		return tiers[-1][0]
@@ -0,0 +1,56 @@
+# Another
+import argparse, signal, sys, threading
+
+# Сервер бронирований без интерфейса: единственный процесс, работающий с services.db и users.db
+# (или с единой базой данных --database).
+# Настольные клиенты подключаются к нему через main.py --server URL
+
+
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description = "Repair Service booking server")
+	parser.add_argument("--host", default = "127.0.0.1", help = "адрес для приема подключений")
+	parser.add_argument("--port", type = int, default = 8765, help = "порт HTTP API")
+	parser.add_argument("--services-db", default = "services.db", help = "база данных каталога услуг")
+	parser.add_argument("--users-db", default = "users.db", help = "база данных пользователей и заказов")
+	parser.add_argument("--database", help = "единая база данных услуг и пользователей (вместо --services-db и --users-db)")
+	parser.add_argument("--workers", type = int, default = 16, help = "количество потоков обработки запросов")
+	parser.add_argument(
+		"--max-batch",
+		type = int,
+		default = 256,
+		help = "максимальное количество операций записи в одной транзакции"
+	)
+	parser.add_argument("--verbose", action = "store_true", help = "выводить журнал запросов в stderr")
+	return parser.parse_args(argv)
+
+
+def main():
+	args = parse_args(sys.argv[1:])
+
+	from api.server import create_server, close_server
+	from main import seed_services
+
+	server = create_server(
+		args.services_db, args.users_db, args.host, args.port,
+		workers = args.workers, max_batch = args.max_batch, verbose = args.verbose, database = args.database
+	)
+	if not server.api.service_repo.has_services():
+		seed_services(server.api.service_repo)
+
+	def stop(signum, frame):
+		# shutdown() ждет выхода из serve_forever, поэтому вызывается из другого потока
+		threading.Thread(target = server.shutdown).start()
+
+	signal.signal(signal.SIGINT, stop)
+	signal.signal(signal.SIGTERM, stop)
+
+	print(f"Сервер запущен: http://{server.server_address[0]}:{server.server_address[1]}")
+	try:
+		server.serve_forever()
+	finally:
+		close_server(server)
+		print("Сервер остановлен.")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,110 @@
+import os, sys, asyncio, bcrypt, tempfile, threading, time, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.booking import BookingLine
+
+
+class TestAsyncRepositories(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.user_repo = SQLiteUserRepository(os.path.join(self.tmp_dir.name, "users.db"))
+		self.service_repo = SQLiteServiceRepository(os.path.join(self.tmp_dir.name, "services.db"))
+		# Общий исполнитель базы данных для всех асинхронных репозиториев
+		self.db_executor = AsyncExecutor(max_pending=100)
+		self.users = AsyncUserRepository(self.user_repo, db_executor=self.db_executor)
+		self.services = AsyncServiceRepository(self.service_repo, db_executor=self.db_executor)
+		self.bookings = AsyncBookingRepository(SQLiteBookingRepository(self.user_repo), db_executor=self.db_executor)
+		# Быстрый хэш, чтобы тест не тратил время на bcrypt с рабочей сложностью
+		self.password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(4))
+
+	def tearDown(self):
+		self.users.close()
+		self.db_executor.shutdown()
+		self.user_repo.connection_manager.close_all()
+		self.service_repo.connection_manager.close_all()
+		self.tmp_dir.cleanup()
+
+	def test_concurrent_spending(self):
+		"""Тысячи корутин пополняют расходы; итоговые суммы совпадают."""
+		async def scenario():
+			for i in range(10):
+				await self.users.add_user_with_hash(f"user{i}", self.password_hash)
+			results = await asyncio.gather(*(self.users.add_spending(f"user{i % 10}", 1.0) for i in range(2000)))
+			self.assertTrue(all(result is not None for result in results))
+			return [await self.users.get_user(f"user{i}") for i in range(10)]
+
+		for user in asyncio.run(scenario()):
+			self.assertEqual(user[2], 200.0)
+			self.assertEqual(user[3], "Silver")
+
+	def test_verify_user(self):
+		async def scenario():
+			await self.users.add_user_with_hash("user", self.password_hash)
+			return await asyncio.gather(
+				self.users.verify_user("user", "password"),
+				self.users.verify_user("user", "wrong"),
+				self.users.verify_user("missing", "password"),
+			)
+
+		self.assertEqual(asyncio.run(scenario()), [True, False, False])
+
+	def test_catalog_and_booking(self):
+		async def scenario():
+			service = PlumbingService(cost=100.0)
+			await self.services.add_service(service)
+			await self.users.add_user_with_hash("user", self.password_hash)
+			found = await self.services.find_service(service.get_uid())
+			lines = [BookingLine(found.get_uid(), 100.0, 0.0, 100.0, "Bronze")]
+			state = await self.bookings.record_bookings("user", lines)
+			history = await self.bookings.get_user_history("user")
+			return found, state, history
+
+		found, state, history = asyncio.run(scenario())
+		self.assertEqual(found.get_cost(), 100.0)
+		self.assertEqual(state, (100.0, "Bronze"))
+		self.assertEqual(len(history), 1)
+
+	def test_find_service_sees_other_connection_changes(self):
+		service = PlumbingService(cost=100.0)
+		self.service_repo.add_service(service)
+		self.service_repo.cache_check_interval = 0
+		other_repo = SQLiteServiceRepository(self.service_repo.connection_manager.db_name)
+		try:
+			asyncio.run(self.services.find_service(service.get_uid()))
+			with other_repo.connection:
+				other_repo.connection.execute("UPDATE services SET cost = 120.0 WHERE id = ?", (service.get_uid(),))
+			found = asyncio.run(self.services.find_service(service.get_uid()))
+		finally:
+			other_repo.connection_manager.close_all()
+		self.assertEqual(found.get_cost(), 120.0)
+
+	def test_database_work_runs_off_loop_thread(self):
+		async def scenario():
+			return await self.db_executor.run(threading.get_ident)
+
+		self.assertNotEqual(asyncio.run(scenario()), threading.get_ident())
+
+	def test_pending_tasks_are_bounded(self):
+		executor = AsyncExecutor(max_workers=4, max_pending=2)
+		lock = threading.Lock()
+		state = {"running": 0, "peak": 0}
+
+		def work():
+			with lock:
+				state["running"] += 1
+				state["peak"] = max(state["peak"], state["running"])
+			time.sleep(0.01)
+			with lock:
+				state["running"] -= 1
+
+		async def scenario():
+			await asyncio.gather(*(executor.run(work) for _ in range(20)))
+
+		asyncio.run(scenario())
+		executor.shutdown()
+		self.assertEqual(state["peak"], 2)
+
+
+if __name__ == "__main__":
+	unittest.main()
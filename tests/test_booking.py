@@ -0,0 +1,110 @@
+import os, sqlite3, sys, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.booking import BookingLine
+
+
+class TestBooking(unittest.TestCase):
+
+	def setUp(self):
+		self.repo = SQLiteUserRepository(":memory:")
+		self.repo.add_user_with_hash("test_user", b"hash")
+		self.user = User(*self.repo.get_user("test_user"), user_repo=self.repo)
+
+	def tearDown(self):
+		self.repo.connection.close()
+
+	def test_single_booking_discount(self):
+		self.user.membership_level = "Gold"
+		booking = Booking(self.user, PlumbingService(cost=100.0))
+		self.assertAlmostEqual(booking.process_booking(), 90.0)
+
+	def test_cart_tier_upgrade_mid_cart(self):
+		"""Проверяем, что услуги после перехода на новый уровень получают новую скидку."""
+		services = [PlumbingService(cost=150.0), ElectricalService(cost=100.0), PlumbingService(cost=100.0)]
+		lines = CartBooking(self.user, services).price_cart()
+
+		self.assertEqual([line.membership_level for line in lines], ["Bronze", "Bronze", "Silver"])
+		self.assertEqual([line.final_price for line in lines], [150.0, 100.0, 95.0])
+
+	def test_cart_single_spending_write(self):
+		"""Проверяем, что корзина записывает расходы одним обновлением."""
+		services = [PlumbingService(cost=150.0), ElectricalService(cost=100.0), PlumbingService(cost=100.0)]
+		statements = []
+		self.repo.connection.set_trace_callback(statements.append)
+		total = CartBooking(self.user, services).process_booking()
+
+		self.assertEqual(total, 345.0)
+		self.assertEqual(len([sql for sql in statements if "UPDATE users" in sql]), 1)
+		self.assertEqual((self.user.total_spent, self.user.membership_level), (345.0, "Silver"))
+		self.assertEqual(self.repo.get_user("test_user")[2:], (345.0, "Silver"))
+
+	def test_empty_cart(self):
+		self.assertEqual(CartBooking(self.user, []).process_booking(), 0)
+		self.assertEqual(self.repo.get_user("test_user")[2], 0.0)
+
+
+class TestBookingLedger(unittest.TestCase):
+
+	def setUp(self):
+		self.repo = SQLiteUserRepository(":memory:")
+		self.repo.add_user_with_hash("test_user", b"hash")
+		self.ledger = SQLiteBookingRepository(self.repo)
+		self.user = User(*self.repo.get_user("test_user"), user_repo=self.repo)
+
+	def tearDown(self):
+		self.repo.connection.close()
+
+	def test_cart_recorded_in_ledger(self):
+		"""Проверяем, что строки корзины и расходы записываются одной транзакцией."""
+		services = [PlumbingService(cost=150.0), ElectricalService(cost=100.0), PlumbingService(cost=100.0)]
+		statements = []
+		self.repo.connection.set_trace_callback(statements.append)
+		total = CartBooking(self.user, services, self.ledger).process_booking()
+
+		self.assertEqual(len([sql for sql in statements if sql == "COMMIT"]), 1)
+		self.assertEqual(total, 345.0)
+		self.assertEqual((self.user.total_spent, self.user.membership_level), (345.0, "Silver"))
+		self.assertEqual(self.ledger.get_user_total("test_user"), (3, 345.0))
+		self.assertEqual(self.ledger.get_service_stats(services[2].get_uid()), (1, 95.0))
+		self.assertEqual(self.ledger.find_total_mismatches(), [])
+
+	def test_history_range(self):
+		line = BookingLine("service", 100.0, 0.0, 100.0, "Bronze")
+		for created_at in (10.0, 20.0, 30.0):
+			self.ledger.record_bookings("test_user", [line], created_at=created_at)
+
+		history = self.ledger.get_user_history("test_user", since=15.0, until=30.0)
+		self.assertEqual([row[-1] for row in history], [20.0])
+		self.assertEqual([row[-1] for row in self.ledger.get_user_history("test_user", limit=2)], [30.0, 20.0])
+
+	def test_history_uses_covering_index(self):
+		plan = self.repo.connection.execute(
+			"EXPLAIN QUERY PLAN SELECT service_id, list_price, discount, final_price, created_at "
+			"FROM bookings WHERE login = ? AND created_at >= ? ORDER BY created_at DESC",
+			("test_user", 0.0)
+		).fetchall()
+		self.assertIn("COVERING INDEX idx_bookings_login_created", plan[0][-1])
+
+	def test_ledger_is_append_only(self):
+		self.ledger.record_bookings("test_user", [BookingLine("service", 100.0, 0.0, 100.0, "Bronze")])
+		with self.assertRaises(sqlite3.IntegrityError):
+			with self.repo.connection:
+				self.repo.connection.execute("DELETE FROM bookings")
+
+	def test_unknown_user_not_recorded(self):
+		line = BookingLine("service", 100.0, 0.0, 100.0, "Bronze")
+		self.assertIsNone(self.ledger.record_bookings("non_existent_user", [line]))
+		self.assertEqual(self.ledger.get_user_total("non_existent_user"), (0, 0.0))
+
+	def test_mismatch_and_rebuild(self):
+		self.ledger.record_bookings("test_user", [BookingLine("service", 600.0, 0.0, 600.0, "Bronze")])
+		self.repo.add_spending("test_user", 50.0)  # Расход в обход журнала
+		self.assertEqual(self.ledger.find_total_mismatches(), [("test_user", 650.0, 600.0)])
+
+		self.assertEqual(self.ledger.rebuild_totals(), 1)
+		self.assertEqual(self.repo.get_user("test_user")[2:], (600.0, "Gold"))
+
+
+if __name__ == "__main__":
+	unittest.main()
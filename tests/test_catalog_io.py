@@ -0,0 +1,103 @@
+import os, sys, io, json, sqlite3, tempfile, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.catalog_io import import_catalog, export_catalog, CatalogFormatError
+
+
+class TestCatalogIO(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.db_name = os.path.join(self.tmp_dir.name, "services.db")
+		self.service_repo = SQLiteServiceRepository(self.db_name)
+
+	def tearDown(self):
+		self.service_repo.connection_manager.close_all()
+		self.tmp_dir.cleanup()
+
+	@staticmethod
+	def csv_file(rows: list) -> io.StringIO:
+		return io.StringIO("id,type,description,cost\n" + "".join(f"{row}\n" for row in rows))
+
+	def count(self) -> int:
+		return self.service_repo.connection.execute("SELECT COUNT(*) FROM services").fetchone()[0]
+
+	def test_round_trip(self):
+		self.service_repo.add_services([
+			PlumbingService(description = "Замена крана, смесителя", cost = 100.0),
+			ElectricalService(description = "Установка розеток", cost = 300.0),
+		])
+		for fmt in ("csv", "jsonl"):
+			exported = io.StringIO()
+			self.assertEqual(export_catalog(self.service_repo, exported, fmt, batch_size = 1), 2)
+
+			target = SQLiteServiceRepository(os.path.join(self.tmp_dir.name, f"copy_{fmt}.db"))
+			result = import_catalog(target, io.StringIO(exported.getvalue()), fmt, "copy", chunk_size = 1)
+			self.assertEqual((result.records, result.written, result.skipped), (2, 2, 0))
+			self.assertEqual(
+				sorted((s.get_uid(), type(s), s.get_description(), s.get_cost()) for s in target.get_services()),
+				sorted((s.get_uid(), type(s), s.get_description(), s.get_cost()) for s in self.service_repo.get_services())
+			)
+			target.connection_manager.close_all()
+
+	def test_types_and_defaults(self):
+		source = io.StringIO("\n".join(json.dumps(record) for record in (
+			{"id": "a", "type": "plumbing"},
+			{"type": 2, "description": "Щиток", "cost": "75.5"},
+		)))
+		import_catalog(self.service_repo, source, "jsonl", "job")
+		plumbing = self.service_repo.find_service("a")
+		self.assertIsInstance(plumbing, PlumbingService)
+		self.assertEqual((plumbing.get_description(), plumbing.get_cost()), ("Сантехнические работы", 50.0))
+		self.assertEqual(self.count(), 2)
+
+	def test_invalid_record(self):
+		source = self.csv_file(["a,plumbing,,10", "b,unknown,,10", "c,electrical,,-1"])
+		with self.assertRaises(CatalogFormatError) as error:
+			import_catalog(self.service_repo, source, "csv", "job", chunk_size = 10)
+		self.assertEqual(error.exception.line, 3)
+		self.assertEqual(self.count(), 0)
+
+		source = self.csv_file(["a,plumbing,,10", "b,unknown,,10", "c,electrical,,-1"])
+		result = import_catalog(self.service_repo, source, "csv", "job", skip_invalid = True)
+		self.assertEqual((result.records, result.written, result.skipped), (3, 1, 2))
+		self.assertEqual(len(result.errors), 2)
+		self.assertEqual(self.service_repo.get_import_position("job"), 0)
+
+	def test_resume_after_failure(self):
+		"""Порции до некорректной записи зафиксированы; после исправления файла загрузка продолжается с позиции."""
+		rows = [f"s{i},plumbing,,{i}" for i in range(10)]
+		rows[7] = "s7,plumbing,,bad"
+		with self.assertRaises(CatalogFormatError):
+			import_catalog(self.service_repo, self.csv_file(rows), "csv", "job", chunk_size = 3)
+		self.assertEqual(self.count(), 6)
+		self.assertEqual(self.service_repo.get_import_position("job"), 6)
+
+		rows[7] = "s7,plumbing,,7"
+		# Уже записанные строки не разбираются повторно и не вызывают конфликта id
+		rows[0] = "garbage"
+		result = import_catalog(self.service_repo, self.csv_file(rows), "csv", "job", chunk_size = 3)
+		self.assertEqual((result.resumed_from, result.records, result.written), (6, 10, 4))
+		self.assertEqual(self.count(), 10)
+		self.assertEqual(self.service_repo.get_import_position("job"), 0)
+
+	def test_conflicts(self):
+		import_catalog(self.service_repo, self.csv_file(["a,plumbing,Старое,10"]), "csv", "first")
+		with self.assertRaises(sqlite3.IntegrityError):
+			import_catalog(self.service_repo, self.csv_file(["a,plumbing,Новое,20"]), "csv", "second")
+
+		result = import_catalog(self.service_repo, self.csv_file(["a,plumbing,Новое,20"]), "csv", "third", on_conflict = "ignore")
+		self.assertEqual(result.written, 0)
+		result = import_catalog(self.service_repo, self.csv_file(["a,plumbing,Новое,20"]), "csv", "fourth", on_conflict = "replace")
+		self.assertEqual(result.written, 1)
+		self.assertEqual(self.service_repo.find_service("a").get_cost(), 20.0)
+
+	def test_streaming_export(self):
+		self.service_repo.add_services([PlumbingService(cost = float(i)) for i in range(5)])
+		rows = self.service_repo.iter_service_rows(batch_size = 2)
+		self.assertEqual(len(next(rows)), 4)
+		self.assertEqual(sum(1 for _ in rows), 4)
+
+
+if __name__ == "__main__":
+	unittest.main()
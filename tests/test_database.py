@@ -0,0 +1,131 @@
+import os, sys, sqlite3, tempfile, threading, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.database import retry_on_busy, Migration, apply_migrations, get_schema_version
+
+
+class TestConnectionManager(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.db_name = os.path.join(self.tmp_dir.name, "test.db")
+
+	def tearDown(self):
+		self.tmp_dir.cleanup()
+
+	def test_pragma_profile(self):
+		"""Проверяем, что к соединению применяется профиль PRAGMA."""
+		manager = ConnectionManager(self.db_name)
+		connection = manager.connection()
+		self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+		self.assertEqual(connection.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+		self.assertEqual(connection.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+		manager.close_all()
+
+	def test_connection_per_thread(self):
+		"""Проверяем, что каждый поток получает собственное соединение."""
+		manager = ConnectionManager(self.db_name)
+		connections = []
+		thread = threading.Thread(target=lambda: connections.append(manager.connection()))
+		thread.start()
+		thread.join()
+		self.assertIs(manager.connection(), manager.connection())
+		self.assertIsNot(connections[0], manager.connection())
+		manager.close_all()
+
+	def test_memory_database_shared(self):
+		"""Проверяем, что база данных в памяти видна из всех потоков."""
+		manager = ConnectionManager(":memory:")
+		connections = []
+		thread = threading.Thread(target=lambda: connections.append(manager.connection()))
+		thread.start()
+		thread.join()
+		self.assertIs(connections[0], manager.connection())
+		manager.close_all()
+
+	def test_repository_from_worker_threads(self):
+		"""Проверяем, что репозиторий можно использовать из рабочих потоков."""
+		user_repo = SQLiteUserRepository(self.db_name)
+		user_repo.add_user_with_hash("test_user", b"hash")
+
+		def book():
+			for _ in range(25):
+				user_repo.add_spending("test_user", 10.0)
+
+		threads = [threading.Thread(target=book) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(user_repo.get_user("test_user")[2], 1000.0)
+		user_repo.connection_manager.close_all()
+
+	def test_retry_on_busy(self):
+		"""Проверяем повтор операции при SQLITE_BUSY и отсутствие повтора для других ошибок."""
+		calls = []
+
+		@retry_on_busy(delay=0)
+		def flaky():
+			calls.append(1)
+			if len(calls) < 3:
+				raise sqlite3.OperationalError("database is locked")
+			return "ok"
+
+		self.assertEqual(flaky(), "ok")
+		self.assertEqual(len(calls), 3)
+
+		@retry_on_busy(delay=0)
+		def broken():
+			calls.append(1)
+			raise sqlite3.OperationalError("no such table: missing")
+
+		calls.clear()
+		with self.assertRaises(sqlite3.OperationalError):
+			broken()
+		self.assertEqual(len(calls), 1)
+
+
+class TestMigrations(unittest.TestCase):
+	MIGRATIONS = [
+		Migration(1, "Таблица", ("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)",)),
+		Migration(2, "Индекс", ("CREATE INDEX idx_items_name ON items (name)",)),
+	]
+
+	def setUp(self):
+		self.connection = sqlite3.connect(":memory:")
+
+	def tearDown(self):
+		self.connection.close()
+
+	def test_migrations_applied_in_order(self):
+		self.assertEqual(apply_migrations(self.connection, self.MIGRATIONS[:1]), 1)
+		self.assertEqual(apply_migrations(self.connection, self.MIGRATIONS), 2)
+		indexes = self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+		self.assertEqual(indexes, [("idx_items_name",)])
+
+	def test_current_database_skips_ddl(self):
+		apply_migrations(self.connection, self.MIGRATIONS)
+		statements = []
+		self.connection.set_trace_callback(statements.append)
+		self.assertEqual(apply_migrations(self.connection, self.MIGRATIONS), 2)
+		self.assertEqual(statements, ["PRAGMA user_version"] * 2)
+
+	def test_failed_migration_rolls_back(self):
+		def fail(connection):
+			raise RuntimeError("ошибка миграции")
+
+		migrations = self.MIGRATIONS + [Migration(3, "Ошибка", ("CREATE TABLE extra (id INTEGER)", fail))]
+		with self.assertRaises(RuntimeError):
+			apply_migrations(self.connection, migrations)
+		# Не применился ни один шаг, включая успешные версии 1 и 2
+		self.assertEqual(get_schema_version(self.connection), 0)
+		self.assertEqual(self.connection.execute("SELECT count(*) FROM sqlite_master").fetchone()[0], 0)
+
+	def test_versions_must_ascend(self):
+		with self.assertRaises(ValueError):
+			apply_migrations(self.connection, list(reversed(self.MIGRATIONS)))
+
+
+if __name__ == "__main__":
+	unittest.main()
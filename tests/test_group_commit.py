@@ -0,0 +1,166 @@
+import os, sys, bcrypt, sqlite3, tempfile, threading, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.group_commit import GroupCommitWriter
+from api.server import ApiError, create_server, close_server
+from models.user import MEMBERSHIP_TIERS, get_membership_tiers, set_membership_tiers
+from api.client import ApiClient, RemoteServiceRepository, RemoteUserRepository, RemoteSessionManager, RemoteBookingRepository
+
+
+class TestGroupCommitWriter(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.user_repo = SQLiteUserRepository(os.path.join(self.tmp_dir.name, "users.db"))
+		self.password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(4))
+		self.user_repo.add_user_with_hash("user", self.password_hash)
+		self.writer = GroupCommitWriter(self.user_repo.connection_manager)
+
+	def tearDown(self):
+		self.writer.close()
+		self.user_repo.connection_manager.close_all()
+		self.tmp_dir.cleanup()
+
+	def test_concurrent_operations_are_batched(self):
+		"""Операции из разных потоков фиксируются меньшим числом транзакций."""
+		def add_spending(connection):
+			return connection.execute(SQLiteUserRepository.ADD_SPENDING_SQL, {"login": "user", "amount": 1.0}).fetchall()
+
+		threads = [
+			threading.Thread(target = lambda: [self.writer.execute(add_spending) for _ in range(50)])
+			for _ in range(8)
+		]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(self.writer.operations, 400)
+		self.assertLess(self.writer.batches, 400)
+		self.assertEqual(self.user_repo.get_user("user")[2], 400.0)
+
+	def test_failed_operation_is_isolated(self):
+		"""Ошибка одной операции не откатывает остальные операции группы."""
+		insert = SQLiteUserRepository.INSERT_USER_SQL
+		futures = [
+			self.writer.submit(lambda connection: connection.execute(insert, ("first", self.password_hash))),
+			self.writer.submit(lambda connection: connection.execute(insert, ("user", self.password_hash))),
+			self.writer.submit(lambda connection: connection.execute(insert, ("second", self.password_hash))),
+		]
+		futures[0].result()
+		futures[2].result()
+		with self.assertRaises(sqlite3.IntegrityError):
+			futures[1].result()
+		self.assertTrue(self.user_repo.is_login_exists("first"))
+		self.assertTrue(self.user_repo.is_login_exists("second"))
+
+	def test_close_flushes_queue(self):
+		futures = [
+			self.writer.submit(lambda connection: connection.execute(
+				SQLiteUserRepository.ADD_SPENDING_SQL, {"login": "user", "amount": 10.0}
+			).fetchall())
+			for _ in range(20)
+		]
+		self.writer.close()
+		self.assertTrue(all(future.done() for future in futures))
+		self.assertEqual(self.user_repo.get_user("user")[2], 200.0)
+
+
+class TestBookingServer(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.server = create_server(
+			os.path.join(self.tmp_dir.name, "services.db"),
+			os.path.join(self.tmp_dir.name, "users.db"),
+			port = 0,
+			workers = 4,
+			secret_path = os.path.join(self.tmp_dir.name, ".session_key")
+		)
+		self.server.api.user_repo.add_user_with_hash("user", bcrypt.hashpw(b"password", bcrypt.gensalt(4)))
+		self.service = PlumbingService(description = "Замена крана", cost = 100.0)
+		self.server.api.service_repo.add_service(self.service)
+		self.thread = threading.Thread(target = self.server.serve_forever)
+		self.thread.start()
+
+		self.client = ApiClient("http://127.0.0.1:%d" % self.server.server_address[1])
+		self.services = RemoteServiceRepository(self.client)
+		self.users = RemoteUserRepository(self.client)
+		self.sessions = RemoteSessionManager(self.client)
+		self.bookings = RemoteBookingRepository(self.client)
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.thread.join()
+		close_server(self.server)
+		self.tmp_dir.cleanup()
+		set_membership_tiers(MEMBERSHIP_TIERS)
+
+	def test_login_and_booking(self):
+		self.assertIsNone(self.users.login("user", "wrong"))
+		user_data, token = self.users.login("user", "password")
+		self.assertEqual(user_data, ("user", None, 0.0, "Bronze"))
+		self.assertEqual(self.sessions.validate(token)[0], "user")
+
+		service = self.services.find_service(self.service.get_uid())
+		self.assertIsInstance(service, PlumbingService)
+		self.assertEqual(service.get_description(), "Замена крана")
+
+		user = User(*user_data, user_repo = self.users)
+		total = CartBooking(user, [service, service], self.bookings).process_booking()
+		self.assertEqual(total, 200.0)
+		self.assertEqual((user.total_spent, user.membership_level), (200.0, "Silver"))
+		self.assertEqual(self.server.api.user_repo.get_user("user")[2], 200.0)
+
+		self.assertTrue(self.sessions.revoke(token))
+		self.assertIsNone(self.sessions.validate(token))
+
+	def test_booking_uses_server_prices(self):
+		"""Расходы пользователя на сервере изменились после входа: итог заказа считается по ценам сервера."""
+		user_data, token = self.users.login("user", "password")
+		self.server.api.user_repo.add_spending("user", 600.0)
+
+		user = User(*user_data, user_repo = self.users)
+		total = CartBooking(user, [self.service, self.service], self.bookings).process_booking()
+		# Клиент рассчитал бы 100 + 100 по уровню Bronze, сервер — со скидкой Gold 10%
+		self.assertEqual(total, 180.0)
+		self.assertEqual((user.total_spent, user.membership_level), (780.0, "Gold"))
+		self.assertEqual(self.server.api.user_repo.get_user("user")[2], 780.0)
+
+	def test_membership_tiers_from_server(self):
+		"""Клиент считает скидки по уровням членства сервера, а не по своим."""
+		tiers = (("Gold", 50.0, 0.2), ("Bronze", 0.0, 0.0))
+		self.server.api.user_repo.save_membership_tiers(tiers)
+		set_membership_tiers(MEMBERSHIP_TIERS)
+
+		user_data, token = self.users.login("user", "password")
+		self.assertEqual(get_membership_tiers(), tiers)
+		user = User(*user_data, user_repo = self.users)
+		lines = CartBooking(user, [self.service, self.service], self.bookings).price_cart()
+		self.assertEqual([line.final_price for line in lines], [100.0, 80.0])
+
+		# Уровни изменились после входа: клиент перечитывает их при расчете корзины
+		self.server.api.user_repo.save_membership_tiers((("Gold", 50.0, 0.3), ("Bronze", 0.0, 0.0)))
+		set_membership_tiers(MEMBERSHIP_TIERS)
+		self.users.tiers_check_interval = 0
+		lines = CartBooking(user, [self.service, self.service], self.bookings).price_cart()
+		self.assertEqual([line.final_price for line in lines], [100.0, 70.0])
+
+	def test_catalog_pages_and_search(self):
+		services, last_key = self.services.get_services_page(0, 10)
+		self.assertEqual([service.get_uid() for service in services], [self.service.get_uid()])
+		self.assertEqual(len(self.services.get_services_page(last_key, 10)[0]), 0)
+		self.assertEqual(len(self.services.search_services("крана")), 1)
+		self.assertIsNone(self.services.find_service("missing"))
+
+	def test_register_existing_user(self):
+		self.assertIsNone(self.users.register("user", "password"))
+
+	def test_booking_requires_session(self):
+		with self.assertRaises(ApiError) as context:
+			self.client.request("POST", "/bookings", {"service_ids": [self.service.get_uid()]})
+		self.assertEqual(context.exception.status, 401)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,63 @@
+import os, sys, json, sqlite3, tempfile, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+
+
+class TestSQLMetrics(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.metrics = SQLMetrics(slow_query_ms=1000)
+		self.user_repo = SQLiteUserRepository(os.path.join(self.tmp_dir.name, "users.db"), metrics=self.metrics)
+
+	def tearDown(self):
+		self.user_repo.connection_manager.close_all()
+		self.tmp_dir.cleanup()
+
+	def test_statement_counts(self):
+		"""Проверяем, что запросы учитываются по нормализованному тексту, без значений параметров."""
+		self.user_repo.add_user_with_hash("user", b"secret-hash")
+		for _ in range(3):
+			self.user_repo.add_spending("user", 10.0)
+
+		statements = self.metrics.snapshot()["statements"]["users.db"]
+		key = " ".join(SQLiteUserRepository.ADD_SPENDING_SQL.split())
+		self.assertEqual(statements[key]["count"], 3)
+		self.assertEqual(sum(statements[key]["histogram_ms"].values()), 3)
+		self.assertNotIn("secret-hash", json.dumps(self.metrics.snapshot()))
+
+	def test_errors_are_counted(self):
+		"""Проверяем, что запрос с ошибкой учитывается и исключение не подавляется."""
+		with self.assertRaises(sqlite3.OperationalError):
+			self.user_repo.connection.execute("SELECT * FROM missing_table")
+		stats = self.metrics.snapshot()["statements"]["users.db"]["SELECT * FROM missing_table"]
+		self.assertEqual(stats["errors"], 1)
+
+	def test_slow_query_log(self):
+		"""Проверяем, что запросы дольше порога попадают в журнал медленных запросов."""
+		self.metrics.slow_query_ms = 0
+		self.user_repo.get_user("nobody")
+		slow = self.metrics.slow_queries()
+		self.assertTrue(any("FROM users" in entry["sql"] for entry in slow))
+
+	def test_traced_transactions(self):
+		"""Проверяем, что trace callback учитывает неявные BEGIN/COMMIT."""
+		self.user_repo.add_user_with_hash("user", b"hash")
+		traced = self.metrics.snapshot()["traced"]["users.db"]
+		self.assertGreaterEqual(traced["BEGIN"], 1)
+		self.assertGreaterEqual(traced["COMMIT"], 1)
+
+	def test_dump(self):
+		"""Проверяем запись снимка метрик в файл и сброс."""
+		path = os.path.join(self.tmp_dir.name, "metrics.json")
+		self.user_repo.get_user("nobody")
+		self.metrics.dump(path)
+		with open(path, encoding="utf-8") as fp:
+			self.assertIn("users.db", json.load(fp)["statements"])
+
+		self.metrics.reset()
+		self.assertEqual(self.metrics.snapshot()["statements"], {})
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,45 @@
+import os, sys, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+
+
+class TestPricingEngine(unittest.TestCase):
+
+	def setUp(self):
+		self.repo = SQLiteServiceRepository(":memory:")
+		self.services = [PlumbingService(cost=100.0), ElectricalService(cost=80.0)]
+		self.repo.add_services(self.services)
+		self.engine = PricingEngine(self.repo)
+
+	def test_price_table_matches_booking(self):
+		"""Проверяем, что цены таблицы совпадают с ценами Booking для каждого уровня."""
+		user = User("test_user", b"hash", 0.0, "Bronze", user_repo=None)
+		table = self.engine.price_table()
+		for level in ("Bronze", "Silver", "Gold", "Platinum"):
+			user.membership_level = level
+			for service in self.services:
+				self.assertEqual(table.price(service.get_uid(), level), Booking(user, service).process_booking())
+		self.assertIsNone(table.price("non-existent-uid", "Gold"))
+
+	def test_price_table_cached(self):
+		self.assertIs(self.engine.price_table(), self.engine.price_table())
+
+	def test_price_table_invalidated_by_catalog_change(self):
+		table = self.engine.price_table()
+		service = PlumbingService(cost=200.0)
+		self.repo.add_service(service)
+		self.assertIsNot(self.engine.price_table(), table)
+		self.assertEqual(self.engine.quote(service.get_uid(), "Platinum"), 170.0)
+
+	def test_price_table_invalidated_by_tier_change(self):
+		table = self.engine.price_table()
+		self.engine.set_tiers((("Gold", 500, 0.5), ("Bronze", 0, 0.0)))
+		self.assertIsNot(self.engine.price_table(), table)
+		self.assertEqual(self.engine.quote(self.services[0].get_uid(), "Gold"), 50.0)
+
+	def test_quote_many(self):
+		self.assertEqual(list(self.engine.quote_many([100.0, 80.0], "Gold")), [90.0, 72.0])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,7 +1,8 @@
-import os, sys, unittest, uuid
+import os, sys, sqlite3, tempfile, unittest, uuid
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from models import *
+from models.database import apply_migrations
 
 
 class TestRepairServices(unittest.TestCase):
@@ -36,6 +37,32 @@ class TestRepairServices(unittest.TestCase):
 		self.assertEqual(service.get_description(), "Электромонтажные работы: ремонт проводки и электрощитков.")
 		self.assertEqual(service.get_cost(), 80.0)
 
+	def test_service_factory_type_codes(self):
+		self.assertIsInstance(ServiceFactory.create_service("a", PlumbingService.TYPE_CODE), PlumbingService)
+		self.assertIsInstance(ServiceFactory.create_service("b", "electrical"), ElectricalService)
+		with self.assertRaises(ValueError):
+			ServiceFactory.create_service("c", 255)
+
+	def test_service_factory_register(self):
+		@ServiceFactory.register(200, "heating")
+		class HeatingService(PlumbingService):
+			__slots__ = ()
+			DEFAULT_DESCRIPTION = "Обслуживание отопления"
+
+		repo = SQLiteServiceRepository(":memory:", cache_size=0)
+		repo.add_service(HeatingService(uid="heat"))
+		self.assertIsInstance(repo.find_service("heat"), HeatingService)
+		self.assertIsInstance(ServiceFactory.create_service("x", "heating"), HeatingService)
+
+		# Код типа уже занят другим классом
+		with self.assertRaises(ValueError):
+			ServiceFactory.register(200)(type("OtherService", (PlumbingService,), {"__slots__": ()}))
+
+		# Код типа должен помещаться в байт ServiceCatalog.type_codes
+		for code in (256, -1, "3", 1.0):
+			with self.assertRaises(ValueError):
+				ServiceFactory.register(code)
+
 	def test_sqlite_service_repository(self):
 		# Создаем тестовую базу данных в памяти
 		db_name = ":memory:"
@@ -69,6 +96,272 @@ class TestRepairServices(unittest.TestCase):
 		non_existent_service = repo.get_service("non-existent-uid")
 		self.assertIsNone(non_existent_service)
 
+	def test_get_services_page(self):
+		repo = SQLiteServiceRepository(":memory:")
+		added = [PlumbingService(description=f"Услуга {i}", cost=float(i)) for i in range(5)]
+		for service in added:
+			repo.add_service(service)
+
+		# Страницы идут в порядке добавления и не пересекаются
+		first_page, last_key = repo.get_services_page(limit=2)
+		self.assertEqual([s.get_uid() for s in first_page], [s.get_uid() for s in added[:2]])
+
+		second_page, last_key = repo.get_services_page(last_key, limit=2)
+		self.assertEqual([s.get_uid() for s in second_page], [s.get_uid() for s in added[2:4]])
+
+		last_page, last_key = repo.get_services_page(last_key, limit=2)
+		self.assertEqual([s.get_uid() for s in last_page], [added[4].get_uid()])
+
+		# После конца каталога возвращается пустая страница с тем же ключом
+		empty_page, end_key = repo.get_services_page(last_key, limit=2)
+		self.assertEqual(empty_page, [])
+		self.assertEqual(end_key, last_key)
+
+	def test_find_service_uses_cache(self):
+		repo = SQLiteServiceRepository(":memory:")
+		service = PlumbingService()
+		repo.add_service(service)
+
+		# Повторные запросы не обращаются к таблице services
+		statements = []
+		repo.connection.set_trace_callback(statements.append)
+		self.assertIs(repo.find_service(service.get_uid()), service)
+		self.assertIs(repo.find_service(service.get_uid()), service)
+		self.assertFalse([sql for sql in statements if "services" in sql])
+
+	def test_service_cache_is_bounded(self):
+		repo = SQLiteServiceRepository(":memory:", cache_size=2)
+		services = [PlumbingService() for _ in range(3)]
+		for service in services:
+			repo.add_service(service)
+
+		self.assertEqual(len(repo.cache), 2)
+		self.assertNotIn(services[0].get_uid(), repo.cache)
+		# Вытесненная услуга загружается из базы данных
+		self.assertEqual(repo.find_service(services[0].get_uid()).get_uid(), services[0].get_uid())
+
+	def test_cache_invalidated_by_other_connection(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "services.db")
+			repo = SQLiteServiceRepository(db_name, cache_check_interval=0)
+			other_repo = SQLiteServiceRepository(db_name, cache_check_interval=0)
+			service = PlumbingService(cost=50.0)
+			repo.add_service(service)
+			revision = repo.revision
+
+			with other_repo.connection:
+				other_repo.connection.execute("UPDATE services SET cost = 99.0 WHERE id = ?", (service.get_uid(),))
+
+			self.assertEqual(repo.find_service(service.get_uid()).get_cost(), 99.0)
+			self.assertGreater(repo.revision, revision)
+			repo.connection.close()
+			other_repo.connection.close()
+
+	def test_add_services_bulk(self):
+		repo = SQLiteServiceRepository(":memory:")
+		services = (PlumbingService(description=f"Услуга {i}", cost=float(i)) for i in range(25))
+		self.assertEqual(repo.add_services(services, chunk_size=10), 25)
+		self.assertEqual(len(repo.get_services()), 25)
+
+	def test_add_services_conflict_modes(self):
+		repo = SQLiteServiceRepository(":memory:")
+		service = PlumbingService(cost=50.0)
+		repo.add_service(service)
+		updated = PlumbingService(uid=service.get_uid(), cost=70.0)
+
+		# По умолчанию дубликат откатывает всю загрузку
+		with self.assertRaises(sqlite3.IntegrityError):
+			repo.add_services([ElectricalService(), updated])
+		self.assertEqual(len(repo.get_services()), 1)
+
+		self.assertEqual(repo.add_services([updated], on_conflict="ignore"), 0)
+		self.assertEqual(repo.find_service(service.get_uid()).get_cost(), 50.0)
+
+		self.assertEqual(repo.add_services([updated], on_conflict="replace"), 1)
+		self.assertEqual(repo.find_service(service.get_uid()).get_cost(), 70.0)
+
+	def test_search_services(self):
+		repo = SQLiteServiceRepository(":memory:")
+		faucet = PlumbingService(description="Замена крана на кухне")
+		wiring = ElectricalService(description="Ремонт электропроводки")
+		sockets = ElectricalService(description="Установка розеток и замена проводки")
+		repo.add_services([faucet, wiring, sockets])
+
+		# Поиск по началу слова без учета регистра
+		self.assertEqual([s.get_uid() for s in repo.search_services("КРАН")], [faucet.get_uid()])
+		self.assertEqual({s.get_uid() for s in repo.search_services("замен")}, {faucet.get_uid(), sockets.get_uid()})
+		# Все слова запроса должны встретиться в описании
+		self.assertEqual([s.get_uid() for s in repo.search_services("замена пров")], [sockets.get_uid()])
+		# Спецсимволы FTS5 не ломают запрос
+		self.assertEqual(repo.search_services('"*'), [])
+		self.assertEqual(repo.search_services("кран OR NOT"), [])
+
+	def test_search_ignores_yo(self):
+		repo = SQLiteServiceRepository(":memory:")
+		garland = ElectricalService(description="Ёлочная гирлянда")
+		meter = PlumbingService(description="Замена счётчика воды")
+		repo.add_services([garland, meter])
+
+		for query in ("елочная", "ёлоч", "ЕЛОЧ"):
+			self.assertEqual([s.get_uid() for s in repo.search_services(query)], [garland.get_uid()])
+		for query in ("счетчик", "счётч"):
+			self.assertEqual([s.get_uid() for s in repo.search_services(query)], [meter.get_uid()])
+		# Описание хранится без замены
+		self.assertEqual(repo.find_service(garland.get_uid()).get_description(), "Ёлочная гирлянда")
+
+		repo.add_services([PlumbingService(uid=meter.get_uid(), description="Ремонт трёх кранов")], on_conflict="replace")
+		self.assertEqual(repo.search_services("счетчик"), [])
+		self.assertEqual([s.get_uid() for s in repo.search_services("трех")], [meter.get_uid()])
+
+	def test_search_index_normalized_on_upgrade(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "services.db")
+			# База данных версии 4: индекс с внешним содержимым без замены "ё"
+			connection = sqlite3.connect(db_name)
+			apply_migrations(connection, SQLiteServiceRepository.MIGRATIONS[:4])
+			connection.execute("INSERT INTO services (id, type, description, cost) VALUES ('g', 2, 'Ёлочная гирлянда', 10.0)")
+			connection.commit()
+			connection.close()
+
+			repo = SQLiteServiceRepository(db_name)
+			self.assertEqual([s.get_uid() for s in repo.search_services("елочн")], ["g"])
+			repo.connection_manager.close_all()
+
+	def test_search_index_follows_changes(self):
+		repo = SQLiteServiceRepository(":memory:")
+		service = PlumbingService(description="Чистка труб")
+		repo.add_service(service)
+		repo.add_services([PlumbingService(uid=service.get_uid(), description="Монтаж водопровода")], on_conflict="replace")
+
+		self.assertEqual(repo.search_services("чистка"), [])
+		self.assertEqual([s.get_uid() for s in repo.search_services("водопр")], [service.get_uid()])
+
+		with repo.connection:
+			repo.connection.execute("DELETE FROM services")
+		self.assertEqual(repo.search_services("водопр"), [])
+
+	def test_search_index_backfill(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "services.db")
+			# База данных, созданная до появления полнотекстового индекса
+			connection = sqlite3.connect(db_name)
+			connection.execute("CREATE TABLE services (id TEXT PRIMARY KEY, type TEXT NOT NULL, description TEXT NOT NULL, cost REAL NOT NULL)")
+			connection.execute("INSERT INTO services VALUES ('old', 'PlumbingService', 'Ремонт сифонов', 45.0)")
+			connection.commit()
+			connection.close()
+
+			repo = SQLiteServiceRepository(db_name)
+			self.assertEqual([s.get_uid() for s in repo.search_services("сифон")], ["old"])
+			repo.connection_manager.close_all()
+
+	def test_migrate_type_names_to_codes(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "services.db")
+			# База данных версии 1: тип хранится именем класса, rowid неявный
+			connection = sqlite3.connect(db_name)
+			apply_migrations(connection, SQLiteServiceRepository.MIGRATIONS[:1])
+			connection.executemany("INSERT INTO services VALUES (?, ?, ?, ?)", [
+				("p", "PlumbingService", "Ремонт сифонов", 45.0),
+				("e", "ElectricalService", "Установка розеток", 70.0),
+			])
+			connection.commit()
+			connection.close()
+
+			repo = SQLiteServiceRepository(db_name)
+			rows = repo.connection.execute("SELECT rowid, id, type FROM services ORDER BY rowid").fetchall()
+			self.assertEqual(rows, [(1, "p", PlumbingService.TYPE_CODE), (2, "e", ElectricalService.TYPE_CODE)])
+			self.assertIsInstance(repo.find_service("e"), ElectricalService)
+			self.assertEqual([s.get_uid() for s in repo.search_services("розет")], ["e"])
+
+			# rowid — явный столбец и не меняется при VACUUM
+			repo.connection.execute("DELETE FROM services WHERE id = 'p'")
+			repo.connection.commit()
+			repo.connection.execute("VACUUM")
+			self.assertEqual(repo.connection.execute("SELECT rowid FROM services WHERE id = 'e'").fetchone()[0], 2)
+			self.assertEqual([s.get_uid() for s in repo.search_services("розет")], ["e"])
+			repo.connection_manager.close_all()
+
+	def test_migration_rejects_unknown_types(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "services.db")
+			connection = sqlite3.connect(db_name)
+			connection.execute("CREATE TABLE services (id TEXT PRIMARY KEY, type TEXT NOT NULL, description TEXT NOT NULL, cost REAL NOT NULL)")
+			connection.execute("INSERT INTO services VALUES ('x', 'GardenService', 'Стрижка газона', 10.0)")
+			connection.execute("PRAGMA user_version = 1")
+			connection.commit()
+			connection.close()
+
+			with self.assertRaises(ValueError):
+				SQLiteServiceRepository(db_name)
+			# Миграция откатилась целиком
+			connection = sqlite3.connect(db_name)
+			self.assertEqual(connection.execute("PRAGMA user_version").fetchone()[0], 1)
+			self.assertEqual(connection.execute("SELECT type FROM services").fetchone()[0], "GardenService")
+			connection.close()
+
+	def test_find_services_by_type_and_cost(self):
+		repo = SQLiteServiceRepository(":memory:")
+		repo.add_services(
+			[PlumbingService(uid=f"p{i}", cost=float(10 * i)) for i in range(5)] +
+			[ElectricalService(uid=f"e{i}", cost=float(10 * i)) for i in range(5)]
+		)
+		found = repo.find_services(PlumbingService, min_cost=15, max_cost=35)
+		self.assertEqual([s.get_uid() for s in found], ["p2", "p3"])
+		self.assertEqual([s.get_uid() for s in repo.find_services("electrical", limit=2)], ["e0", "e1"])
+		self.assertEqual(len(repo.find_services(max_cost=10)), 4)
+
+		plan = " ".join(row[-1] for row in repo.connection.execute(
+			"EXPLAIN QUERY PLAN SELECT id FROM services WHERE type = 1 AND cost BETWEEN 10 AND 20 ORDER BY cost"
+		))
+		self.assertIn("idx_services_type_cost", plan)
+		plan = " ".join(row[-1] for row in repo.connection.execute(
+			"EXPLAIN QUERY PLAN SELECT id FROM services WHERE cost >= 10 ORDER BY cost"
+		))
+		self.assertIn("idx_services_cost", plan)
+
+	def test_has_services(self):
+		repo = SQLiteServiceRepository(":memory:")
+		self.assertFalse(repo.has_services())
+		repo.add_service(PlumbingService())
+		self.assertTrue(repo.has_services())
+
+	def test_schema_ddl_skipped_when_current(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "services.db")
+			SQLiteServiceRepository(db_name).connection_manager.close_all()
+
+			# Повторное открытие актуальной базы не выполняет DDL
+			manager = ConnectionManager(db_name)
+			statements = []
+			manager.connection().set_trace_callback(statements.append)
+			SQLiteServiceRepository(db_name, connection_manager=manager)
+			self.assertFalse([sql for sql in statements if "CREATE" in sql.upper()])
+			manager.close_all()
+
+	def test_services_are_compact(self):
+		first, second = PlumbingService(), PlumbingService(description="Сантехнические " + "работы")
+		self.assertFalse(hasattr(first, "__dict__"))
+		# Одинаковые описания хранятся одной строкой
+		self.assertIs(first.get_description(), second.get_description())
+
+	def test_get_services_columnar(self):
+		repo = SQLiteServiceRepository(":memory:")
+		services = [PlumbingService(cost=float(i)) for i in range(3)] + [ElectricalService(uid="short-id")]
+		repo.add_services(services)
+
+		catalog = repo.get_services(columnar=True)
+		self.assertIsInstance(catalog, ServiceCatalog)
+		self.assertEqual(len(catalog), 4)
+		self.assertEqual(catalog.uids, [s.get_uid() for s in services])
+		self.assertEqual(list(catalog.costs), [0.0, 1.0, 2.0, 80.0])
+		self.assertEqual(list(catalog.type_codes), [PlumbingService.TYPE_CODE] * 3 + [ElectricalService.TYPE_CODE])
+		self.assertEqual(catalog.type_name(3), "ElectricalService")
+		self.assertIsInstance(catalog.find_service("short-id"), ElectricalService)
+		self.assertEqual(catalog.find_service(services[1].get_uid()).get_cost(), 1.0)
+		self.assertEqual(catalog.position("missing"), -1)
+		# Колоночная выборка не заполняет кэш объектами
+		self.assertEqual(len(repo.cache), 0)
+
 
 if __name__ == '__main__':
 	unittest.main()
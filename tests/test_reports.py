@@ -0,0 +1,107 @@
+import os, sys, csv, io, json, sqlite3, tempfile, types, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.booking import BookingLine
+from models.reports import ReportRepository, write_csv, write_jsonl
+
+DAY = 24 * 60 * 60
+
+
+class TestReports(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.users_db = os.path.join(self.tmp_dir.name, "users.db")
+		self.services_db = os.path.join(self.tmp_dir.name, "services.db")
+
+		self.service_repo = SQLiteServiceRepository(self.services_db)
+		self.plumbing = PlumbingService(description = "Замена крана", cost = 100.0)
+		self.electrical = ElectricalService(description = "Установка розеток", cost = 300.0)
+		self.service_repo.add_services([self.plumbing, self.electrical, PlumbingService(cost = 50.0)])
+
+		self.user_repo = SQLiteUserRepository(self.users_db)
+		booking_repo = SQLiteBookingRepository(self.user_repo)
+		for login in ("a", "b", "c"):
+			self.user_repo.add_user_with_hash(login, b"hash")
+		booking_repo.record_bookings("a", [self.line(self.plumbing), self.line(self.electrical)], created_at = 0)
+		booking_repo.record_bookings("b", [self.line(self.plumbing)], created_at = DAY)
+		booking_repo.record_bookings("b", [self.line(self.electrical), self.line(self.electrical)], created_at = DAY + 10)
+
+		self.reports = ReportRepository(self.users_db, self.services_db, batch_size = 2)
+
+	def tearDown(self):
+		self.reports.close()
+		self.service_repo.connection_manager.close_all()
+		self.user_repo.connection_manager.close_all()
+		self.tmp_dir.cleanup()
+
+	@staticmethod
+	def line(service) -> BookingLine:
+		return BookingLine(service.get_uid(), service.get_cost(), 0.0, service.get_cost(), "Bronze")
+
+	def test_tier_spending(self):
+		columns, rows = self.reports.run("tier_spending")
+		self.assertIsInstance(rows, types.GeneratorType)
+		self.assertEqual(list(rows), [
+			("Bronze", 1, 0.0, 0.0, 0.0), ("Gold", 1, 700.0, 700.0, 700.0), ("Silver", 1, 400.0, 400.0, 400.0)
+		])
+
+	def test_top_customers(self):
+		rows = list(self.reports.top_customers(limit = 2))
+		self.assertEqual(rows, [("b", "Gold", 700.0, 3), ("a", "Silver", 400.0, 2)])
+
+	def test_service_reports(self):
+		usage = {row[0]: row[1:] for row in self.reports.service_usage()}
+		self.assertEqual(usage[self.plumbing.get_uid()], ("PlumbingService", "Замена крана", 2, 200.0))
+		self.assertEqual(usage[self.electrical.get_uid()], ("ElectricalService", "Установка розеток", 3, 900.0))
+
+		revenue = dict((name, (bookings, total)) for name, bookings, total in self.reports.service_type_revenue())
+		self.assertEqual(revenue, {"PlumbingService": (2, 200.0), "ElectricalService": (3, 900.0)})
+		# Период ограничивает заказы по created_at
+		self.assertEqual(list(self.reports.service_type_revenue(since = DAY)), [
+			("PlumbingService", 1, 100.0), ("ElectricalService", 2, 600.0)
+		])
+
+	def test_daily_revenue(self):
+		self.assertEqual(list(self.reports.daily_revenue()), [("1970-01-01", 2, 400.0), ("1970-01-02", 3, 700.0)])
+
+	def test_catalog_summary_without_users_db(self):
+		reports = ReportRepository(services_db = self.services_db)
+		summary = {row[0]: row[1:] for row in reports.catalog_summary()}
+		self.assertEqual(summary["PlumbingService"], (2, 50.0, 75.0, 100.0))
+		with self.assertRaises(ValueError):
+			reports.run("tier_spending")
+		reports.close()
+
+	def test_aggregations_do_not_sort(self):
+		"""Группировки по индексам выполняются потоково, без временных структур сортировки."""
+		for sql in (
+			"SELECT membership_level, COUNT(*), SUM(total_spent) FROM users GROUP BY membership_level",
+			"SELECT service_id, COUNT(*), SUM(final_price) FROM bookings GROUP BY service_id",
+			"SELECT type, COUNT(*), MIN(cost) FROM catalog.services GROUP BY type",
+		):
+			plan = " ".join(row[-1] for row in self.reports.connection.execute("EXPLAIN QUERY PLAN " + sql))
+			self.assertIn("COVERING INDEX", plan)
+			self.assertNotIn("TEMP B-TREE", plan)
+
+	def test_writers(self):
+		columns, rows = self.reports.run("top_customers", limit = 10)
+		buffer = io.StringIO()
+		self.assertEqual(write_csv(columns, rows, buffer), 3)
+		parsed = list(csv.reader(io.StringIO(buffer.getvalue())))
+		self.assertEqual(parsed[0], list(columns))
+		self.assertEqual(parsed[1][0], "b")
+
+		columns, rows = self.reports.run("tier_spending")
+		buffer = io.StringIO()
+		self.assertEqual(write_jsonl(columns, rows, buffer), 3)
+		first = json.loads(buffer.getvalue().splitlines()[0])
+		self.assertEqual(set(first), set(columns))
+
+	def test_reports_are_read_only(self):
+		with self.assertRaises(sqlite3.Error):
+			self.reports.connection.execute("DELETE FROM users")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,59 @@
+import os, sys, time, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models.user import SQLiteUserRepository
+from models.session import SessionManager
+
+
+class TestSessionManager(unittest.TestCase):
+
+	def setUp(self):
+		"""Настраиваем репозиторий с одним пользователем и менеджер сессий."""
+		self.repo = SQLiteUserRepository(":memory:")
+		self.repo.add_user("test_user", "secure_password")
+		self.sessions = SessionManager(self.repo, b"test-secret")
+
+	def tearDown(self):
+		self.repo.connection.close()
+
+	def test_validate_session(self):
+		"""Проверяем, что действительный токен возвращает данные пользователя."""
+		token = self.sessions.create_session("test_user")
+		user_data = self.sessions.validate(token)
+		self.assertIsNotNone(user_data)
+		self.assertEqual(user_data, self.repo.get_user("test_user"))
+
+	def test_tampered_token_rejected(self):
+		"""Проверяем, что токен с измененной подписью или сроком не принимается."""
+		token = self.sessions.create_session("test_user")
+		session_id, expires_at, signature = token.split(".")
+		forged_signature = ("0" if signature[0] != "0" else "1") + signature[1:]
+		self.assertIsNone(self.sessions.validate(f"{session_id}.{expires_at}.{forged_signature}"))
+		self.assertIsNone(self.sessions.validate(f"{session_id}.{int(expires_at) + 1000}.{signature}"))
+		self.assertIsNone(self.sessions.validate("not-a-token"))
+
+	def test_token_from_other_secret_rejected(self):
+		"""Проверяем, что токен, подписанный другим ключом, не принимается."""
+		token = self.sessions.create_session("test_user")
+		other = SessionManager(self.repo, b"other-secret")
+		self.assertIsNone(other.validate(token))
+
+	def test_expired_session(self):
+		"""Проверяем, что истекшая сессия недействительна и удаляется при очистке."""
+		expired = SessionManager(self.repo, b"test-secret", ttl=-1)
+		token = expired.create_session("test_user")
+		self.assertIsNone(self.sessions.validate(token))
+		self.assertEqual(self.sessions.purge_expired(), 1)
+
+	def test_revoke_session(self):
+		"""Проверяем, что отозванная сессия больше не действительна."""
+		token = self.sessions.create_session("test_user")
+		other_token = self.sessions.create_session("test_user")
+		self.assertTrue(self.sessions.revoke(token))
+		self.assertIsNone(self.sessions.validate(token))
+		self.assertIsNotNone(self.sessions.validate(other_token))
+		self.assertEqual(self.sessions.revoke_all("test_user"), 1)
+		self.assertIsNone(self.sessions.validate(other_token))
+
+
+if __name__ == "__main__":
+	unittest.main()
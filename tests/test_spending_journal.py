@@ -0,0 +1,123 @@
+import os, sys, subprocess, tempfile, textwrap, unittest
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.booking import BookingLine
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class TestSpendingAccumulator(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.db_name = os.path.join(self.tmp_dir.name, "users.db")
+		self.journal_path = os.path.join(self.tmp_dir.name, "spending.journal")
+		self.user_repo = SQLiteUserRepository(self.db_name)
+		self.user_repo.add_user_with_hash("user", b"hash")
+		self.user_repo.add_user_with_hash("other", b"hash")
+
+	def tearDown(self):
+		self.user_repo.connection_manager.close_all()
+		self.tmp_dir.cleanup()
+
+	def accumulator(self, **kwargs) -> SpendingAccumulator:
+		# Длинный интервал: запись в базу выполняется только явно
+		return SpendingAccumulator(self.user_repo, self.journal_path, flush_interval = 3600, **kwargs)
+
+	def test_state_updates_before_flush(self):
+		accumulator = self.accumulator()
+		user = User(*accumulator.get_user("user"), user_repo = accumulator)
+		user.add_spent(150.0)
+		user.add_spent(100.0)
+		self.assertEqual((user.total_spent, user.membership_level), (250.0, "Silver"))
+		self.assertEqual(accumulator.get_user("user")[2:], (250.0, "Silver"))
+		# В базу пополнения еще не записаны
+		self.assertEqual(self.user_repo.get_user("user")[2], 0.0)
+
+		self.assertEqual(accumulator.flush(), 2)
+		self.assertEqual(self.user_repo.get_user("user")[2:], (250.0, "Silver"))
+		self.assertEqual(os.path.getsize(self.journal_path), 0)
+		accumulator.close()
+
+	def test_no_fsync_per_order_by_default(self):
+		accumulator = self.accumulator()
+		with mock.patch("models.spending_journal.os.fsync") as fsync:
+			accumulator.add_spending("user", 10.0)
+			self.assertFalse(fsync.called)
+		accumulator.close()
+
+		accumulator = self.accumulator(sync = True)
+		with mock.patch("models.spending_journal.os.fsync") as fsync:
+			accumulator.add_spending("user", 10.0)
+			self.assertEqual(fsync.call_count, 1)
+		accumulator.close()
+
+	def test_unknown_user(self):
+		accumulator = self.accumulator()
+		self.assertIsNone(accumulator.add_spending("missing", 10.0))
+		self.assertFalse(accumulator.update_spending("missing", 10.0))
+		accumulator.close()
+
+	def test_bookings_flushed_with_spending(self):
+		accumulator = self.accumulator()
+		lines = [BookingLine("a", 100.0, 0.0, 100.0, "Bronze"), BookingLine("b", 50.0, 0.0, 50.0, "Bronze")]
+		self.assertEqual(accumulator.record_bookings("user", lines), (150.0, "Bronze"))
+		accumulator.add_spending("other", 10.0)
+		accumulator.close()
+
+		booking_repo = SQLiteBookingRepository(self.user_repo)
+		self.assertEqual(booking_repo.get_user_total("user"), (2, 150.0))
+		# Расходы из записей без строк заказа не попадают в журнал бронирований
+		self.assertEqual([login for login, *_ in booking_repo.find_total_mismatches()], ["other"])
+
+	def test_size_threshold_triggers_flush(self):
+		accumulator = SpendingAccumulator(self.user_repo, self.journal_path, flush_interval = 3600, max_pending = 5)
+		for _ in range(5):
+			accumulator.add_spending("user", 1.0)
+		# Фоновый поток разбужен порогом и записывает группу
+		for _ in range(100):
+			if self.user_repo.get_user("user")[2] == 5.0:
+				break
+			accumulator._thread.join(0.02)
+		self.assertEqual(self.user_repo.get_user("user")[2], 5.0)
+		accumulator.close()
+
+	def test_recovery_after_crash(self):
+		"""Процесс падает, не записав пополнения в базу; при следующем запуске они применяются из журнала."""
+		script = textwrap.dedent(f"""
+			import os, sys
+			sys.path.insert(0, {ROOT!r})
+			from models import SQLiteUserRepository, SpendingAccumulator
+			accumulator = SpendingAccumulator(SQLiteUserRepository({self.db_name!r}), {self.journal_path!r}, flush_interval = 3600)
+			for _ in range(3):
+				accumulator.add_spending("user", 100.0)
+			os._exit(1)
+		""")
+		subprocess.run([sys.executable, "-c", script], check = False)
+		self.assertEqual(self.user_repo.get_user("user")[2], 0.0)
+
+		accumulator = self.accumulator()
+		self.assertEqual(self.user_repo.get_user("user")[2:], (300.0, "Silver"))
+		accumulator.close()
+
+		# Повторный запуск не применяет журнал второй раз
+		self.accumulator().close()
+		self.assertEqual(self.user_repo.get_user("user")[2], 300.0)
+
+	def test_applied_entries_are_skipped(self):
+		"""Сбой между COMMIT и очисткой журнала: уже примененные записи не учитываются повторно."""
+		accumulator = self.accumulator()
+		accumulator.add_spending("user", 100.0)
+		with open(self.journal_path) as f:
+			journal = f.read()
+		accumulator.close()
+		with open(self.journal_path, "w") as f:
+			f.write(journal + '{"seq": 2, "login": "user", "amount": 5.0}\n{"seq": 3, "log')
+
+		self.accumulator().close()
+		self.assertEqual(self.user_repo.get_user("user")[2], 105.0)
+
+
+if __name__ == "__main__":
+	unittest.main()
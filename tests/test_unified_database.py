@@ -0,0 +1,140 @@
+import os, sys, tempfile, unittest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from models import *
+from models.booking import BookingLine
+from models.database import get_schema_version
+from models.unified import merge_split_databases
+from models.user import MEMBERSHIP_TIERS, set_membership_tiers
+
+
+class TestUnifiedDatabase(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.db_name = os.path.join(self.tmp_dir.name, "repair_service.db")
+		self.database = UnifiedDatabase(self.db_name)
+		self.service = PlumbingService(description = "Замена крана", cost = 100.0)
+		self.database.service_repo.add_service(self.service)
+		self.database.user_repo.add_user_with_hash("user", b"hash")
+
+	def tearDown(self):
+		self.database.close()
+		self.tmp_dir.cleanup()
+		set_membership_tiers(MEMBERSHIP_TIERS)
+
+	def line(self, cost: float = 100.0) -> BookingLine:
+		return BookingLine(self.service.get_uid(), cost, 0.0, cost, "Bronze")
+
+	def test_schema_versions_per_component(self):
+		connection = self.database.connection
+		self.assertEqual(get_schema_version(connection), 0)
+		self.assertEqual(get_schema_version(connection, "services"), SQLiteServiceRepository.SCHEMA_VERSION)
+		self.assertEqual(get_schema_version(connection, "users"), SQLiteUserRepository.SCHEMA_VERSION)
+
+		# Репозиторий без явного единого режима узнает единую базу и не применяет миграции повторно
+		service_repo = SQLiteServiceRepository(self.db_name)
+		self.assertEqual(service_repo.find_service(self.service.get_uid()).get_cost(), 100.0)
+		service_repo.connection_manager.close_all()
+
+	def test_booking_checks_catalog_in_same_transaction(self):
+		booking_repo = self.database.booking_repo
+		self.assertEqual(booking_repo.record_bookings("user", [self.line()]), (100.0, "Bronze"))
+
+		with self.assertRaises(ValueError):
+			booking_repo.record_bookings("user", [self.line(cost = 90.0)])
+		with self.assertRaises(ValueError):
+			booking_repo.record_bookings("user", [BookingLine("missing", 10.0, 0.0, 10.0, "Bronze")])
+		# Отклоненные заказы не записаны ни в журнал, ни в расходы
+		self.assertEqual(booking_repo.get_user_total("user"), (1, 100.0))
+		self.assertEqual(self.database.user_repo.get_user("user")[2], 100.0)
+		self.assertFalse(self.database.connection.in_transaction)
+
+	def test_booking_repo_requires_shared_connection(self):
+		service_repo = SQLiteServiceRepository(os.path.join(self.tmp_dir.name, "services.db"))
+		with self.assertRaises(ValueError):
+			SQLiteBookingRepository(self.database.user_repo, service_repo)
+		service_repo.connection_manager.close_all()
+
+	def test_catalog_cache_survives_user_writes(self):
+		"""Запись пользователей и заказов другим соединением не сбрасывает кэш каталога."""
+		service_repo = SQLiteServiceRepository(self.db_name, cache_check_interval = 0)
+		other = UnifiedDatabase(self.db_name)
+		try:
+			service_repo.find_service(self.service.get_uid())
+			revision = service_repo.revision
+			other.user_repo.add_user_with_hash("other", b"hash")
+			other.booking_repo.record_bookings("user", [self.line()])
+			service_repo.validate_cache()
+			self.assertEqual(service_repo.revision, revision)
+			self.assertIsNotNone(service_repo.cache.get(self.service.get_uid()))
+
+			other.service_repo.add_service(ElectricalService(description = "Щиток", cost = 50.0))
+			service_repo.validate_cache()
+			self.assertEqual(service_repo.revision, revision + 1)
+			self.assertIsNone(service_repo.cache.get(self.service.get_uid()))
+		finally:
+			other.close()
+			service_repo.connection_manager.close_all()
+
+	def test_reports_without_attach(self):
+		self.database.booking_repo.record_bookings("user", [self.line()])
+		reports = ReportRepository(self.db_name, self.db_name)
+		self.assertEqual(reports.catalog, "main")
+		self.assertEqual(list(reports.run("service_type_revenue")[1]), [("PlumbingService", 1, 100.0)])
+		reports.close()
+
+
+class TestMergeSplitDatabases(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.services_db = os.path.join(self.tmp_dir.name, "services.db")
+		self.users_db = os.path.join(self.tmp_dir.name, "users.db")
+		self.db_name = os.path.join(self.tmp_dir.name, "repair_service.db")
+
+		service_repo = SQLiteServiceRepository(self.services_db)
+		self.services = [
+			PlumbingService(description = "Замена крана", cost = 100.0),
+			ElectricalService(description = "Установка розеток", cost = 300.0),
+		]
+		service_repo.add_services(self.services)
+		user_repo = SQLiteUserRepository(self.users_db)
+		user_repo.save_membership_tiers((("Gold", 250, 0.2), ("Bronze", 0, 0.0)))
+		user_repo.add_user_with_hash("user", b"hash")
+		SQLiteBookingRepository(user_repo).record_bookings("user", [
+			BookingLine(self.services[1].get_uid(), 300.0, 0.0, 300.0, "Bronze"),
+		])
+		service_repo.connection_manager.close_all()
+		user_repo.connection_manager.close_all()
+
+	def tearDown(self):
+		self.tmp_dir.cleanup()
+		set_membership_tiers(MEMBERSHIP_TIERS)
+
+	def test_merge(self):
+		copied = merge_split_databases(self.services_db, self.users_db, self.db_name)
+		self.assertEqual((copied["services"], copied["users"], copied["bookings"], copied["membership_tiers"]), (2, 1, 1, 2))
+
+		database = UnifiedDatabase(self.db_name)
+		self.assertEqual(database.user_repo.get_user("user")[2:], (300.0, "Gold"))
+		self.assertEqual(database.user_repo.load_membership_tiers(), (("Gold", 250, 0.2), ("Bronze", 0, 0.0)))
+		# Полнотекстовый индекс заполнен триггерами при переносе
+		self.assertEqual(
+			[service.get_uid() for service in database.service_repo.search_services("розет")],
+			[self.services[1].get_uid()]
+		)
+		self.assertEqual(database.booking_repo.get_service_stats(self.services[1].get_uid()), (1, 300.0))
+		database.close()
+
+	def test_target_must_be_empty(self):
+		merge_split_databases(self.services_db, self.users_db, self.db_name)
+		with self.assertRaises(ValueError):
+			merge_split_databases(self.services_db, self.users_db, self.db_name)
+
+	def test_missing_source(self):
+		with self.assertRaises(FileNotFoundError):
+			merge_split_databases(os.path.join(self.tmp_dir.name, "missing.db"), self.users_db, self.db_name)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,6 +1,8 @@
-import os, sys, bcrypt, unittest
+import os, sys, bcrypt, tempfile, threading, unittest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from models.user import SQLiteUserRepository 
+from models.user import SQLiteUserRepository, User, MEMBERSHIP_TIERS, get_membership_tiers, set_membership_tiers
+from models.booking import CartBooking
+from models.repair_service import PlumbingService
 
 
 class TestSQLiteUserRepository(unittest.TestCase):
@@ -83,6 +85,139 @@ class TestSQLiteUserRepository(unittest.TestCase):
 		self.assertTrue(self.repo.is_login_exists("test_user"))
 		self.assertFalse(self.repo.is_login_exists("non_existent_user"))
 
+	def test_add_spending_returns_state(self):
+		"""Проверяем, что add_spending возвращает новую сумму и уровень членства."""
+		self.repo.add_user("test_user", "secure_password")
+		self.assertEqual(self.repo.add_spending("test_user", 150.0), (150.0, "Bronze"))
+		self.assertEqual(self.repo.add_spending("test_user", 100.0), (250.0, "Silver"))
+		self.assertIsInstance(self.repo.add_spending("test_user", 50.0)[0], float)
+		self.assertIsNone(self.repo.add_spending("non_existent_user", 100.0))
+
+	def test_user_add_spent_uses_returned_state(self):
+		"""Проверяем, что User получает состояние из базы, включая покупки из других окон."""
+		self.repo.add_user("test_user", "secure_password")
+		user = User(*self.repo.get_user("test_user"), user_repo=self.repo)
+		self.repo.add_spending("test_user", 450.0)  # Покупка из другого окна
+		user.add_spent(100.0)
+		self.assertEqual(user.total_spent, 550.0)
+		self.assertEqual(user.membership_level, "Gold")
+
+	def test_get_users_by_membership(self):
+		for login, spent in (("a", 600.0), ("b", 900.0), ("c", 100.0)):
+			self.repo.add_user_with_hash(login, b"hash")
+			self.repo.add_spending(login, spent)
+
+		self.assertEqual([row[0] for row in self.repo.get_users_by_membership("Gold")], ["b", "a"])
+		self.assertEqual([row[0] for row in self.repo.get_users_by_membership("Gold", min_spent=700)], ["b"])
+		plan = " ".join(row[-1] for row in self.repo.connection.execute(
+			"EXPLAIN QUERY PLAN SELECT * FROM users WHERE membership_level = 'Gold' ORDER BY total_spent DESC"
+		))
+		self.assertIn("idx_users_membership_spent", plan)
+		self.assertNotIn("TEMP B-TREE", plan)
+
+	def test_add_spending_concurrent_writers(self):
+		"""Проверяем, что одновременные покупки из разных соединений не теряются."""
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "users.db")
+			SQLiteUserRepository(db_name).add_user_with_hash("test_user", b"hash")
+
+			def book():
+				repo = SQLiteUserRepository(db_name)
+				for _ in range(50):
+					repo.add_spending("test_user", 10.0)
+				repo.connection.close()
+
+			threads = [threading.Thread(target=book) for _ in range(4)]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+
+			repo = SQLiteUserRepository(db_name)
+			self.assertEqual(repo.get_user("test_user")[2:], (2000.0, "Platinum"))
+			repo.connection.close()
+
+
+class TestMembershipTiers(unittest.TestCase):
+
+	def setUp(self):
+		self.repo = SQLiteUserRepository(":memory:")
+		for login, spent in (("a", 100.0), ("b", 250.0), ("c", 600.0), ("d", 1200.0)):
+			self.repo.add_user_with_hash(login, b"hash")
+			self.repo.add_spending(login, spent)
+
+	def tearDown(self):
+		self.repo.connection.close()
+		# Уровни членства действуют на весь процесс, поэтому возвращаем значения по умолчанию
+		set_membership_tiers(MEMBERSHIP_TIERS)
+
+	def levels(self) -> list:
+		return [row[0] for row in self.repo.connection.execute("SELECT membership_level FROM users ORDER BY login")]
+
+	def test_default_tiers_loaded(self):
+		self.assertEqual(self.repo.load_membership_tiers(), tuple(
+			(level, float(threshold), discount) for level, threshold, discount in MEMBERSHIP_TIERS
+		))
+		self.assertEqual(self.levels(), ["Bronze", "Silver", "Gold", "Platinum"])
+
+	def test_save_tiers_recalculates_levels(self):
+		changed = self.repo.save_membership_tiers([
+			("Bronze", 0, 0.0), ("Silver", 50, 0.05), ("Gold", 300, 0.1), ("Platinum", 2000, 0.2)
+		])
+		self.assertEqual(changed, 2)
+		self.assertEqual(self.levels(), ["Silver", "Silver", "Gold", "Gold"])
+		# Новые пороги действуют и в Python, и в SQL
+		self.assertEqual(User.determine_membership_level(2500), "Platinum")
+		self.assertEqual(User.get_discount_for_level("Platinum"), 0.2)
+		self.repo.add_spending("d", 1000.0)
+		self.assertEqual(self.repo.get_user("d")[3], "Platinum")
+
+	def test_recalculate_fixes_stale_levels(self):
+		self.repo.connection.execute("UPDATE membership_tiers SET min_spent = 150 WHERE level = 'Silver'")
+		self.repo.connection.commit()
+		self.assertEqual(self.repo.recalculate_membership_levels(), 0)
+		self.repo.connection.execute("UPDATE membership_tiers SET min_spent = 90 WHERE level = 'Silver'")
+		self.repo.connection.commit()
+		self.assertEqual(self.repo.recalculate_membership_levels(), 1)
+		self.assertEqual(self.levels(), ["Silver", "Silver", "Gold", "Platinum"])
+		self.assertEqual(get_membership_tiers()[2], ("Silver", 90.0, 0.05))
+
+	def test_invalid_tiers_rejected(self):
+		for tiers in (
+			[],
+			[("Bronze", 10, 0.0)],
+			[("Bronze", 0, 0.0), ("Bronze", 100, 0.1)],
+			[("Bronze", 0, 0.0), ("Gold", 100, 1.5)],
+		):
+			with self.assertRaises(ValueError):
+				self.repo.save_membership_tiers(tiers)
+		self.assertEqual(len(self.repo.load_membership_tiers()), len(MEMBERSHIP_TIERS))
+
+	def test_tiers_changed_by_another_process(self):
+		with tempfile.TemporaryDirectory() as tmp_dir:
+			db_name = os.path.join(tmp_dir, "users.db")
+			app_repo = SQLiteUserRepository(db_name, tiers_check_interval = 0)
+			app_repo.add_user_with_hash("user", b"hash")
+			app_repo.add_spending("user", 600.0)
+			user = User(*app_repo.get_user("user"), user_repo = app_repo)
+			service = PlumbingService(cost = 100.0)
+			self.assertEqual(CartBooking(user, [service]).price_cart()[0].discount, 0.1)
+
+			# Другое соединение (как tools/membership_tiers.py) меняет скидки; в процессе остаются старые
+			tool_repo = SQLiteUserRepository(db_name)
+			tool_repo.save_membership_tiers([("Bronze", 0, 0.0), ("Gold", 500, 0.25)])
+			set_membership_tiers(MEMBERSHIP_TIERS)
+
+			self.assertEqual(CartBooking(user, [service]).price_cart()[0].discount, 0.25)
+			self.assertEqual(User.determine_membership_level(600.0), "Gold")
+			tool_repo.connection_manager.close_all()
+			app_repo.connection_manager.close_all()
+
+	def test_new_user_gets_lowest_tier(self):
+		self.repo.save_membership_tiers([("Basic", 0, 0.0), ("Premium", 500, 0.1)])
+		self.repo.add_user_with_hash("new", b"hash")
+		self.assertEqual(self.repo.get_user("new")[3], "Basic")
+
 
 if __name__ == "__main__":
 	unittest.main()
@@ -0,0 +1,88 @@
+"""
+Выгрузка и загрузка каталога услуг в CSV или JSON Lines.
+Файл читается и пишется потоково, загрузка фиксируется порциями и продолжается после сбоя.
+
+Примеры:
+	python tools/catalog.py export catalog.csv
+	python tools/catalog.py import catalog.csv --on-conflict replace
+	python tools/catalog.py import catalog.jsonl --skip-invalid
+"""
+
+# Another
+import argparse, os, sqlite3, sys, time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Models
+from models.repair_service import SQLiteServiceRepository
+from models.catalog_io import import_catalog, export_catalog, CatalogFormatError
+
+
+def detect_format(path: str, fmt: str) -> str:
+	if fmt:
+		return fmt
+	return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description = "Repair Service catalog import/export")
+	parser.add_argument("command", choices = ("import", "export"))
+	parser.add_argument("path", help = "файл каталога (- для stdin/stdout)")
+	parser.add_argument("--db", default = "services.db", help = "база данных каталога услуг или единая база данных")
+	parser.add_argument("--format", choices = ("csv", "jsonl"), help = "формат файла (по умолчанию по расширению)")
+	parser.add_argument("--chunk-size", type = int, default = 5000, help = "записей в одной транзакции загрузки")
+	parser.add_argument(
+		"--on-conflict",
+		choices = ("error", "ignore", "replace"),
+		default = "error",
+		help = "что делать с услугами, id которых уже есть в каталоге"
+	)
+	parser.add_argument("--skip-invalid", action = "store_true", help = "пропускать некорректные записи")
+	parser.add_argument("--job", help = "имя загрузки для возобновления (по умолчанию путь к файлу)")
+	return parser.parse_args(argv)
+
+
+def main():
+	args = parse_args(sys.argv[1:])
+	fmt = detect_format(args.path, args.format)
+	service_repo = SQLiteServiceRepository(args.db, cache_size = 0)
+	started = time.perf_counter()
+
+	if args.command == "export":
+		if args.path == "-":
+			count = export_catalog(service_repo, sys.stdout, fmt, args.chunk_size)
+		else:
+			with open(args.path, "w", newline = "", encoding = "utf-8") as fp:
+				count = export_catalog(service_repo, fp, fmt, args.chunk_size)
+		print(f"Выгружено услуг: {count} за {time.perf_counter() - started:.2f} с", file = sys.stderr)
+		return
+
+	job = args.job or (os.path.abspath(args.path) if args.path != "-" else "stdin")
+	try:
+		if args.path == "-":
+			result = import_catalog(
+				service_repo, sys.stdin, fmt, job, args.chunk_size, args.on_conflict, args.skip_invalid
+			)
+		else:
+			with open(args.path, "r", newline = "", encoding = "utf-8") as fp:
+				result = import_catalog(
+					service_repo, fp, fmt, job, args.chunk_size, args.on_conflict, args.skip_invalid
+				)
+	except CatalogFormatError as e:
+		sys.exit(f"Ошибка в файле каталога ({e}). Записанные порции сохранены; исправьте файл и повторите загрузку.")
+	except sqlite3.IntegrityError:
+		sys.exit("Услуги с такими id уже есть в каталоге; используйте --on-conflict ignore или replace.")
+
+	for error in result.errors:
+		print(f"Пропущено: {error}", file = sys.stderr)
+	if result.resumed_from:
+		print(f"Загрузка продолжена с записи {result.resumed_from + 1}", file = sys.stderr)
+	print(
+		f"Записей: {result.records}, записано услуг: {result.written}, пропущено: {result.skipped} "
+		f"за {time.perf_counter() - started:.2f} с",
+		file = sys.stderr
+	)
+
+
+if __name__ == "__main__":
+	main()
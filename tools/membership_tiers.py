@@ -0,0 +1,70 @@
+"""
+Просмотр и изменение уровней членства (таблица membership_tiers) и массовый пересчет уровней пользователей.
+
+Примеры:
+	python tools/membership_tiers.py --db users.db
+	python tools/membership_tiers.py --db users.db --set Platinum:1500:0.15 Gold:700:0.1 Silver:300:0.05 Bronze:0:0
+	python tools/membership_tiers.py --db users.db --recalculate
+"""
+
+# Another
+import argparse, os, sys, time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Models
+from models.user import SQLiteUserRepository
+
+
+def parse_tier(value: str) -> tuple:
+	"""Разбирает уровень в формате "название:порог:скидка"."""
+	try:
+		level, threshold, discount = value.split(":")
+		return level, float(threshold), float(discount)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected LEVEL:THRESHOLD:DISCOUNT, got {value!r}")
+
+
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description = "Membership tiers maintenance")
+	parser.add_argument("--db", default = "users.db", help = "база данных пользователей")
+	action = parser.add_mutually_exclusive_group()
+	action.add_argument(
+		"--set",
+		nargs = "+",
+		type = parse_tier,
+		metavar = "LEVEL:THRESHOLD:DISCOUNT",
+		help = "заменить уровни членства и пересчитать уровни пользователей"
+	)
+	action.add_argument(
+		"--recalculate",
+		action = "store_true",
+		help = "пересчитать уровни пользователей по текущей таблице уровней"
+	)
+	return parser.parse_args(argv)
+
+
+def main():
+	args = parse_args(sys.argv[1:])
+	user_repo = SQLiteUserRepository(args.db)
+
+	started = time.perf_counter()
+	if args.set:
+		try:
+			changed = user_repo.save_membership_tiers(args.set)
+		except ValueError as e:
+			sys.exit(f"Некорректные уровни членства: {e}")
+	elif args.recalculate:
+		changed = user_repo.recalculate_membership_levels()
+	else:
+		changed = None
+	elapsed = time.perf_counter() - started
+
+	for level, threshold, discount in user_repo.load_membership_tiers():
+		print(f"{level:<12} от {threshold:>10.2f}  скидка {discount * 100:.1f}%")
+	if changed is not None:
+		print(f"Уровень изменился у {changed} пользователей ({elapsed:.2f} с)")
+
+
+if __name__ == "__main__":
+	main()
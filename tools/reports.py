@@ -0,0 +1,84 @@
+"""
+Выгрузка отчетов по базам пользователей и услуг в CSV или JSON Lines.
+Строки пишутся по мере чтения из базы, поэтому размер отчета не ограничен объемом памяти.
+
+Примеры:
+	python tools/reports.py --list
+	python tools/reports.py tier_spending --format csv
+	python tools/reports.py service_type_revenue --since 2024-01-01 --until 2024-02-01 --output revenue.jsonl
+"""
+
+# Another
+import argparse, datetime, os, sys, time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Models
+from models.reports import ReportRepository, REPORTS, WRITERS
+
+
+def parse_date(value: str) -> float:
+	"""Дата или дата со временем в формате ISO 8601 (UTC, если часовой пояс не указан) -> unix time."""
+	moment = datetime.datetime.fromisoformat(value)
+	if moment.tzinfo is None:
+		moment = moment.replace(tzinfo = datetime.timezone.utc)
+	return moment.timestamp()
+
+
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description = "Repair Service reports")
+	parser.add_argument("report", nargs = "?", choices = sorted(REPORTS), help = "имя отчета")
+	parser.add_argument("--list", action = "store_true", help = "показать список отчетов")
+	parser.add_argument("--users-db", default = "users.db", help = "база данных пользователей и заказов")
+	parser.add_argument("--services-db", default = "services.db", help = "база данных каталога услуг")
+	parser.add_argument("--database", help = "единая база данных услуг и пользователей (вместо --users-db и --services-db)")
+	parser.add_argument("--format", choices = sorted(WRITERS), default = "csv", help = "формат вывода")
+	parser.add_argument("--output", help = "файл результата (по умолчанию stdout)")
+	parser.add_argument("--since", type = parse_date, help = "начало периода заказов (включительно)")
+	parser.add_argument("--until", type = parse_date, help = "конец периода заказов (не включительно)")
+	parser.add_argument("--limit", type = int, default = 100, help = "количество строк для top_customers")
+	args = parser.parse_args(argv)
+	if not args.list and args.report is None:
+		parser.error("report name is required")
+	return args
+
+
+def main():
+	args = parse_args(sys.argv[1:])
+	if args.list:
+		for report in REPORTS.values():
+			print(f"{report.name:<22} {report.description}")
+		return
+
+	params = {}
+	if args.report == "top_customers":
+		params["limit"] = args.limit
+	elif args.report in ("daily_revenue", "service_usage", "service_type_revenue"):
+		params = {"since": args.since, "until": args.until}
+
+	if args.database:
+		args.users_db = args.services_db = args.database
+	try:
+		reports = ReportRepository(
+			args.users_db if os.path.exists(args.users_db) else None,
+			args.services_db if os.path.exists(args.services_db) else None
+		)
+	except ValueError as e:
+		sys.exit(str(e))
+	started = time.perf_counter()
+	try:
+		columns, rows = reports.run(args.report, **params)
+		if args.output:
+			with open(args.output, "w", newline = "", encoding = "utf-8") as fp:
+				count = WRITERS[args.format](columns, rows, fp)
+		else:
+			count = WRITERS[args.format](columns, rows, sys.stdout)
+	except ValueError as e:
+		sys.exit(str(e))
+	finally:
+		reports.close()
+	print(f"{args.report}: {count} строк за {time.perf_counter() - started:.2f} с", file = sys.stderr)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,43 @@
+"""
+Перенос отдельных баз services.db и users.db в единую базу данных (main.py --database, server.py --database).
+Исходные файлы не удаляются и остаются резервной копией.
+
+Примеры:
+	python tools/unify_databases.py repair_service.db
+	python tools/unify_databases.py repair_service.db --services-db old/services.db --users-db old/users.db
+"""
+
+# Another
+import argparse, os, sys, time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Models
+from models.unified import merge_split_databases
+
+
+def parse_args(argv: list):
+	parser = argparse.ArgumentParser(description = "Merge services.db and users.db into a unified database")
+	parser.add_argument("database", help = "путь к единой базе данных (новый или пустой файл)")
+	parser.add_argument("--services-db", default = "services.db", help = "база данных каталога услуг")
+	parser.add_argument("--users-db", default = "users.db", help = "база данных пользователей и заказов")
+	return parser.parse_args(argv)
+
+
+def main():
+	args = parse_args(sys.argv[1:])
+	started = time.perf_counter()
+	try:
+		copied = merge_split_databases(args.services_db, args.users_db, args.database)
+	except FileNotFoundError as e:
+		sys.exit(f"Файл базы данных не найден: {e}")
+	except ValueError as e:
+		sys.exit(f"Перенос невозможен: {e}")
+
+	for table, count in copied.items():
+		print(f"{table:<24} {count:>10}")
+	print(f"Базы данных перенесены в {args.database} за {time.perf_counter() - started:.2f} с")
+
+
+if __name__ == "__main__":
+	main()
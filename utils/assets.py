@@ -0,0 +1,67 @@
+# QT
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QIcon, QPixmap, QPixmapCache
+from PyQt5.QtCore import Qt
+
+# Utils
+from utils.path_tools import resource_path
+
+DARK_THEME_CSS = resource_path("resources/styles/dark_theme.css")
+LIGHT_THEME_CSS = resource_path("resources/styles/light_theme.css")
+
+# Бюджет памяти для декодированных иконок (QPixmapCache вытесняет старые записи при превышении)
+PIXMAP_CACHE_LIMIT_KB = 4 * 1024
+
+_icons = {}
+_applied_stylesheet = None
+
+
+def set_pixmap_cache_limit(limit_kb: int = PIXMAP_CACHE_LIMIT_KB) -> None:
+	"""Задает бюджет памяти кэша иконок в килобайтах."""
+	QPixmapCache.setCacheLimit(limit_kb)
+
+
+def get_pixmap(path: str, size: int = 32) -> QPixmap:
+	"""
+	Возвращает иконку, масштабированную до size x size. Файл декодируется и масштабируется
+	один раз для каждого размера, дальше иконка берется из QPixmapCache.
+	Если файл не удалось загрузить, возвращается пустой QPixmap (isNull() == True).
+	"""
+	if not path:
+		return QPixmap()
+
+	key = f"{path}@{size}"
+	pixmap = QPixmapCache.find(key)
+	if pixmap is not None and not pixmap.isNull():
+		return pixmap
+
+	pixmap = QPixmap(path)
+	if pixmap.isNull():
+		return pixmap
+	pixmap = pixmap.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+	QPixmapCache.insert(key, pixmap)
+	return pixmap
+
+
+def get_icon(path: str) -> QIcon:
+	"""Возвращает общий QIcon для файла; файл читается один раз за время работы приложения."""
+	icon = _icons.get(path)
+	if icon is None:
+		icon = QIcon(path)
+		_icons[path] = icon
+	return icon
+
+
+def apply_stylesheet(path: str = DARK_THEME_CSS) -> None:
+	"""
+	Применяет таблицу стилей ко всему приложению. Повторные вызовы с тем же файлом
+	ничего не делают, поэтому окна могут вызывать функцию без повторного чтения файла.
+	"""
+	global _applied_stylesheet
+	app = QApplication.instance()
+	if app is None or _applied_stylesheet == path:
+		return
+
+	with open(path, "r", encoding = "utf-8") as style_fp:
+		app.setStyleSheet(style_fp.read())
+	_applied_stylesheet = path
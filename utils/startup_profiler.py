@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+import sys, time
+
+
+class StartupProfiler:
+	"""
+	Замеряет длительность фаз запуска приложения и печатает отчет.
+	В выключенном состоянии фазы не замеряются и отчет не печатается.
+	"""
+
+	def __init__(self, enabled: bool = False, stream = None):
+		self.enabled = enabled
+		self.stream = stream or sys.stderr
+		self.started_at = time.perf_counter()
+		# Записи (название, смещение от старта, длительность или None для отметок)
+		self.entries = []
+
+	def elapsed(self) -> float:
+		return time.perf_counter() - self.started_at
+
+	@contextmanager
+	def phase(self, name: str):
+		if not self.enabled:
+			yield
+			return
+
+		offset = self.elapsed()
+		try:
+			yield
+		finally:
+			self.entries.append((name, offset, self.elapsed() - offset))
+
+	def mark(self, name: str) -> None:
+		"""Отмечает момент от начала запуска (например, первую отрисовку окна)."""
+		if self.enabled:
+			self.entries.append((name, self.elapsed(), None))
+
+	def report(self) -> None:
+		if not self.enabled:
+			return
+
+		width = max((len(name) for name, _, _ in self.entries), default = 0)
+		print("Профиль запуска:", file = self.stream)
+		for name, offset, duration in self.entries:
+			duration_text = "" if duration is None else f"{duration * 1000:8.1f} мс"
+			print(f"  {name:<{width}}  {duration_text:>11}  (от старта {offset * 1000:8.1f} мс)", file = self.stream)